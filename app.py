@@ -1,33 +1,34 @@
 # 2025102
 # app.py — 보험사 경영공시 챗봇 (아이콘/버튼너비 수정)
+from __future__ import annotations
+
 import os
+import contextvars
 import json
-import re
-import pandas as pd
-import streamlit as st
-import psycopg
-
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
-# ====== LangChain / OpenAI LLM ======
-from langchain_community.utilities import SQLDatabase
-
-# create_sql_agent 경로 버전별 대응
-try:
-    from langchain_community.agent_toolkits import create_sql_agent
-except ImportError:
-    try:
-        from langchain_community.agent_toolkits.sql.base import create_sql_agent
-    except ImportError:
-        from langchain.agents.agent_toolkits import create_sql_agent
+import streamlit as st
+from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
-# ====================================
+# 첫 화면에 필요 없는 무거운 모듈(LangChain/OpenAI/pandas/SQLAlchemy)은 쓰는 함수 안에서 import
+# — st.cache_resource 게터가 처음 불릴 때 한 번만 로드되고, 첫 렌더 뒤 백그라운드 예열에서 미리 불린다
+from tracing import TracedChatClient, Tracer
+from sql_cache import SQLCache
+from sql_engine import EngineStats
+from sql_agent import build_agent_prefix, build_sql_agent, make_lc_db, make_llm
 
-from openai import OpenAI
-from dotenv import load_dotenv
+if TYPE_CHECKING:
+    import pandas as pd
 
 load_dotenv()
 
+logger = logging.getLogger("nh_chatbot")
+
 # ----------------- 환경변수/시크릿 -----------------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
 DB_HOST = os.getenv("DB_HOST") or st.secrets.get("DB_HOST")      # e.g., aws-1-us-east-1.pooler.supabase.com
@@ -36,11 +37,121 @@ DB_USER = os.getenv("DB_USER") or st.secrets.get("DB_USER", "readonly")
 DB_PASS = os.getenv("DB_PASS") or st.secrets.get("DB_PASS")
 DB_PORT = int(os.getenv("DB_PORT") or st.secrets.get("DB_PORT", 5432))
 
+# 커넥션 풀 (최소/최대 커넥션, 풀 대기 타임아웃 초, statement_timeout ms)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN") or st.secrets.get("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX") or st.secrets.get("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or st.secrets.get("DB_POOL_TIMEOUT", 10))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS") or st.secrets.get("DB_STATEMENT_TIMEOUT_MS", 15000))
+
+# 스키마/샘플 스냅샷 갱신 주기(초) — 갱신되면 에이전트도 새 스냅샷으로 다시 만든다
+SCHEMA_REFRESH_SECONDS = int(os.getenv("SCHEMA_REFRESH_SECONDS") or st.secrets.get("SCHEMA_REFRESH_SECONDS", 6 * 3600))
+
+# SQL 생성 엔진: "single_shot"(로컬 규칙 → 슬롯 추출 1회 + 로컬 SQL 조립, 실패 시 에이전트) 또는 "agent"
+# "agent" 면 로컬 규칙 엔진/비교 모드 분할도 건너뛰고 항상 에이전트 (SQL 캐시 적중과 후속 질문(CONVERSATION_MODE)은 그대로)
+SQL_ENGINE = os.getenv("SQL_ENGINE") or st.secrets.get("SQL_ENGINE", "single_shot")
+# single_shot 엔진이 사용하는 컬럼명 (kics_solvency_data_flexible)
+KICS_COMPANY_COL = os.getenv("KICS_COMPANY_COL") or st.secrets.get("KICS_COMPANY_COL", "company_code")
+KICS_YM_COL = os.getenv("KICS_YM_COL") or st.secrets.get("KICS_YM_COL", "closing_ym")
+KICS_METRIC_COL = os.getenv("KICS_METRIC_COL") or st.secrets.get("KICS_METRIC_COL", "metric")
+KICS_VALUE_COL = os.getenv("KICS_VALUE_COL") or st.secrets.get("KICS_VALUE_COL", "value")
+
+# 요약 입력 토큰 예산 / 함께 보낼 샘플 행 수 상한
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET") or st.secrets.get("SUMMARY_TOKEN_BUDGET", 1500))
+SUMMARY_SAMPLE_ROWS = int(os.getenv("SUMMARY_SAMPLE_ROWS") or st.secrets.get("SUMMARY_SAMPLE_ROWS", 20))
+# 요약을 토큰 단위로 스트리밍 표시 ("0" 이면 완성 후 한 번에 표시)
+SUMMARY_STREAM = (os.getenv("SUMMARY_STREAM") or str(st.secrets.get("SUMMARY_STREAM", "1"))) not in ("0", "false", "False")
+
+# 단계별 트레이스(JSON lines) 파일 — 운영 페이지(pages/ops.py)가 읽는다. 상한 MB 를 넘으면 .1 로 돌린다
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH") or st.secrets.get("TRACE_LOG_PATH", ".cache/traces.jsonl")
+TRACE_LOG_MAX_MB = float(os.getenv("TRACE_LOG_MAX_MB") or st.secrets.get("TRACE_LOG_MAX_MB", 20))
+# 트레이스에 질문 원문을 남길지 (기본은 해시만 — 디버깅할 때만 "1")
+TRACE_LOG_QUESTIONS = (os.getenv("TRACE_LOG_QUESTIONS") or str(st.secrets.get("TRACE_LOG_QUESTIONS", "0"))) in ("1", "true", "True")
+
+# 요약 LLM 호출을 돌릴 백그라운드 스레드 수 (프로세스 공용)
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS") or st.secrets.get("STAGE_WORKERS", 8))
+
+# 요약 캐시 (SQLite 파일, TTL 초). 디버깅 시 SUMMARY_CACHE_BYPASS=1 또는 URL ?summary_cache=off 로 우회
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH") or st.secrets.get("SUMMARY_CACHE_PATH", ".cache/summary_cache.sqlite3")
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL") or st.secrets.get("SUMMARY_CACHE_TTL", 7 * 24 * 3600))
+SUMMARY_CACHE_BYPASS = (os.getenv("SUMMARY_CACHE_BYPASS") or str(st.secrets.get("SUMMARY_CACHE_BYPASS", "0"))) in ("1", "true", "True")
+
+# 조회 결과 캐시 (메모리 상한 MB, 넘치면 스필할 디렉터리 — 비우면 스필 안 함, 스필 디스크 상한 MB, 데이터 버전 확인 주기 초)
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB") or st.secrets.get("RESULT_CACHE_MAX_MB", 64))
+RESULT_CACHE_SPILL_DIR = os.getenv("RESULT_CACHE_SPILL_DIR") or st.secrets.get("RESULT_CACHE_SPILL_DIR", "")
+RESULT_CACHE_SPILL_MAX_MB = float(os.getenv("RESULT_CACHE_SPILL_MAX_MB") or st.secrets.get("RESULT_CACHE_SPILL_MAX_MB", RESULT_CACHE_MAX_MB))
+DATA_VERSION_TTL = int(os.getenv("DATA_VERSION_TTL") or st.secrets.get("DATA_VERSION_TTL", 60))
+
+# 비교 모드: 여러 회사/연도 질문을 하위 쿼리로 나눠 동시 실행 (동시 실행 수, 하위 쿼리당 타임아웃 초)
+COMPARE_MODE = (os.getenv("COMPARE_MODE") or str(st.secrets.get("COMPARE_MODE", "1"))) not in ("0", "false", "False")
+COMPARE_CONCURRENCY = int(os.getenv("COMPARE_CONCURRENCY") or st.secrets.get("COMPARE_CONCURRENCY", 6))
+COMPARE_TIMEOUT_S = float(os.getenv("COMPARE_TIMEOUT_S") or st.secrets.get("COMPARE_TIMEOUT_S", 10))
+
+# 조회 결과 제한: 최대 행 수(넘으면 잘라서 표시), 서버 측 커서 청크 크기, 조회당 statement_timeout(ms)
+RUN_SQL_MAX_ROWS = int(os.getenv("RUN_SQL_MAX_ROWS") or st.secrets.get("RUN_SQL_MAX_ROWS", 5000))
+RUN_SQL_CHUNK_ROWS = int(os.getenv("RUN_SQL_CHUNK_ROWS") or st.secrets.get("RUN_SQL_CHUNK_ROWS", 1000))
+RUN_SQL_TIMEOUT_MS = int(os.getenv("RUN_SQL_TIMEOUT_MS") or st.secrets.get("RUN_SQL_TIMEOUT_MS", DB_STATEMENT_TIMEOUT_MS))
+
+# 차트: 최대 점 개수(넘으면 시리즈별 LTTB 다운샘플), 표시할 최대 회사/시리즈 수
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS") or st.secrets.get("CHART_MAX_POINTS", 1000))
+CHART_TOP_N = int(os.getenv("CHART_TOP_N") or st.secrets.get("CHART_TOP_N", 10))
+
+# 회사 × 결산년월 × 지표 피벗 스냅샷 (로컬 Parquet) — 규칙/단일 호출 SQL 은 원격 DB 없이 응답
+ROLLUP_ENABLED = (os.getenv("ROLLUP_ENABLED") or str(st.secrets.get("ROLLUP_ENABLED", "1"))) not in ("0", "false", "False")
+ROLLUP_PATH = os.getenv("ROLLUP_PATH") or st.secrets.get("ROLLUP_PATH", ".cache/kics_rollup.parquet")
+
+# 세션 간 동시에 들어온 같은 질문은 SQL 생성/조회/요약을 한 번만 실행하고 결과 공유 (single-flight)
+REQUEST_COALESCING = (os.getenv("REQUEST_COALESCING") or str(st.secrets.get("REQUEST_COALESCING", "1"))) not in ("0", "false", "False")
+
+# 대화 모드: 세션별 최근 질문/결과를 기억해 '그럼 삼성생명은?' 같은 후속 질문은 LLM 없이 슬롯만 고쳐 답한다
+CONVERSATION_MODE = (os.getenv("CONVERSATION_MODE") or str(st.secrets.get("CONVERSATION_MODE", "1"))) not in ("0", "false", "False")
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS") or st.secrets.get("CONVERSATION_MAX_TURNS", 5))
+CONVERSATION_MAX_MB = float(os.getenv("CONVERSATION_MAX_MB") or st.secrets.get("CONVERSATION_MAX_MB", 32))
+
+# 질문→SQL 캐시 (SQLite 파일, TTL 초 / 최대 항목 수)
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH") or st.secrets.get("SQL_CACHE_PATH", ".cache/sql_cache.sqlite3")
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL") or st.secrets.get("SQL_CACHE_TTL", 7 * 24 * 3600))
+SQL_CACHE_MAX = int(os.getenv("SQL_CACHE_MAX") or st.secrets.get("SQL_CACHE_MAX", 500))
+
 if not OPENAI_API_KEY:
     st.error("OPENAI_API_KEY 설정이 되어 있지 않습니다.")
     st.stop()
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+# LLM 게이트웨이 — 모델 계층(SQL/요약 모델 분리), 모델별 분당 요청 수, 재시도, 헤징 (OPENAI_BASE_URL 로 가짜 서버에 붙일 수 있음)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or st.secrets.get("OPENAI_BASE_URL", "") or None
+LLM_MODEL = os.getenv("LLM_MODEL") or st.secrets.get("LLM_MODEL", "gpt-4o-mini")
+LLM_SQL_MODEL = os.getenv("LLM_SQL_MODEL") or st.secrets.get("LLM_SQL_MODEL", LLM_MODEL)
+LLM_SUMMARY_MODEL = os.getenv("LLM_SUMMARY_MODEL") or st.secrets.get("LLM_SUMMARY_MODEL", LLM_MODEL)
+LLM_RPM = float(os.getenv("LLM_RPM") or st.secrets.get("LLM_RPM", 500))
+LLM_RPM_BY_MODEL = os.getenv("LLM_RPM_BY_MODEL") or st.secrets.get("LLM_RPM_BY_MODEL", "")   # "gpt-4o=100,gpt-4o-mini=500"
+LLM_BURST = int(os.getenv("LLM_BURST") or st.secrets.get("LLM_BURST", 10))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES") or st.secrets.get("LLM_MAX_RETRIES", 3))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S") or st.secrets.get("LLM_TIMEOUT_S", 60))
+LLM_HEDGE = (os.getenv("LLM_HEDGE") or str(st.secrets.get("LLM_HEDGE", "0"))) in ("1", "true", "True")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE") or st.secrets.get("LLM_HEDGE_QUANTILE", 95))
+
+# 첫 렌더 뒤 스키마/에이전트/풀을 백그라운드에서 미리 준비 (0 이면 첫 질문 때 준비)
+APP_WARMUP = (os.getenv("APP_WARMUP") or str(st.secrets.get("APP_WARMUP", "1"))) not in ("0", "false", "False")
+
+# 요약/슬롯 추출(OpenAI SDK)과 SQL 에이전트(ChatOpenAI)가 같은 게이트웨이를 지난다 (프로세스 공용)
+@st.cache_resource(show_spinner=False)
+def get_llm_gateway():
+    from llm_gateway import GatewayConfig, LLMGateway, parse_rpm
+    return LLMGateway(GatewayConfig(
+        default_rpm=LLM_RPM,
+        rpm=parse_rpm(LLM_RPM_BY_MODEL),
+        burst=LLM_BURST,
+        max_retries=LLM_MAX_RETRIES,
+        hedge=LLM_HEDGE,
+        hedge_quantile=LLM_HEDGE_QUANTILE,
+    ))
+
+# 모든 chat.completions 호출의 횟수/토큰을 현재 트레이스 span 에 기록
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    from openai import OpenAI
+    return TracedChatClient(OpenAI(
+        api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0, timeout=LLM_TIMEOUT_S,
+        http_client=get_llm_gateway().http_client(LLM_TIMEOUT_S),
+    ))
 
 # ====== LangChain용 DB/LLM/에이전트 초기화 ======
 SQLALCHEMY_URI = (
@@ -48,75 +159,159 @@ SQLALCHEMY_URI = (
     "?sslmode=require"
 )
 
-AGENT_PREFIX = """
-당신은 PostgreSQL SQL 전문가다. 다음 규칙을 반드시 지켜라.
-
-- 오직 'SELECT'만 작성한다. (INSERT/UPDATE/DELETE/ALTER/DROP/CREATE/GRANT/REVOKE/TRUNCATE 금지)
-- 결과는 SQL만 내보낸다. 백틱/설명/자연어/코드블록/주석 없이 SQL 한 문장만 출력한다.
-- 대상 테이블: kics_solvency_data_flexible
-- 시계열을 조회할 때는 항상 ORDER BY date를 포함한다.
-- 한국어 질의의 의미를 스스로 판단해 컬럼/값을 매핑한다.
-  예: '매출/수익'→ metric='revenue', '자산'→ 'assets', '부채'→ 'liabilities', 'K-ICS/킥스'→ 'k_ics'
-- 회사명/약칭/별칭 등은 사용자가 한국어로 적더라도 스스로 합리적 company_code를 추론한다. (모호하면 LIMIT 300으로 시작)
-- SELECT * 대신 필요한 컬럼만 선택하고, where 절에 기간/회사/지표 필터를 상식적으로 건다.
-- 첫 토큰은 반드시 SELECT, CTE/WITH/EXPLAIN 금지. 세미콜론은 최대 1개만 허용.
-- 사용자가 'YYYY년 MM월'또는 '2024.12' 또는 'YY년 MM월'을 입력하면 반드시 'closing_ym = YYYYMM'으로 변환한다.
-- 날짜 변환 규칙:
-  - 'YYYY년 MM월' → closing_ym = YYYYMM
-  - 'YY년 MM월' → 아래 규칙으로 변환:
-    - YY가 00~24이면 20YYMM (예: 23년 6월 → 202306)
-    - YY가 25~99이면 20YYMM (예: 25년 6월 → 202506)
-  - 'YYYY.MM' → closing_ym = YYYYMM
-  - 'YY.MM' → 위와 동일한 규칙 적용
-- 최근 연말로 추정하거나 자동 보정하지 않는다.
-- 회사명은 "미래에셋생명,흥국화재,한화생명,한화손해,iM라이프생명,흥국생명,메리츠화재,KB생명,신한생명,DB생명,하나생명,BNP생명,푸본현대생명,ABL생명,DB손해,동양생명,농협생명,삼성화재,교보라이프플래닛생명,메트라이프생명,처브라이프생명보험,AIA생명,현대해상,교보생명,롯데손해,KDB생명,라이나생명,IBK생명,코리안리,KB손해,삼성생명,농협손보"로 DB에 저장되어있다.
-""".strip()
-
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=OPENAI_API_KEY)
+KICS_TABLE = "kics_solvency_data_flexible"
+
+@st.cache_resource(show_spinner=False)
+def get_llm():
+    return make_llm(OPENAI_API_KEY, LLM_SQL_MODEL, http_client=get_llm_gateway().http_client(LLM_TIMEOUT_S),
+                    base_url=OPENAI_BASE_URL, timeout_s=LLM_TIMEOUT_S)
+
+@st.cache_resource(show_spinner=False)
+def get_db_engine():
+    # run_sql 과 LangChain SQLDatabase 가 함께 쓰는 프로세스 공용 풀
+    from db import create_pooled_engine, warm_pool
+
+    engine = create_pooled_engine(
+        SQLALCHEMY_URI,
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+        pool_timeout=DB_POOL_TIMEOUT,
+        statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+    )
+    warm_pool(engine, DB_POOL_MIN)
+    return engine
 
 @st.cache_resource(show_spinner=False)
 def get_lc_db():
-    return SQLDatabase.from_uri(SQLALCHEMY_URI)
+    return make_lc_db(get_db_engine(), KICS_TABLE)
+
+@st.cache_resource(show_spinner=False)
+def get_sql_cache():
+    return SQLCache(SQL_CACHE_PATH, ttl_seconds=SQL_CACHE_TTL, max_entries=SQL_CACHE_MAX)
+
+# 스키마(CREATE TABLE) + 샘플 행 스냅샷 — TTL 마다 새로 조회
+@st.cache_resource(show_spinner=False, ttl=SCHEMA_REFRESH_SECONDS)
+def get_schema_snapshot() -> str:
+    return get_lc_db().get_table_info([KICS_TABLE])
+
+# 스냅샷이 바뀔 때만 새로 빌드 (프로세스당 1개)
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _build_sql_agent(schema: str):
+    return build_sql_agent(get_llm(), get_lc_db(), schema, get_pipeline().config)
 
 def get_sql_agent():
-    return create_sql_agent(
-        llm=llm,
-        db=get_lc_db(),
-        agent_type="openai-tools",
-        verbose=False,
-        prefix=AGENT_PREFIX,
+    return _build_sql_agent(get_schema_snapshot())
+
+@st.cache_resource(show_spinner=False)
+def get_summary_cache():
+    from summary_cache import SummaryCache
+    # 요약 모델/토큰 예산/프롬프트가 바뀌면 네임스페이스가 달라져 예전 요약을 재사용하지 않는다
+    return SummaryCache(SUMMARY_CACHE_PATH, ttl_seconds=SUMMARY_CACHE_TTL, namespace=get_pipeline().summary_config_key())
+
+def summary_cache_bypassed() -> bool:
+    return SUMMARY_CACHE_BYPASS or st.query_params.get("summary_cache") == "off"
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    from result_cache import ResultCache
+    return ResultCache(max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024), spill_dir=RESULT_CACHE_SPILL_DIR or None,
+                       spill_max_bytes=int(RESULT_CACHE_SPILL_MAX_MB * 1024 * 1024))
+
+@st.cache_resource(show_spinner=False)
+def get_rollup():
+    from rollup import RollupStore
+    return RollupStore(get_db_engine(), ROLLUP_PATH) if ROLLUP_ENABLED else None
+
+@st.cache_resource(show_spinner=False)
+def get_tracer():
+    return Tracer(TRACE_LOG_PATH, max_bytes=int(TRACE_LOG_MAX_MB * 1024 * 1024), log_questions=TRACE_LOG_QUESTIONS)
+
+@st.cache_resource(show_spinner=False)
+def get_engine_stats():
+    return EngineStats()
+
+@st.cache_resource(show_spinner=False)
+def get_coalescer():
+    from singleflight import SingleFlight
+    return SingleFlight() if REQUEST_COALESCING else None
+
+# 질문 → SQL → 조회 → 요약 파이프라인 (프로세스 공용 — 캐시/풀/트레이서를 주입)
+@st.cache_resource(show_spinner=False)
+def get_pipeline():
+    from pipeline import Pipeline, PipelineConfig
+
+    config = PipelineConfig(
+        table=KICS_TABLE,
+        company_col=KICS_COMPANY_COL,
+        ym_col=KICS_YM_COL,
+        metric_col=KICS_METRIC_COL,
+        value_col=KICS_VALUE_COL,
+        sql_engine=SQL_ENGINE,
+        model=LLM_MODEL,
+        sql_model=LLM_SQL_MODEL,
+        summary_model=LLM_SUMMARY_MODEL,
+        summary_token_budget=SUMMARY_TOKEN_BUDGET,
+        summary_sample_rows=SUMMARY_SAMPLE_ROWS,
+        schema_refresh_seconds=SCHEMA_REFRESH_SECONDS,
+        data_version_ttl=DATA_VERSION_TTL,
+        compare_concurrency=COMPARE_CONCURRENCY,
+        compare_timeout_s=COMPARE_TIMEOUT_S,
+        max_rows=RUN_SQL_MAX_ROWS,
+        fetch_chunk_rows=RUN_SQL_CHUNK_ROWS,
+        statement_timeout_ms=RUN_SQL_TIMEOUT_MS,
     )
+    pipe = Pipeline(
+        get_openai_client(),
+        get_db_engine(),
+        config,
+        sql_cache=get_sql_cache(),
+        result_cache=get_result_cache(),
+        tracer=get_tracer(),
+        stats=get_engine_stats(),
+        agent_factory=get_sql_agent,
+        rollup=get_rollup(),
+        coalescer=get_coalescer(),
+    )
+    # 스냅샷은 백그라운드에서 증분 갱신 (끝나기 전까지는 원격 DB 로 응답)
+    if pipe.rollup is not None and pipe.table_spec() is not None:
+        pipe.rollup.refresh_async(pipe.table_spec())
+    return pipe
+
+# 첫 렌더 뒤 백그라운드 예열 — 무거운 import, 풀/테이블 스펙/롤업, 스키마 스냅샷, SQL 에이전트를 미리 준비
+# (프로세스당 1번. 예열이 끝나기 전에 질문이 오면 같은 cache_resource 게터가 그 자리에서 준비)
+def _import_heavy():
+    import altair  # noqa: F401
+    import chart_prep  # noqa: F401
+    import pipeline  # noqa: F401
+
+def _warmup(steps: dict):
+    t_all = time.perf_counter()
+    for name, fn in (
+        ("import", _import_heavy),
+        ("pipeline", get_pipeline),
+        ("schema", get_schema_snapshot),
+        ("agent", get_sql_agent),
+    ):
+        t0 = time.perf_counter()
+        try:
+            fn()
+            steps[name] = round(time.perf_counter() - t0, 3)
+        except Exception as e:  # 예열 실패는 무시 — 첫 질문 때 다시 시도하고 거기서 오류를 보여준다
+            steps[name] = f"{type(e).__name__}: {e}"
+            logger.warning("warmup %s failed: %s", name, e)
+    steps["total_s"] = round(time.perf_counter() - t_all, 3)
+    logger.info("warmup: %s", json.dumps(steps, ensure_ascii=False))
+    get_tracer().event("warmup", steps["total_s"] * 1000, **{k: v for k, v in steps.items() if k != "total_s"})
+
+@st.cache_resource(show_spinner=False)
+def start_warmup() -> dict:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# ----------------- 유틸: 출력 정리/검증 -----------------
-def _strip_code_fences(text: str) -> str:
-    t = text.strip()
-    t = re.sub(r"^```[a-zA-Z]*\s*", "", t)
-    t = re.sub(r"\s*```$", "", t)
-    return t.strip()
-
-def _remove_sql_comments(sql: str) -> str:
-    sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.S)
-    sql = re.sub(r"^\s*--.*?$", "", sql, flags=re.M)
-    return sql.strip()
-
-def _extract_first_select(text: str) -> str:
-    cleaned = _remove_sql_comments(_strip_code_fences(text))
-    m = re.search(r"(?is)\bselect\b", cleaned)
-    if not m:
-        return cleaned.strip()
-    start = m.start()
-    tail = cleaned[start:]
-    semi = re.search(r";", tail)
-    return (tail[:semi.start()] if semi else tail).strip()
-
-def _validate_sql_is_select(sql: str):
-    if sql.count(";") > 1:
-        raise ValueError("Multiple statements are not allowed.")
-    if not re.match(r"(?is)^\s*select\b", sql):
-        raise ValueError("Only SELECT queries are allowed.")
-    banned = r"(?is)\b(insert|update|delete|drop|alter|create|grant|revoke|truncate|copy|into|explain|with)\b"
-    if re.search(banned, sql):
-        raise ValueError("Blocked SQL keyword detected.")
+    steps = {}
+    thread = threading.Thread(target=_warmup, args=(steps,), name="app-warmup", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())  # cache_resource 게터의 "missing ScriptRunContext" 경고 방지
+    thread.start()
+    return steps
 
 # ----------------- 페이지/테마 -----------------
 st.set_page_config(page_title="보험사 경영공시 챗봇", page_icon="📊", layout="centered")
@@ -309,52 +504,213 @@ st.markdown("""
 # ===================== 입력 섹션 =====================
 st.markdown('<div class="section">', unsafe_allow_html=True)
 
-# ----------------- SQL 생성 (LangChain Agent) -----------------
+# ----------------- SQL 생성 / 실행 / 요약 (pipeline.Pipeline) -----------------
 def generate_sql(user_question: str) -> str:
-    sql_agent = get_sql_agent()
-    result = sql_agent.invoke({"input": user_question})
-
-    if isinstance(result, dict):
-        text = result.get("output") or result.get("final_answer") or json.dumps(result, ensure_ascii=False)
-    else:
-        text = str(result)
-
-    sql = _extract_first_select(text)
-    _validate_sql_is_select(sql)
-
+    meta = {}
+    sql = get_pipeline().generate_sql(user_question, meta)
+    st.session_state["sql_engine"] = meta["engine"]
+    st.session_state["sql_coalesced"] = meta["coalesced"]
     return sql
 
 def run_sql(sql: str) -> pd.DataFrame:
-    with psycopg.connect(
-        host=DB_HOST,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        port=DB_PORT,
-        sslmode="require",
-    ) as conn:
-        return pd.read_sql_query(sql, conn)
-
-# ----------------- 요약 생성 -----------------
-def summarize_answer(q: str, df: pd.DataFrame) -> str:
-    preview_csv = df.to_csv(index=False)
-    prompt = f"""
-질문: {q}
-너는 뛰어난 재무분석가이자 데이터 시각화 전문가야.
-다음 CSV 데이터를 기반으로, 트렌드를 분석해 **한국어로 요약**해줘.
-- 수치의 단위와 기간을 반드시 명시해.
-- 데이터 패턴(증가/감소, 최고점, 평균 등)을 설명해.
-- 이후 Python 코드가 차트를 자동 생성할 것이므로, 시각화에 필요한 주요 컬럼 1~2개를 명시적으로 언급해.
-예: 'closing_ym'을 X축으로, 'k_ics_ratio'를 Y축으로 사용하면 좋겠다.
-CSV 일부 샘플:
-{preview_csv}
-"""
-    r = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
+    info = {}
+    df = get_pipeline().run_sql(sql, info)
+    st.session_state["fetch_info"] = info
+    return df
+
+def plan_comparison(user_question: str):
+    if not COMPARE_MODE:
+        return None
+    plan = get_pipeline().plan_comparison(user_question)
+    if plan is not None:
+        st.session_state["sql_engine"] = "compare"
+    return plan
+
+def run_comparison(plan) -> pd.DataFrame:
+    info = {}
+    df = get_pipeline().run_comparison(plan, info)
+    st.session_state["compare_info"] = info
+    return df
+
+# 대화 기록은 세션마다 따로 (cache_resource 가 아니라 session_state)
+def get_conversation():
+    if "conversation" not in st.session_state:
+        from conversation import Conversation
+        st.session_state["conversation"] = Conversation(CONVERSATION_MAX_TURNS, int(CONVERSATION_MAX_MB * 1024 * 1024))
+    return st.session_state["conversation"]
+
+def answer_followup(user_question: str):
+    # 후속 질문이면 (SQL, DataFrame), 아니면 None
+    if not CONVERSATION_MODE:
+        return None
+    info = {}
+    answer = get_pipeline().answer_followup(user_question, get_conversation(), info)
+    if answer is not None:
+        st.session_state["sql_engine"] = "followup"
+        st.session_state["sql_coalesced"] = False
+        st.session_state["followup_info"] = info
+    return answer
+
+def record_turn(user_question: str, sql: str, df: pd.DataFrame, info: dict):
+    if CONVERSATION_MODE:
+        get_pipeline().record_turn(get_conversation(), user_question, sql, df, info)
+
+def summarize_answer(q: str, df: pd.DataFrame, info: dict = None) -> str:
+    return get_pipeline().summarize_answer(q, df, info)
+
+def stream_summary(q: str, df: pd.DataFrame, info: dict = None):
+    return get_pipeline().stream_summary(q, df, info)
+
+def summary_card_html(summary: str) -> str:
+    # 들여쓰기가 있으면 마크다운 코드블록으로 렌더링되므로 한 줄 HTML + 빈 줄로 본문 분리
+    return (
+        '<div style="background-color:#F5F6F8; color:#0F172A; padding:18px 22px; border-radius:12px; '
+        'font-size:16px; line-height:1.6em; border:1px solid #E5E7EB;">\n\n'
+        f"{summary}\n\n</div>"
     )
-    return r.choices[0].message.content.strip()
+
+# ----------------- 후처리 병렬화: 요약 LLM 은 백그라운드, 차트/표는 스크립트 스레드 -----------------
+@st.cache_resource(show_spinner=False)
+def get_stage_executor():
+    return ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="summary")
+
+def start_summary(q: str, df: pd.DataFrame):
+    # 요약 조각을 큐로 흘려보내는 백그라운드 작업 시작 → (큐, future, info)
+    chunks, info = queue.Queue(), {}
+
+    def _work():
+        try:
+            with get_tracer().span("summarize_answer", cache_hit=False, streamed=SUMMARY_STREAM, rows=len(df)):
+                if SUMMARY_STREAM:
+                    for piece in stream_summary(q, df, info):
+                        chunks.put(piece)
+                else:
+                    chunks.put(summarize_answer(q, df, info))
+        finally:
+            chunks.put(None)
+
+    # 현재 트레이스(pipeline span)를 백그라운드 스레드로 이어받는다
+    ctx = contextvars.copy_context()
+    return chunks, get_stage_executor().submit(ctx.run, _work), info
+
+def drain_summary(placeholder, job) -> str:
+    # 회색 카드를 조각이 올 때마다 다시 그린다 (웹소켓 과부하 방지를 위해 50ms 간격)
+    chunks, future, info = job
+    text, last = "", 0.0
+    while (piece := chunks.get()) is not None:
+        text += piece
+        now = time.perf_counter()
+        if now - last >= 0.05:
+            placeholder.markdown(summary_card_html(text + "▌"), unsafe_allow_html=True)
+            last = now
+    future.result()  # 작업 중 예외가 있으면 여기서 다시 발생
+    st.session_state["summary_prompt"] = info.pop("prompt", "")
+    st.session_state["summary_tokens"] = info
+    return text.strip()
+
+def render_chart(df: pd.DataFrame):
+    # ✅ Altair 기반 시각화 (matplotlib 제거) — 차트용 데이터는 chart_prep 에서 역할 추론/날짜 변환/점 개수 제한
+    import altair as alt
+    alt.themes.enable('none')  # Streamlit 다크모드 테마 비활성화
+
+    from chart_prep import prepare_chart
+
+    try:
+        cd = prepare_chart(df, max_points=CHART_MAX_POINTS, top_n=CHART_TOP_N, ym_col=KICS_YM_COL)
+        axis = dict(labelColor="#0F172A", titleColor="#0F172A")
+
+        # --- 1️⃣ 회사별 분포 (막대그래프) ---
+        if cd.kind == "bar":
+            x_col, y_col = cd.x, cd.y
+            st.markdown("### 📊 데이터 분포 (회사별)")
+
+            # 공통 옵션: 글자색 검정, 축색 검정
+            bar = (
+                alt.Chart()
+                .mark_bar(color="#0064FF")
+                .encode(
+                    x=alt.X(f"{x_col}:N", sort='-y', title=x_col, axis=alt.Axis(**axis)),
+                    y=alt.Y(f"{y_col}:Q", title=y_col, axis=alt.Axis(**axis)),
+                    tooltip=[x_col, y_col]
+                )
+            )
+
+            # ✅ 수치 라벨 추가 (Altair text layer)
+            text = (
+                alt.Chart()
+                .mark_text(
+                    align='center',
+                    baseline='bottom',
+                    dy=-3,
+                    color="#0F172A",
+                    fontSize=10
+                )
+                .encode(x=alt.X(f"{x_col}:N", sort='-y'), y=f"{y_col}:Q", text=alt.Text(f"{y_col}:Q", format=".1f"))
+            )
+
+            # 두 레이어가 데이터셋 하나를 공유 (스펙에 한 번만 직렬화)
+            chart = alt.layer(bar, text, data=cd.data).properties(width="container", height=400, background="#F5F6F8")
+
+        # --- 2️⃣ 시계열 추이 (선그래프) ---
+        elif cd.kind == "line":
+            x_col, y_col = cd.x, cd.y
+            st.markdown("### 📈 시계열 추이")
+
+            enc = dict(
+                x=alt.X(f"{x_col}:T", title=x_col, axis=alt.Axis(format="%Y-%m", **axis)),
+                y=alt.Y(f"{y_col}:Q", title=y_col, axis=alt.Axis(**axis)),
+                tooltip=([cd.color] if cd.color else []) + [alt.Tooltip(f"{x_col}:T", format="%Y-%m"), y_col],
+            )
+            if cd.color:
+                enc["color"] = alt.Color(f"{cd.color}:N", title=cd.color)
+            line_kw = {} if cd.color else {"color": "#0064FF"}
+            chart = (
+                alt.Chart(cd.data)
+                .mark_line(point=True, **line_kw)
+                .encode(**enc)
+                .properties(width="container", height=400, background="#F5F6F8")
+            )
+        else:
+            return
+
+        st.altair_chart(chart, use_container_width=True)
+        # 예전처럼 원본 df 를 레이어마다 넣었을 때(막대+라벨 = 2벌)와 비교
+        layers = 2 if cd.kind == "bar" else 1
+        info = dict(cd.info, spec_bytes=len(chart.to_json(validate=False)), raw_payload_bytes=cd.info["raw_payload_bytes"] * layers)
+        st.session_state["chart_info"] = info
+        get_tracer().event("chart_payload", 0.0, rows=info["rows_in"], points=info["points"],
+                           spec_bytes=info["spec_bytes"], methods=",".join(info["methods"]))
+
+    except Exception as e:
+        st.info(f"차트를 생성할 수 없습니다: {e}")
+
+def render_summary_details():
+    if st.session_state.get("summary_tokens", {}).get("cached"):
+        sc = get_summary_cache().stats()
+        st.caption(
+            f"요약 캐시 적중 — LLM 호출 없음 · hit {sc['hits']} / miss {sc['misses']} · 항목 {sc['entries']}"
+        )
+    if st.session_state.get("summary_prompt"):
+        st.code(st.session_state["summary_prompt"].strip(), language="markdown")
+        ti = st.session_state.get("summary_tokens", {})
+        st.caption(
+            f"요약 입력: {ti.get('rows')}행 → 시리즈 {ti.get('series_sent')}/{ti.get('series')}개 + "
+            f"샘플 {ti.get('sample_rows_sent')}행 · 프롬프트 {ti.get('prompt_tokens')} 토큰 "
+            f"(전체 CSV 추정 {ti.get('full_csv_tokens')} 토큰) · 응답 {ti.get('completion_tokens', '-')} 토큰 · "
+            f"첫 토큰 {ti.get('ttft_s', '-')}s / 전체 {ti.get('total_s', '-')}s"
+        )
+    ci = st.session_state.get("chart_info")
+    if ci:
+        st.caption(
+            f"차트 데이터: {ci['rows_in']:,}행 → {ci['points']:,}점 (시리즈 {ci['series_shown']}/{ci['series_total']}"
+            + (f", {'·'.join(ci['methods'])}" if ci["methods"] else "") + ") · "
+            f"데이터 {ci['payload_bytes'] / 1024:.1f} KB (원본 그대로면 약 {ci['raw_payload_bytes'] / 1024:.1f} KB) · "
+            f"전체 스펙 {ci['spec_bytes'] / 1024:.1f} KB"
+            + (f" · 제외 지표 {', '.join(ci['metrics_dropped'])}" if ci.get("metrics_dropped") else "")
+        )
+    tm = st.session_state.get("stage_timings")
+    if tm:
+        st.caption("단계별 시간: " + " · ".join(f"{k} {v}s" for k, v in tm.items()))
 
 
 # ----------------- 입력창 -----------------
@@ -385,12 +741,26 @@ if go_btn:
         # ✅ 진행상황 표시 (최종 결과 후 자동 제거)
         status_placeholder = st.empty()  # 임시 공간
 
-        with status_placeholder.container():
+        with status_placeholder.container(), get_tracer().span("pipeline", question=q):
             with st.status("진행 중입니다...", expanded=True) as status:
                 # 1) SQL 생성
                 try:
                     status.write("① SQL 생성 중...")
-                    sql = generate_sql(q)
+                    timings = {}
+                    t0 = time.perf_counter()
+                    st.session_state.pop("compare_info", None)
+                    st.session_state.pop("fetch_info", None)
+                    st.session_state.pop("chart_info", None)
+                    st.session_state.pop("followup_info", None)
+                    # 직전 질문을 이어받는 후속 질문은 슬롯만 고치고 이전 결과를 재사용 (조회까지 여기서 끝남)
+                    plan, followup = None, answer_followup(q)
+                    if followup is not None:
+                        sql = followup[0]
+                    else:
+                        # 여러 회사/연도 비교 질문은 하위 쿼리로 나눠 동시 실행 (아니면 단일 SQL 생성)
+                        plan = plan_comparison(q)
+                        sql = plan.sql if plan is not None else generate_sql(q)
+                    timings["sql_s"] = round(time.perf_counter() - t0, 3)
                     st.session_state["sql"] = sql
                     status.update(label="SQL 생성 완료 ✅", state="running")
                 except Exception as e:
@@ -402,8 +772,23 @@ if go_btn:
                 # 2) SQL 실행
                 try:
                     status.write("② 데이터 조회 중...")
-                    df = run_sql(st.session_state["sql"])
+                    t0 = time.perf_counter()
+                    if followup is not None:
+                        df = followup[1]
+                        st.session_state["fetch_info"] = st.session_state["followup_info"]
+                    else:
+                        df = run_comparison(plan) if plan is not None else run_sql(st.session_state["sql"])
+                    timings["db_s"] = round(time.perf_counter() - t0, 3)
+                    failed = st.session_state.get("compare_info", {}).get("errors")
+                    if failed:
+                        with result_area:
+                            st.warning("일부 하위 조회 실패: " + ", ".join(f"{k}({v})" for k, v in failed.items()))
+                    fi = st.session_state.get("fetch_info") or st.session_state.get("compare_info") or {}
+                    if fi.get("truncated"):
+                        with result_area:
+                            st.warning(f"조회 결과가 {RUN_SQL_MAX_ROWS:,}행을 넘어 앞부분 {len(df):,}행만 표시합니다. 조건을 좁혀 다시 질문해 주세요.")
                     st.session_state["df"] = df
+                    record_turn(q, sql, df, fi)
                     status.update(label="데이터 조회 완료 ✅", state="running")
                 except Exception as e:
                     status.update(label="DB 실행 오류 ❌", state="error")
@@ -417,128 +802,134 @@ if go_btn:
                         status.write("③ 요약 생성 중...")
 
                         with result_area:
-                            with st.spinner("요약 생성 중..."):
-                                summary = summarize_answer(q, df)
-
+                            with st.container():
                                 # ✅ 최종 요약 결과 표시
-                                # ✅ 요약결과를 밝은 회색 카드로 표시
-                                st.markdown(
-                                    f"""
-                                    <div style="
-                                        background-color:#F5F6F8;
-                                        color:#0F172A;
-                                        padding:18px 22px;
-                                        border-radius:12px;
-                                        font-size:16px;
-                                        line-height:1.6em;
-                                        border:1px solid #E5E7EB;
-                                        ">
-                                        {summary}
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-                                )
-
-                                st.session_state["summary"] = summary
-
-
-                                # ✅ Altair 기반 시각화 (matplotlib 제거)
-                                import altair as alt
-                                alt.themes.enable('none')  # Streamlit 다크모드 테마 비활성화
-
-
-                                try:
-                                    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                                    date_cols = [c for c in df.columns if re.search(r"(date|ym|month|year)", c, re.I)]
-                                    cat_cols = [c for c in df.columns if re.search(r"(name|company|보험|사명)", c, re.I)]
-
-                                    # --- 1️⃣ 회사별 분포 (막대그래프) ---
-                                    if numeric_cols and cat_cols:
-                                        x_col = cat_cols[0]
-                                        y_col = numeric_cols[0]
-                                        st.markdown("### 📊 데이터 분포 (회사별)")
-
-                                        # 공통 옵션: 글자색 검정, 축색 검정
-                                        chart = (
-                                            alt.Chart(df)
-                                            .mark_bar(color="#0064FF")
-                                            .encode(
-                                                x=alt.X(x_col, sort='-y', title=x_col, axis=alt.Axis(labelColor="#0F172A", titleColor="#0F172A")),
-                                                y=alt.Y(y_col, title=y_col, axis=alt.Axis(labelColor="#0F172A", titleColor="#0F172A")),
-                                                tooltip=[x_col, y_col]
-                                            )
-                                            .properties(width="container", height=400, background="#F5F6F8")  # 밝은 회색 배경
-                                        )
-
-
-                                        # ✅ 수치 라벨 추가 (Altair text layer)
-                                        text = (
-                                            alt.Chart(df)
-                                            .mark_text(
-                                                align='center',
-                                                baseline='bottom',
-                                                dy=-3,
-                                                color="#0F172A",
-                                                fontSize=10
-                                            )
-                                            .encode(x=x_col, y=y_col, text=alt.Text(y_col, format=".1f"))
-                                        )
-
-                                        st.altair_chart(chart + text, use_container_width=True)
-
-                                    # --- 2️⃣ 시계열 추이 (선그래프) ---
-                                    elif numeric_cols and date_cols:
-                                        x_col = date_cols[0]
-                                        y_col = numeric_cols[0]
-                                        st.markdown("### 📈 시계열 추이")
-
-                                        line = (
-                                            alt.Chart(df)
-                                            .mark_line(color="#0064FF", point=True)
-                                            .encode(
-                                                x=alt.X(x_col, title=x_col, axis=alt.Axis(labelColor="#0F172A", titleColor="#0F172A")),
-                                                y=alt.Y(y_col, title=y_col, axis=alt.Axis(labelColor="#0F172A", titleColor="#0F172A")),
-                                                tooltip=[x_col, y_col]
-                                            )
-                                            .properties(width="container", height=400, background="#F5F6F8")
-                                        )
-
-
-                                        st.altair_chart(line, use_container_width=True)
-
-                                except Exception as e:
-                                    st.info(f"차트를 생성할 수 없습니다: {e}")
+                                # ✅ 요약결과를 밝은 회색 카드로 표시 (스트리밍 모드면 토큰 단위로 갱신)
+                                summary_card = st.empty()
+                                # 같은 질문 + 같은 결과면 LLM 호출 없이 캐시된 요약 사용
+                                bypass = summary_cache_bypassed()
+                                job = None
+                                t_post = time.perf_counter()
+                                summary = None if bypass else get_summary_cache().get(q, df)
+                                if summary is not None:
+                                    get_tracer().event(
+                                        "summarize_answer", (time.perf_counter() - t_post) * 1000, cache_hit=True, rows=len(df)
+                                    )
+                                    st.session_state.pop("summary_prompt", None)
+                                    st.session_state["summary_tokens"] = {"cached": True}
+                                else:
+                                    # 요약 LLM 호출은 백그라운드에서 시작하고, 그동안 차트/표를 먼저 그린다
+                                    job = start_summary(q, df)
+                                    summary_card.markdown(summary_card_html("요약 생성 중..."), unsafe_allow_html=True)
+
+                                t0 = time.perf_counter()
+                                with get_tracer().span("render_chart", rows=len(df)):
+                                    render_chart(df)
+                                timings["chart_s"] = round(time.perf_counter() - t0, 3)
 
                                 # ✅ 요약 결과 아래에 SQL 쿼리 및 프롬프트/결과 보기 토글 추가
                                 with st.expander("🔍 SQL 요청 및 결과 보기", expanded=False):
                                     st.markdown("### 🧩 생성된 SQL 문")
                                     st.code(st.session_state.get("sql", ""), language="sql")
+                                    cs = get_sql_cache().stats()
+                                    st.caption(
+                                        f"SQL 캐시: hit {cs['hits']} (템플릿 {cs['template_hits']}) · "
+                                        f"miss {cs['misses']} · 적중률 {cs['hit_rate']:.0%} · 항목 {cs['entries']}"
+                                    )
+                                    es = get_engine_stats().snapshot()
+                                    st.caption(
+                                        f"SQL 엔진: {st.session_state.get('sql_engine', '-')} · "
+                                        + " · ".join(f"{e} 평균 {v['avg_s']}s (n={v['count']})" for e, v in es["engines"].items())
+                                        + f" · 폴백률 {es['fallback_rate']:.0%}"
+                                    )
+                                    ui = st.session_state.get("followup_info")
+                                    if ui:
+                                        st.caption(
+                                            f"대화 맥락: 후속 질문 (기준 '{ui['base_question']}') · 출처 {ui['source']} · "
+                                            f"DB 조회 {ui['db_calls']}회 · 기록 {get_conversation().stats()['turns']}개"
+                                        )
+                                    ci = st.session_state.get("compare_info")
+                                    if ci:
+                                        st.caption(
+                                            f"비교 모드: {'회사' if ci['split_by'] == 'company' else '연도'}별 하위 쿼리 {ci['parts']}개 "
+                                            f"(로컬 {ci['cached']}, 실패 {len(ci['errors'])}) · 동시 {COMPARE_CONCURRENCY} · "
+                                            f"가장 느린 {ci['slowest_s']}s / 합계 {ci['sum_s']}s"
+                                        )
+                                    fi = st.session_state.get("fetch_info")
+                                    if fi and "fetch_s" in fi:
+                                        st.caption(
+                                            f"조회: {fi['rows']:,}행 · 청크 {fi['chunks']}개 · 첫 청크 {fi.get('first_chunk_s', '-')}s / "
+                                            f"전체 {fi['fetch_s']}s · 최대 메모리(추정) {fi['peak_bytes'] / 1024:.1f} KB · "
+                                            f"LIMIT {'주입' if fi['limit_injected'] else '유지'}"
+                                            + (" · 잘림" if fi["truncated"] else "")
+                                        )
+                                    rs = get_result_cache().stats()
+                                    st.caption(
+                                        f"결과 캐시: hit {rs['hits']} (디스크 {rs['disk_hits']}) · miss {rs['misses']} · "
+                                        f"항목 {rs['entries']} · {rs['bytes_held'] / 1024:.1f} KB · "
+                                        f"디스크 {rs['spill_entries']}개 {rs['spill_bytes'] / 1024:.1f} KB (삭제 {rs['spill_evicted']}) · "
+                                        f"데이터 버전 {rs['data_version']}"
+                                    )
+                                    ro = get_rollup().stats() if get_rollup() else None
+                                    if ro:
+                                        st.caption(
+                                            f"롤업 스냅샷: 응답 {ro['served']} · 범위 밖 {ro['missed']} · 갱신 대기 {ro['stale']} · "
+                                            f"커버리지 {ro['coverage']:.0%} · {ro['rows']}행/{ro['cells']}셀 · "
+                                            f"마지막 갱신 {ro['last_refresh_mode'] or '-'} {ro['last_refresh_s'] or '-'}s"
+                                            + (f" · 갱신 오류 {ro['last_error']}" if ro["last_error"] else "")
+                                        )
+                                    from db import pool_stats
+                                    ps = pool_stats(get_db_engine())
+                                    st.caption(
+                                        f"DB 풀: 사용 중 {ps['checked_out']}/{DB_POOL_MAX} · 체크아웃 {ps['checkouts']} · "
+                                        f"대기 평균 {ps['wait_avg_ms']}ms (최대 {ps['wait_max_ms']}ms) · "
+                                        f"타임아웃 {ps['timeouts']} · 신규 연결 {ps['new_connections']}"
+                                    )
+                                    for model, g in get_llm_gateway().stats().items():
+                                        st.caption(
+                                            f"LLM {model}: 요청 {g['requests']} · 재시도 {g['retries']} ({g['retry_rate']:.0%}"
+                                            + (", " + ", ".join(f"{k} {v}" for k, v in g["reasons"].items()) if g["reasons"] else "")
+                                            + f") · 실패 {g['failed']} · 대기 {g['throttled']}회 {g['throttle_wait_s']}s · "
+                                            f"p50 {g['p50_ms']}ms / p95 {g['p95_ms']}ms / p99 {g['p99_ms']}ms"
+                                            + (f" · 헤징 {g['hedges']} (승 {g['hedge_wins']}, 기준 {g['hedge_after_ms']}ms)" if LLM_HEDGE else "")
+                                        )
+                                    co = get_coalescer().stats() if get_coalescer() else None
+                                    if co:
+                                        joined = [name for name, flag in (
+                                            ("SQL", st.session_state.get("sql_coalesced")),
+                                            ("조회", (st.session_state.get("fetch_info") or st.session_state.get("compare_info") or {}).get("coalesced")),
+                                            ("요약", st.session_state.get("summary_tokens", {}).get("coalesced")),
+                                        ) if flag]
+                                        st.caption(
+                                            f"동시 요청 합치기: 실행 {co['leaders']} · 합류 {co['followers']} · "
+                                            f"합류 비율 {co['coalescing_ratio']:.0%} · 진행 중 {co['in_flight']}"
+                                            + (f" · 이번 질문 합류: {', '.join(joined)}" if joined else "")
+                                        )
 
                                     st.markdown("### 💬 SQL 생성 프롬프트")
-                                    sql_prompt = AGENT_PREFIX.strip()
+                                    sql_prompt = build_agent_prefix(get_schema_snapshot(), get_pipeline().config)
                                     st.code(sql_prompt, language="markdown")
 
                                     st.markdown("### 💬 요약 생성 프롬프트")
-                                    if "df" in st.session_state:
-                                        sample_preview = st.session_state["df"].head(3).to_csv(index=False)
-                                        summary_prompt = f"""
-                                        질문: {q}
-                                        너는 뛰어난 재무분석가이자 데이터 시각화 전문가야.
-                                        다음 CSV 데이터를 기반으로, 트렌드를 분석해 **한국어로 요약**해줘.
-                                        - 수치의 단위와 기간을 반드시 명시해.
-                                        - 데이터 패턴(증가/감소, 최고점, 평균 등)을 설명해.
-                                        - 이후 Python 코드가 차트를 자동 생성할 것이므로, 시각화에 필요한 주요 컬럼 1~2개를 명시적으로 언급해.
-                                        예: 'closing_ym'을 X축으로, 'k_ics_ratio'를 Y축으로 사용하면 좋겠다.
-                                        CSV 일부 샘플:
-                                {sample_preview}
-                                """
-                                        st.code(summary_prompt.strip(), language="markdown")
+                                    summary_details = st.container()  # 요약이 끝난 뒤 채운다
 
                                     st.markdown("### 📊 쿼리 결과(DataFrame)")
                                     st.dataframe(st.session_state.get("df"), use_container_width=True)
 
+                                if job is not None:
+                                    summary = drain_summary(summary_card, job)
+                                    timings["summary_s"] = st.session_state["summary_tokens"].get("total_s")
+                                    if not bypass:
+                                        get_summary_cache().put(q, df, summary)
+                                summary_card.markdown(summary_card_html(summary), unsafe_allow_html=True)
+                                st.session_state["summary"] = summary
 
-
+                                # 요약/차트를 겹쳐 돌렸으므로 후처리 전체 ≈ max(요약, 차트)
+                                timings["post_query_wall_s"] = round(time.perf_counter() - t_post, 3)
+                                st.session_state["stage_timings"] = timings
+                                logger.info("stage timings: %s", json.dumps(timings))
+                                with summary_details:
+                                    render_summary_details()
 
                         status.update(label="요약 완료 ✅", state="complete")
 
@@ -556,4 +947,8 @@ if go_btn:
 
 
 st.markdown('</div>', unsafe_allow_html=True)  # section 종료
-st.markdown('</div>', unsafe_allow_html=True)  # container-card 종료
\ No newline at end of file
+st.markdown('</div>', unsafe_allow_html=True)  # container-card 종료
+
+# 첫 화면을 그린 뒤에 예열 시작 (이미 시작했으면 no-op)
+if APP_WARMUP:
+    start_warmup()
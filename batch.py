@@ -0,0 +1,473 @@
+# batch.py — 질문 목록 일괄 응답 (헤드리스 배치 리포트: 분기마다 표준 질문 50~200개)
+#
+#   python batch.py questions.jsonl --out reports/2025Q2          # SQL 생성 → 조회 → 요약 → Parquet/Excel 묶음
+#   python batch.py --grid 202412 --out reports/2024Q4            # 전체 회사 × K-ICS/자산/부채 표준 질문
+#   python batch.py questions.txt --out reports/2025Q2            # 중단/실패 뒤 같은 --out 으로 다시 실행 → 남은 것만
+#   python batch.py questions.csv --out r --db-workers 8 --summary-batch-size 10 --no-excel
+#
+# 입력: .jsonl ({"q": ..., "id": ...}) / .csv (question 또는 q 컬럼, id 선택) / .txt (한 줄에 질문 1개)
+# 앱과 같은 Pipeline(generate_sql / run_sql / summarize_answer)을 쓴다. 설정은 앱과 같은 환경변수(.env).
+# - 같은 질문(정규화 기준)은 SQL 을 한 번만 만들고, 같은 SQL(정규화 기준)은 한 번만 조회 (DB 풀 위에서 동시 실행)
+# - 요약은 여러 질문을 LLM 1회로 묶어서 (Pipeline.summarize_batch), 응답에서 빠진 질문만 개별 요약
+# - 단계마다 끝난 항목을 <out>/checkpoint.jsonl 에 기록 → 다시 실행하면 실패/미완료 항목만 처리
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from question_parser import COMPANY_NAMES, METRIC_ALIASES, normalize_question
+from result_cache import normalize_sql
+
+EMPTY_SUMMARY = "데이터가 없습니다."
+
+
+# ----------------- 입력 -----------------
+def load_questions(path: str) -> list:
+    """반환: [{"id": ..., "q": ...}] (id 가 없으면 q001, q002, ...)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        rows = [{"id": r.get("id"), "q": r.get("q") or r.get("question")} for r in rows]
+    elif ext == ".csv":
+        df = pd.read_csv(path, dtype=str)
+        col = "question" if "question" in df.columns else "q"
+        rows = [{"id": r.get("id"), "q": r[col]} for r in df.to_dict("records")]
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [{"id": None, "q": line.strip()} for line in f if line.strip()]
+    return _with_ids([r for r in rows if r["q"] and str(r["q"]).strip()])
+
+
+def grid_questions(closing_yms, metrics=("k_ics", "assets", "liabilities")) -> list:
+    # 전체 회사 × 지표 × 결산년월 표준 질문 (예: "24년12월 삼성생명 K-ICS비율") — 모두 규칙 엔진으로 SQL 생성
+    rows = []
+    for ym in closing_yms:
+        ym = str(ym)
+        for company in COMPANY_NAMES:
+            for metric in metrics:
+                label = METRIC_ALIASES[metric][1]
+                rows.append({"id": f"{ym}_{company}_{metric}", "q": f"{ym[2:4]}년{int(ym[4:])}월 {company} {label}"})
+    return rows
+
+
+def _with_ids(rows: list) -> list:
+    seen = set()
+    for i, r in enumerate(rows, 1):
+        rid = str(r["id"]) if r.get("id") not in (None, "") and not pd.isna(r["id"]) else f"q{i:03d}"
+        if rid in seen:
+            rid = f"{rid}_{i}"
+        seen.add(rid)
+        r.update(id=rid, q=str(r["q"]).strip())
+    return rows
+
+
+def sql_key(sql: str) -> str:
+    # 정규화 SQL 해시 → 조회 결과 파일 이름
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+# ----------------- 체크포인트 -----------------
+class Checkpoint:
+    """
+    <out>/checkpoint.jsonl — {"stage", "key", ...} 한 줄 = 한 항목 완료(또는 실패).
+    나중 줄이 앞 줄을 덮어쓰므로 실패했던 항목이 다시 성공하면 완료로 바뀐다. 쓰다 끊긴 마지막 줄은 무시.
+    """
+
+    STAGES = ("sql", "data", "summary")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {stage: {} for stage in self.STAGES}
+        self.errors = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._apply(rec)
+
+    def _apply(self, rec: dict):
+        stage, key = rec["stage"], rec["key"]
+        if "error" in rec:
+            self.errors[(stage, key)] = rec["error"]
+            self.done[stage].pop(key, None)
+        else:
+            self.done[stage][key] = rec
+            self.errors.pop((stage, key), None)
+
+    def _write(self, rec: dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._apply(rec)
+
+    def get(self, stage: str, key: str):
+        return self.done[stage].get(key)
+
+    def put(self, stage: str, key: str, **fields):
+        self._write({"stage": stage, "key": key, **fields})
+
+    def fail(self, stage: str, key: str, error: str):
+        self._write({"stage": stage, "key": key, "error": error})
+
+
+def _run_stage(keys: list, fn, workers: int, stage: str, ckpt: Checkpoint, log) -> dict:
+    # keys 를 workers 개 스레드로 처리. 예외는 체크포인트에 실패로 남기고 계속 진행
+    t0 = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"batch-{stage}") as pool:
+        futures = [(key, pool.submit(fn, key)) for key in keys]
+        for key, fut in futures:
+            try:
+                fut.result()
+            except Exception as e:
+                failed += 1
+                ckpt.fail(stage, key, f"{type(e).__name__}: {e}")
+                log(f"  ✗ {stage} {key}: {type(e).__name__}: {e}")
+    wall = time.perf_counter() - t0
+    return {"todo": len(keys), "failed": failed, "wall_s": round(wall, 3),
+            "per_s": round((len(keys) - failed) / wall, 2) if keys and wall else None}
+
+
+def pack_batches(items: list, max_items: int, max_tokens: int) -> list:
+    # items: [(..., 토큰 수)] → 항목 수/토큰 상한을 넘지 않게 순서대로 묶는다
+    batches, cur, cur_tokens = [], [], 0
+    for item in items:
+        if cur and (len(cur) >= max_items or cur_tokens + item[-1] > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(item)
+        cur_tokens += item[-1]
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# ----------------- 실행 -----------------
+def run_batch(pipe, items: list, out_dir: str, *, llm_workers: int = 4, db_workers: int = 4,
+              summary_batch_size: int = 8, summary_batch_tokens: int = 8000, excel: bool = True, log=print) -> dict:
+    """items: [{"id", "q"}]. 결과 묶음을 out_dir 에 쓰고 처리량 리포트(dict)를 돌려준다."""
+    data_dir = os.path.join(out_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    ckpt = Checkpoint(os.path.join(out_dir, "checkpoint.jsonl"))
+    t_all = time.perf_counter()
+    stages = {}
+
+    # 1) SQL 생성 — 정규화 질문당 1번
+    questions = {}
+    for it in items:
+        it["qkey"] = normalize_question(it["q"])
+        questions.setdefault(it["qkey"], it["q"])
+
+    def _generate(qkey):
+        meta = {}
+        sql = pipe.generate_sql(questions[qkey], meta)
+        ckpt.put("sql", qkey, sql=sql, engine=meta["engine"])
+
+    todo = [k for k in questions if not ckpt.get("sql", k)]
+    stages["sql"] = dict(_run_stage(todo, _generate, llm_workers, "sql", ckpt, log), resumed=len(questions) - len(todo))
+    log(f"SQL 생성: {stages['sql']['todo']}건 (이어받음 {stages['sql']['resumed']}) · 실패 {stages['sql']['failed']} · "
+        f"{stages['sql']['wall_s']}s")
+
+    # 2) 조회 — 정규화 SQL 당 1번, DB 풀 위에서 동시 실행
+    sqls = {}
+    for qkey in questions:
+        rec = ckpt.get("sql", qkey)
+        if rec:
+            sqls.setdefault(sql_key(rec["sql"]), rec["sql"])
+
+    def _fetch(skey):
+        info = {}
+        df = pipe.run_sql(sqls[skey], info)
+        path = os.path.join(data_dir, f"{skey}.parquet")
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        ckpt.put("data", skey, rows=len(df), truncated=info["truncated"], source=info["source"])
+
+    todo = [k for k in sqls if not ckpt.get("data", k)]
+    stages["data"] = dict(_run_stage(todo, _fetch, db_workers, "data", ckpt, log), resumed=len(sqls) - len(todo))
+    log(f"조회: SQL {stages['data']['todo']}건 (이어받음 {stages['data']['resumed']}) · 실패 {stages['data']['failed']} · "
+        f"{stages['data']['wall_s']}s")
+
+    # 3) 요약 — 여러 질문을 LLM 1회로 묶고, 응답에서 빠진 질문만 개별 요약
+    frames = {}
+    frames_lock = threading.Lock()   # _summarize 가 llm_workers 스레드에서 개별 재요약용으로도 읽는다
+
+    def _frame(qkey):
+        skey = sql_key(ckpt.get("sql", qkey)["sql"])
+        with frames_lock:
+            df = frames.get(skey)
+        if df is None:
+            df = pd.read_parquet(os.path.join(data_dir, f"{skey}.parquet"))
+            with frames_lock:
+                df = frames.setdefault(skey, df)
+        return df
+
+    resumed = len(ckpt.done["summary"])
+    blocks = []   # (프롬프트 id, 정규화 질문, 블록, 토큰 수)
+    for qkey in questions:
+        rec = ckpt.get("sql", qkey)
+        if ckpt.get("summary", qkey) or not rec or not ckpt.get("data", sql_key(rec["sql"])):
+            continue
+        df = _frame(qkey)
+        if df.empty:
+            ckpt.put("summary", qkey, text=EMPTY_SUMMARY, mode="empty")
+            continue
+        n = str(len(blocks) + 1)
+        block, info = pipe.build_summary_block(n, questions[qkey], df)
+        blocks.append((n, qkey, block, info["prompt_tokens"]))
+    batches = pack_batches(blocks, summary_batch_size, summary_batch_tokens)
+    counts = {"batched": 0, "single": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def _summarize(i):
+        batch = batches[i]
+        try:
+            with pipe.tracer.span("summarize_batch", items=len(batch)):
+                got = pipe.summarize_batch([(n, block) for n, _, block, _ in batch])
+            for n, qkey, _, _ in batch:
+                if n in got:
+                    ckpt.put("summary", qkey, text=got[n], mode="batch")
+                    mode = "batched"
+                else:
+                    df = _frame(qkey)
+                    with pipe.tracer.span("summarize_answer", cache_hit=False, streamed=False, rows=len(df)):
+                        ckpt.put("summary", qkey, text=pipe.summarize_answer(questions[qkey], df), mode="single")
+                    mode = "single"
+                with counts_lock:
+                    counts[mode] += 1
+        except Exception as e:
+            # 재시도/리포트 단위는 질문 — 묶음 안에서 아직 요약이 없는 질문마다 실패로 남긴다
+            left = [qkey for _, qkey, _, _ in batch if not ckpt.get("summary", qkey)]
+            for qkey in left:
+                ckpt.fail("summary", qkey, f"{type(e).__name__}: {e}")
+            with counts_lock:
+                counts["failed"] += len(left)
+            log(f"  ✗ summary 묶음 {i + 1}: {type(e).__name__}: {e}")
+
+    stages["summary"] = _run_stage(list(range(len(batches))), _summarize, llm_workers, "summary", ckpt, log)
+    stages["summary"].update(questions=len(blocks), batches=len(batches), resumed=resumed, **counts)
+    log(f"요약: 질문 {len(blocks)}건 (이어받음 {resumed}) → LLM 묶음 {len(batches)}회 (개별 재요약 {counts['single']}) · "
+        f"실패 {counts['failed']} · {stages['summary']['wall_s']}s")
+
+    # 4) 결과 묶음
+    answers = write_bundle(ckpt, items, data_dir, out_dir, excel=excel, log=log)
+    wall = time.perf_counter() - t_all
+    errors = answers[answers["error"].notna()][["id", "question", "error"]].to_dict("records")
+    report = {
+        "questions": len(items),
+        "unique_questions": len(questions),
+        "unique_sql": len(sqls),
+        "dedupe": {
+            "questions": round(1 - len(questions) / len(items), 3) if items else 0.0,
+            "sql": round(1 - len(sqls) / len(questions), 3) if questions else 0.0,
+        },
+        "stages": stages,
+        "wall_s": round(wall, 3),
+        "questions_per_min": round(len(items) / wall * 60, 1) if wall else None,
+        "answered": int(answers["summary"].notna().sum()),
+        "errors": errors,
+        "llm": _llm_usage(pipe.tracer.records()),
+    }
+    with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    return report
+
+
+def _llm_usage(records: list) -> dict:
+    # 단계별 LLM 호출/토큰 합계 (TracedChatClient 가 span 에 기록)
+    out = {}
+    for r in records:
+        if r.get("llm_calls"):
+            s = out.setdefault(r["stage"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            s["calls"] += r["llm_calls"]
+            s["prompt_tokens"] += r.get("prompt_tokens", 0)
+            s["completion_tokens"] += r.get("completion_tokens", 0)
+    return out
+
+
+def _parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    # 여러 결과를 이어 붙이면 한 컬럼에 숫자/문자가 섞일 수 있어 object 컬럼은 문자열로
+    obj = [c for c in df.columns if df[c].dtype == object]
+    return df.astype({c: "string" for c in obj}) if obj else df
+
+
+def write_bundle(ckpt: Checkpoint, items: list, data_dir: str, out_dir: str, excel: bool = True, log=print):
+    # answers.parquet (질문당 1행) + data.parquet (data_key 별 조회 결과) + report.xlsx (요약 시트 + 결과 시트)
+    rows, keys = [], []
+    for it in items:
+        sql_rec = ckpt.get("sql", it["qkey"])
+        skey = sql_key(sql_rec["sql"]) if sql_rec else None
+        data_rec = ckpt.get("data", skey) if skey else None
+        sum_rec = ckpt.get("summary", it["qkey"])
+        error = (ckpt.errors.get(("sql", it["qkey"])) or (skey and ckpt.errors.get(("data", skey)))
+                 or ckpt.errors.get(("summary", it["qkey"])))
+        if not error and not sum_rec:
+            error = "미완료"
+        if data_rec and skey not in keys:
+            keys.append(skey)
+        rows.append({
+            "id": it["id"],
+            "question": it["q"],
+            "sql": sql_rec["sql"] if sql_rec else None,
+            "engine": sql_rec["engine"] if sql_rec else None,
+            "data_key": skey if data_rec else None,
+            "rows": data_rec["rows"] if data_rec else None,
+            "truncated": data_rec["truncated"] if data_rec else None,
+            "summary": sum_rec["text"] if sum_rec else None,
+            "summary_mode": sum_rec["mode"] if sum_rec else None,
+            "error": error or None,
+        })
+    answers = pd.DataFrame(rows)
+    sheets = {k: f"d{i:03d}" for i, k in enumerate(keys, 1)}
+    answers.insert(answers.columns.get_loc("data_key") + 1, "sheet", answers["data_key"].map(sheets))
+    answers.to_parquet(os.path.join(out_dir, "answers.parquet"), index=False)
+
+    frames = {k: pd.read_parquet(os.path.join(data_dir, f"{k}.parquet")) for k in keys}
+    data = pd.concat([df.assign(data_key=k) for k, df in frames.items()], ignore_index=True) if frames else pd.DataFrame()
+    _parquet_safe(data).to_parquet(os.path.join(out_dir, "data.parquet"), index=False)
+
+    if excel:
+        try:
+            with pd.ExcelWriter(os.path.join(out_dir, "report.xlsx")) as writer:
+                answers.to_excel(writer, sheet_name="answers", index=False)
+                for k, df in frames.items():
+                    df.to_excel(writer, sheet_name=sheets[k], index=False)
+        except ImportError as e:  # openpyxl 미설치 — Parquet 만 남긴다
+            log(f"Excel 생략 ({e}) — pip install openpyxl")
+    return answers
+
+
+# ----------------- 파이프라인 구성 (앱과 같은 환경변수) -----------------
+def _env(name: str, default=None):
+    return os.getenv(name) or default
+
+
+def build_pipeline(args):
+    from openai import OpenAI
+
+    from db import create_pooled_engine
+    from llm_gateway import GatewayConfig, LLMGateway, parse_rpm
+    from pipeline import Pipeline, PipelineConfig
+    from result_cache import ResultCache
+    from sql_agent import build_sql_agent, make_lc_db, make_llm
+    from sql_cache import SQLCache
+    from tracing import TracedChatClient, Tracer
+
+    api_key = _env("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY 설정이 되어 있지 않습니다.")
+    uri = args.db_uri or (
+        f"postgresql+psycopg://{_env('DB_USER', 'readonly')}:{_env('DB_PASS')}@{_env('DB_HOST')}:"
+        f"{_env('DB_PORT', 5432)}/{_env('DB_NAME', 'postgres')}?sslmode=require"
+    )
+    engine = create_pooled_engine(
+        uri,
+        min_size=2,
+        max_size=args.db_workers + 2,
+        pool_timeout=float(_env("DB_POOL_TIMEOUT", 30)),
+        statement_timeout_ms=int(_env("DB_STATEMENT_TIMEOUT_MS", 15000)),
+    )
+    config = PipelineConfig(
+        company_col=_env("KICS_COMPANY_COL", "company_code"),
+        ym_col=_env("KICS_YM_COL", "closing_ym"),
+        metric_col=_env("KICS_METRIC_COL", "metric"),
+        value_col=_env("KICS_VALUE_COL", "value"),
+        sql_engine=_env("SQL_ENGINE", "single_shot"),
+        model=_env("LLM_MODEL", "gpt-4o-mini"),
+        sql_model=_env("LLM_SQL_MODEL", ""),
+        summary_model=_env("LLM_SUMMARY_MODEL", ""),
+        summary_token_budget=int(_env("SUMMARY_TOKEN_BUDGET", 1500)),
+        summary_sample_rows=int(_env("SUMMARY_SAMPLE_ROWS", 20)),
+        max_rows=int(_env("RUN_SQL_MAX_ROWS", 5000)),
+        fetch_chunk_rows=int(_env("RUN_SQL_CHUNK_ROWS", 1000)),
+    )
+
+    # 앱과 같은 LLM 게이트웨이 — 대량 실행에서 429 를 받기 전에 분당 요청 수를 맞춘다
+    gateway = LLMGateway(GatewayConfig(
+        default_rpm=float(_env("LLM_RPM", 500)),
+        rpm=parse_rpm(_env("LLM_RPM_BY_MODEL", "")),
+        burst=int(_env("LLM_BURST", 10)),
+        max_retries=int(_env("LLM_MAX_RETRIES", 3)),
+        hedge=_env("LLM_HEDGE", "0") in ("1", "true", "True"),
+    ))
+    timeout_s = float(_env("LLM_TIMEOUT_S", 60))
+    base_url = _env("OPENAI_BASE_URL") or None
+
+    # 에이전트는 규칙/단일 호출로 안 되는 질문이 처음 나올 때 1번만 만든다
+    agent, agent_lock = [], threading.Lock()
+
+    def _agent():
+        with agent_lock:
+            if not agent:
+                lc_db = make_lc_db(engine, config.table)
+                llm = make_llm(api_key, config.sql_model or config.model, http_client=gateway.http_client(timeout_s),
+                               base_url=base_url, timeout_s=timeout_s)
+                agent.append(build_sql_agent(llm, lc_db, lc_db.get_table_info([config.table]), config))
+            return agent[0]
+
+    return Pipeline(
+        TracedChatClient(OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout_s,
+                                http_client=gateway.http_client(timeout_s))),
+        engine,
+        config,
+        sql_cache=SQLCache(_env("SQL_CACHE_PATH", ".cache/sql_cache.sqlite3")),
+        result_cache=ResultCache(),
+        tracer=Tracer(args.trace_log, keep=1_000_000),
+        agent_factory=_agent,
+    )
+
+
+def print_report(report: dict):
+    st = report["stages"]
+    print(f"질문 {report['questions']}개 → 고유 질문 {report['unique_questions']} → 고유 SQL {report['unique_sql']} · "
+          f"전체 {report['wall_s']}s · {report['questions_per_min']} 질문/분 · 응답 {report['answered']}/{report['questions']}")
+    print(f"  SQL 생성 {st['sql']['wall_s']}s · 조회 {st['data']['wall_s']}s · 요약 {st['summary']['wall_s']}s "
+          f"(LLM 묶음 {st['summary']['batches']}회, 개별 {st['summary']['single']})")
+    for stage, u in report["llm"].items():
+        print(f"  LLM {stage}: {u['calls']}회 · 프롬프트 {u['prompt_tokens']} / 응답 {u['completion_tokens']} 토큰")
+    for e in report["errors"][:20]:
+        print(f"  실패: {e['id']} {e['question']} — {e['error']}")
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="질문 목록 일괄 응답 (배치 리포트)")
+    ap.add_argument("questions", nargs="?", help="질문 파일 (.jsonl / .csv / .txt)")
+    ap.add_argument("--grid", action="append", metavar="YYYYMM", help="전체 회사 × K-ICS/자산/부채 표준 질문 (여러 번 지정)")
+    ap.add_argument("--out", required=True, help="결과 묶음 디렉터리 (같은 경로로 다시 실행하면 이어서)")
+    ap.add_argument("--db-uri", help="DB URI (기본: 앱과 같은 DB_* 환경변수)")
+    ap.add_argument("--llm-workers", type=int, default=4, help="SQL 생성/요약 LLM 동시 호출 수")
+    ap.add_argument("--db-workers", type=int, default=4, help="조회 동시 실행 수 (풀 크기 = +2)")
+    ap.add_argument("--summary-batch-size", type=int, default=8, help="요약 LLM 1회에 묶을 질문 수")
+    ap.add_argument("--summary-batch-tokens", type=int, default=8000, help="요약 묶음당 입력 토큰 상한")
+    ap.add_argument("--no-excel", action="store_true", help="report.xlsx 를 만들지 않는다")
+    ap.add_argument("--trace-log", help="단계별 트레이스(JSON lines) 저장 경로")
+    args = ap.parse_args(argv)
+
+    items = load_questions(args.questions) if args.questions else []
+    items += grid_questions(args.grid or [])
+    if not items:
+        ap.error("질문 파일 또는 --grid 가 필요합니다.")
+    pipe = build_pipeline(args)
+    report = run_batch(pipe, _with_ids(items), args.out,
+                       llm_workers=args.llm_workers, db_workers=args.db_workers,
+                       summary_batch_size=args.summary_batch_size, summary_batch_tokens=args.summary_batch_tokens,
+                       excel=not args.no_excel)
+    print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
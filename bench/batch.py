@@ -0,0 +1,114 @@
+# bench/batch.py — batch.py 오프라인 점검 (합성 DB + 가짜 LLM): 처리량, 중복 제거, 체크포인트 이어받기
+#
+#   python -m bench.batch                                  # questions.jsonl × 2 + 202412 그리드
+#   python -m bench.batch --grid 202406 --grid 202412 --latency-ms 500
+#   python -m bench.batch --fail-first 5                   # 첫 실행에서 조회 5건 실패 → 같은 --out 으로 재실행해 이어받기 확인
+#
+# 비교 기준은 UI 에서 하나씩 누르는 것과 같은 질문별 순차 실행(generate_sql → run_sql → summarize_answer).
+# 순차 실행은 --naive-sample 개만 돌려 질문당 시간으로 전체를 추정한다.
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from batch import grid_questions, print_report, run_batch, _with_ids
+from bench.run import DEFAULT_FIXTURES, DEFAULT_QUESTIONS, build_pipeline, load_questions
+
+
+def _pipeline(args, work_dir: str):
+    ns = argparse.Namespace(
+        db_uri=None, seed_db=False, first_year=2019, last_year=2025, concurrency=args.db_workers + 2,
+        latency_ms=args.latency_ms, token_ms=args.token_ms, jitter=0.2, seed=0, record=False,
+        fixtures=DEFAULT_FIXTURES, questions=DEFAULT_QUESTIONS, sql_engine="single_shot",
+        max_rows=5000, chunk_rows=1000, no_cache=False, trace_log=None, rollup=False,
+    )
+    return build_pipeline(ns, work_dir)
+
+
+def run_naive(args, items: list) -> dict:
+    with tempfile.TemporaryDirectory(prefix="nh_batch_naive_") as work_dir:
+        pipe, client, agent = _pipeline(args, work_dir)
+        pipe.table_spec()
+        sample = items[:args.naive_sample]
+        t0 = time.perf_counter()
+        for it in sample:
+            df = pipe.run_sql(pipe.generate_sql(it["q"]))
+            pipe.summarize_answer(it["q"], df)
+        wall = time.perf_counter() - t0
+        per_q = wall / len(sample)
+        return {"sample": len(sample), "per_question_s": round(per_q, 3), "est_wall_s": round(per_q * len(items), 1),
+                "llm_calls_est": round(client.stats()["calls"] / len(sample) * len(items)),
+                "agent_calls_est": round(agent.stats()["calls"] / len(sample) * len(items))}
+
+
+def run_batched(args, items: list, out_dir: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="nh_batch_") as work_dir:
+        pipe, client, agent = _pipeline(args, work_dir)
+        pipe.table_spec()
+        runs = []
+        orig = pipe.run_sql
+        failures = [args.fail_first]
+
+        def _flaky(sql, info=None):
+            if failures[0] > 0:
+                failures[0] -= 1
+                raise RuntimeError("주입된 조회 실패")
+            return orig(sql, info)
+
+        if args.fail_first:
+            pipe.run_sql = _flaky
+        for attempt in range(2 if args.fail_first else 1):
+            before = (client.stats()["calls"], agent.stats()["calls"])
+            report = run_batch(pipe, [dict(it) for it in items], out_dir, llm_workers=args.llm_workers,
+                               db_workers=args.db_workers, summary_batch_size=args.summary_batch_size,
+                               excel=False, log=lambda msg: None)
+            report.update(llm_calls=client.stats()["calls"] - before[0], agent_calls=agent.stats()["calls"] - before[1])
+            runs.append(report)
+            pipe.run_sql = orig
+        return {"runs": runs}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="batch.py 오프라인 처리량/이어받기 점검")
+    ap.add_argument("--repeat", type=int, default=2, help="questions.jsonl 반복 횟수 (중복 질문 제거 확인)")
+    ap.add_argument("--grid", action="append", metavar="YYYYMM", help="그리드 질문 결산년월 (기본 202412)")
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--token-ms", type=float, default=2)
+    ap.add_argument("--llm-workers", type=int, default=4)
+    ap.add_argument("--db-workers", type=int, default=4)
+    ap.add_argument("--summary-batch-size", type=int, default=8)
+    ap.add_argument("--naive-sample", type=int, default=20)
+    ap.add_argument("--fail-first", type=int, default=0, help="첫 실행에서 실패시킬 조회 수")
+    ap.add_argument("--out", help="결과 묶음 디렉터리 (기본: 임시)")
+    args = ap.parse_args(argv)
+
+    items = [{"id": None, "q": q["q"]} for q in load_questions(DEFAULT_QUESTIONS)] * args.repeat
+    items = _with_ids([dict(it) for it in items] + grid_questions(args.grid or ["202412"]))
+
+    naive = run_naive(args, items)
+    with tempfile.TemporaryDirectory(prefix="nh_batch_out_") as tmp_out:
+        batched = run_batched(args, items, args.out or tmp_out)
+
+    first, last = batched["runs"][0], batched["runs"][-1]
+    print(f"질문 {len(items)}개 · LLM 지연 {args.latency_ms}ms · LLM 동시 {args.llm_workers} · DB 동시 {args.db_workers}")
+    print(f"순차(UI 클릭과 같음, {naive['sample']}개 표본으로 추정): 질문당 {naive['per_question_s']}s → "
+          f"전체 약 {naive['est_wall_s']}s · LLM 약 {naive['llm_calls_est']}회 · 에이전트 약 {naive['agent_calls_est']}회")
+    print_report(first)
+    print(f"  LLM {first['llm_calls']}회 · 에이전트 {first['agent_calls']}회 · "
+          f"순차 대비 {naive['est_wall_s'] / first['wall_s']:.1f}배 빠름")
+    failures = []
+    if len(batched["runs"]) > 1:
+        print(f"재실행(이어받기): {last['wall_s']}s · 응답 {last['answered']}/{last['questions']} · "
+              f"LLM {last['llm_calls']}회 · 에이전트 {last['agent_calls']}회 · 실패 {len(last['errors'])}")
+        if not first["errors"]:
+            failures.append("주입한 실패가 첫 실행 리포트에 없음")
+    if last["errors"] or last["answered"] != len(items):
+        failures.append(f"응답 {last['answered']}/{len(items)} · 실패 {len(last['errors'])}")
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
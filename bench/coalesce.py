@@ -0,0 +1,182 @@
+# bench/coalesce.py — 같은 질문이 여러 세션에서 동시에 몰릴 때의 부하 테스트 (single-flight 끔/켬 비교)
+#
+#   python -m bench.coalesce                                    # 세션 40개가 질문 2개를 0.2초 안에 동시에
+#   python -m bench.coalesce --sessions 100 --spread-ms 500 --latency-ms 800
+#   python -m bench.coalesce --question "24년12월 K-ICS비율이 가장 높은 보험사 5곳" --sql-engine agent
+#   python -m bench.coalesce --min-reduction 0.8                # 상위 호출 감소율이 기준 미만이면 종료 코드 1
+#
+# 세션마다 앱과 같은 순서(generate_sql → run_sql → stream_summary)로 Pipeline 을 돌리고,
+# 가짜 LLM/에이전트 호출 수와 DB 쿼리 수(상위 호출)를 single-flight 없이/있이 각각 센다.
+# 두 모드 모두 빈 캐시에서 시작 — 동시에 도착한 요청은 캐시로는 합쳐지지 않는다는 점을 보여준다.
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from bench.fake_openai import LatencyModel, ReplayAgent, ReplayOpenAI
+from bench.run import DEFAULT_QUESTIONS, load_questions
+from bench.seed import seed_kics
+from db import create_pooled_engine
+from pipeline import Pipeline, PipelineConfig
+from result_cache import ResultCache
+from singleflight import SingleFlight
+from sql_cache import SQLCache
+from tracing import TracedChatClient, Tracer, _percentile
+
+BURST_QUESTIONS = ["23년12월 농협생명 K-ICS비율 알려줘", "24년12월 K-ICS비율이 가장 높은 보험사 5곳"]
+
+
+def run_session(pipe: Pipeline, question: str, stream: bool) -> dict:
+    t0 = time.perf_counter()
+    meta, info, summary_info = {}, {}, {}
+    with pipe.tracer.span("pipeline", question=question):
+        sql = pipe.generate_sql(question, meta)
+        df = pipe.run_sql(sql, info)
+        if stream:
+            text = "".join(pipe.stream_summary(question, df, summary_info))
+        else:
+            text = pipe.summarize_answer(question, df, summary_info)
+    return {
+        "wall_ms": (time.perf_counter() - t0) * 1000,
+        "sql": sql,
+        "rows": len(df),
+        "summary": text,
+        "joined": [name for name, flag in (("generate_sql", meta["coalesced"]), ("run_sql", info["coalesced"]),
+                                           ("summary", summary_info["coalesced"])) if flag],
+    }
+
+
+def run_mode(args, questions: list, coalesce: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="nh_coalesce_") as work_dir:
+        engine = create_pooled_engine(f"sqlite:///{os.path.join(work_dir, 'kics.sqlite3')}",
+                                      min_size=2, max_size=min(args.sessions, 32), pool_timeout=60)
+        seed_kics(engine)
+
+        latency = LatencyModel(args.latency_ms, args.token_ms, args.jitter, seed=args.seed)
+        client = ReplayOpenAI(None, latency=latency)
+        answers = {q["q"]: q["agent_sql"] for q in load_questions(DEFAULT_QUESTIONS) if q.get("agent_sql")}
+        pipe = None
+        agent = ReplayAgent(lambda: pipe.table_spec(), answers=answers, latency=latency)
+        coalescer = SingleFlight() if coalesce else None
+        pipe = Pipeline(
+            TracedChatClient(client),
+            engine,
+            PipelineConfig(sql_engine=args.sql_engine),
+            sql_cache=None if args.no_cache else SQLCache(os.path.join(work_dir, "sql_cache.sqlite3")),
+            result_cache=None if args.no_cache else ResultCache(),
+            tracer=Tracer(keep=100_000),
+            agent_factory=lambda: agent,
+            coalescer=coalescer,
+        )
+        # 스키마/허용 목록/데이터 버전은 앱에서 TTL 캐시 → 측정 전에 채워 둔다
+        pipe.table_spec()
+        pipe.data_version()
+        pipe.validate_sql(f"SELECT * FROM {pipe.config.table} LIMIT 1")
+
+        db_queries = [0]
+        lock = threading.Lock()
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            with lock:
+                db_queries[0] += 1
+
+        event.listen(engine, "before_cursor_execute", _count)
+
+        rng = random.Random(args.seed)
+        plan = [(questions[i % len(questions)], rng.uniform(0, args.spread_ms) / 1000) for i in range(args.sessions)]
+        start = threading.Barrier(args.sessions)
+
+        def _session(question, delay):
+            start.wait()
+            time.sleep(delay)
+            return run_session(pipe, question, not args.no_stream)
+
+        t0 = time.perf_counter()
+        results, errors = [], []
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [(q, pool.submit(_session, q, d)) for q, d in plan]
+            for q, fut in futures:
+                try:
+                    results.append((q, fut.result()))
+                except Exception as e:
+                    errors.append({"question": q, "error": f"{type(e).__name__}: {e}"})
+        wall = time.perf_counter() - t0
+        event.remove(engine, "before_cursor_execute", _count)
+
+        # 같은 질문을 받은 세션은 모두 같은 SQL/행 수/요약을 받아야 한다
+        answers_by_q = {}
+        for q, r in results:
+            answers_by_q.setdefault(q, set()).add((r["sql"], r["rows"], r["summary"]))
+        inconsistent = sorted(q for q, a in answers_by_q.items() if len(a) > 1)
+
+        walls = sorted(r["wall_ms"] for _, r in results)
+        llm, agent_calls = client.stats()["calls"], agent.stats()["calls"]
+        return {
+            "coalesce": coalesce,
+            "wall_s": round(wall, 3),
+            "p50_ms": _percentile(walls, 50),
+            "p95_ms": _percentile(walls, 95),
+            "llm_calls": llm,
+            "agent_calls": agent_calls,
+            "db_queries": db_queries[0],
+            "upstream_calls": llm + agent_calls + db_queries[0],
+            "sessions_joined": sum(1 for _, r in results if r["joined"]),
+            "coalescer": coalescer.stats() if coalescer else None,
+            "inconsistent": inconsistent,
+            "errors": errors,
+        }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="같은 질문 동시 폭주 부하 테스트 (single-flight 끔/켬)")
+    ap.add_argument("--question", action="append", help="동시에 보낼 질문 (여러 번 지정, 기본: 규칙 1개 + 에이전트 1개)")
+    ap.add_argument("--sessions", type=int, default=40, help="동시 세션 수")
+    ap.add_argument("--spread-ms", type=float, default=200, help="세션 도착 시각을 퍼뜨릴 구간 (ms)")
+    ap.add_argument("--sql-engine", default="single_shot", choices=("single_shot", "agent"))
+    ap.add_argument("--latency-ms", type=float, default=300, help="LLM 첫 토큰까지 지연 (ms)")
+    ap.add_argument("--token-ms", type=float, default=2, help="출력 토큰당 지연 (ms)")
+    ap.add_argument("--jitter", type=float, default=0.2)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-stream", action="store_true", help="요약을 summarize_answer 로 받는다")
+    ap.add_argument("--no-cache", action="store_true", help="SQL/결과 캐시 없이 실행")
+    ap.add_argument("--min-reduction", type=float, default=0, help="상위 호출 감소율 하한 (0~1)")
+    ap.add_argument("--out", help="결과 JSON 저장 경로")
+    args = ap.parse_args(argv)
+
+    questions = args.question or BURST_QUESTIONS
+    report = {"sessions": args.sessions, "questions": questions, "spread_ms": args.spread_ms,
+              "off": run_mode(args, questions, coalesce=False), "on": run_mode(args, questions, coalesce=True)}
+    off, on = report["off"], report["on"]
+    report["reduction"] = round(1 - on["upstream_calls"] / off["upstream_calls"], 3) if off["upstream_calls"] else 0.0
+
+    print(f"세션 {args.sessions}개 · 질문 {len(questions)}개 · 도착 구간 {args.spread_ms}ms · LLM 지연 {args.latency_ms}ms")
+    print(f"{'':14}{'LLM':>7}{'agent':>7}{'DB':>7}{'상위 합계':>10}{'p50 ms':>10}{'p95 ms':>10}{'wall s':>9}")
+    for name, r in (("single-flight 끔", off), ("single-flight 켬", on)):
+        print(f"{name:14}{r['llm_calls']:>7}{r['agent_calls']:>7}{r['db_queries']:>7}{r['upstream_calls']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['wall_s']:>9}")
+    co = on["coalescer"]
+    print(f"합류 비율 {co['coalescing_ratio']:.0%} (실행 {co['leaders']} · 합류 {co['followers']}) · "
+          + " · ".join(f"{k} {v['coalescing_ratio']:.0%}" for k, v in co["stages"].items())
+          + f" · 상위 호출 {report['reduction']:.0%} 감소")
+
+    failures = [f"{e['question']} — {e['error']}" for r in (off, on) for e in r["errors"]]
+    failures += [f"세션마다 결과가 다름: {q}" for q in on["inconsistent"]]
+    if args.min_reduction and report["reduction"] < args.min_reduction:
+        failures.append(f"상위 호출 감소율 {report['reduction']:.0%} < {args.min_reduction:.0%}")
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# bench/fake_llm_server.py — OpenAI 호환 가짜 HTTP 서버 (/v1/chat/completions): 지연 꼬리, 429/5xx, 서버 측 RPM 한도 주입
+#
+#   python -m bench.fake_llm_server --port 8399 --rpm 120 --tail-prob 0.05 --error-prob 0.02
+#   OPENAI_BASE_URL=http://127.0.0.1:8399/v1 streamlit run app.py     # 앱을 가짜 서버에 붙여 보기
+#
+# 응답 내용은 fake_openai.ReplayOpenAI 의 합성 응답과 같다 (슬롯 JSON / 일괄 요약 JSON / 요약 텍스트).
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.fake_openai import ReplayOpenAI
+
+
+class FakeLLMServer:
+    """
+    latency_ms: 응답까지 기본 지연 · tail_prob 확률로 tail_mult 배 느린 응답 (p99 꼬리)
+    rpm: 서버 측 분당 요청 한도 (넘으면 429 + Retry-After) · error_prob: 무작위 500 · rate_limit_prob: 무작위 429
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 200, jitter: float = 0.2,
+                 tail_prob: float = 0.0, tail_mult: float = 10, rpm: float = 0, error_prob: float = 0.0,
+                 rate_limit_prob: float = 0.0, retry_after_s: float = 1, seed: int = 0):
+        self.latency_ms, self.jitter = latency_ms, jitter
+        self.tail_prob, self.tail_mult = tail_prob, tail_mult
+        self.rpm, self.error_prob, self.rate_limit_prob = rpm, error_prob, rate_limit_prob
+        self.retry_after_s = retry_after_s
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = deque()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "slow": 0, "in_flight_max": 0}
+        self._in_flight = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="fake-llm-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def _decide(self):
+        # 반환: (상태 코드, 지연 초)
+        with self._lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            # 1초 이동 창으로 rpm/60 — 분 단위 창이면 짧은 벤치에서는 한도에 닿지 않는다
+            while self._window and now - self._window[0] > 1:
+                self._window.popleft()
+            if self.rpm and len(self._window) >= max(1, self.rpm / 60):
+                self.counts["rate_limited"] += 1
+                return 429, 0.0
+            self._window.append(now)
+            r = self._rng.random()
+            if r < self.rate_limit_prob:
+                self.counts["rate_limited"] += 1
+                return 429, 0.0
+            if r < self.rate_limit_prob + self.error_prob:
+                self.counts["errors"] += 1
+                return 500, self.latency_ms / 1000
+            delay = self.latency_ms / 1000 * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            if self._rng.random() < self.tail_prob:
+                self.counts["slow"] += 1
+                delay *= self.tail_mult
+            self.counts["ok"] += 1
+            return 200, delay
+
+    def _enter(self, delta: int):
+        with self._lock:
+            self._in_flight += delta
+            self.counts["in_flight_max"] = max(self.counts["in_flight_max"], self._in_flight)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: dict, headers: dict = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                kwargs = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._json(404, {"error": {"message": "not found"}})
+                server._enter(1)
+                try:
+                    status, delay = server._decide()
+                    time.sleep(delay)
+                    if status == 429:
+                        return self._json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                          {"Retry-After": str(server.retry_after_s)})
+                    if status != 200:
+                        return self._json(status, {"error": {"message": "server error", "type": "server_error"}})
+                    rec = ReplayOpenAI._synthesize(kwargs)
+                    usage = {"prompt_tokens": rec["prompt_tokens"], "completion_tokens": rec["completion_tokens"],
+                             "total_tokens": rec["prompt_tokens"] + rec["completion_tokens"]}
+                    base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": kwargs.get("model", "fake")}
+                    if kwargs.get("stream"):
+                        return self._stream(base, rec["content"], usage, (kwargs.get("stream_options") or {}).get("include_usage"))
+                    self._json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [{
+                        "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": rec["content"]},
+                    }]})
+                finally:
+                    server._enter(-1)
+
+            def _stream(self, base: dict, content: str, usage: dict, include_usage: bool):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def send(obj):
+                    data = f"data: {obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+                for i in range(0, len(content), 4):
+                    send({**base, "object": "chat.completion.chunk", "choices": [
+                        {"index": 0, "delta": {"content": content[i:i + 4]}, "finish_reason": None}]})
+                send({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if include_usage:
+                    send({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="OpenAI 호환 가짜 LLM 서버")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8399)
+    ap.add_argument("--latency-ms", type=float, default=200)
+    ap.add_argument("--tail-prob", type=float, default=0.05)
+    ap.add_argument("--tail-mult", type=float, default=10)
+    ap.add_argument("--rpm", type=float, default=0, help="서버 측 분당 요청 한도 (0 이면 없음)")
+    ap.add_argument("--error-prob", type=float, default=0.0)
+    ap.add_argument("--rate-limit-prob", type=float, default=0.0)
+    args = ap.parse_args(argv)
+    server = FakeLLMServer(args.host, args.port, args.latency_ms, tail_prob=args.tail_prob, tail_mult=args.tail_mult,
+                           rpm=args.rpm, error_prob=args.error_prob, rate_limit_prob=args.rate_limit_prob)
+    print(f"가짜 LLM 서버: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+# bench/fake_openai.py — OpenAI chat.completions / SQL 에이전트의 record/replay 가짜 (지연시간 조절 가능)
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from question_parser import parse_local_slots
+from sql_engine import build_select
+from summary_input import count_tokens
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+def _response(content: str, usage):
+    msg = SimpleNamespace(content=content, role="assistant")
+    return SimpleNamespace(choices=[SimpleNamespace(message=msg, index=0, finish_reason="stop")], usage=usage)
+
+
+def _chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content), index=0)] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def call_key(kwargs: dict) -> str:
+    # 같은 모델/메시지/응답 형식이면 같은 녹화본 (stream 여부, temperature 는 무시)
+    fmt = kwargs.get("response_format") or {}
+    raw = json.dumps(
+        {
+            "model": kwargs.get("model"),
+            "messages": kwargs.get("messages"),
+            "format": (fmt.get("json_schema") or {}).get("name") or fmt.get("type"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """첫 토큰까지 first_ms(± jitter) + 출력 토큰당 per_token_ms."""
+
+    def __init__(self, first_ms: float = 0, per_token_ms: float = 0, jitter: float = 0, seed: int = 0):
+        self.first_ms = first_ms
+        self.per_token_ms = per_token_ms
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def first(self) -> float:
+        with self._lock:
+            f = 1 + self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 1
+        return max(0.0, self.first_ms * f / 1000)
+
+    def per_token(self) -> float:
+        return self.per_token_ms / 1000
+
+
+class ReplayOpenAI:
+    """
+    OpenAI 클라이언트 대용 (chat.completions.create 만 지원).
+    - replay: 녹화 파일에 있는 응답을 돌려준다. 없으면 결정적인 합성 응답 (synthesized 로 집계)
+    - record: real_client 로 실제 호출하고 응답을 녹화 파일에 저장 (save())
+    """
+
+    def __init__(self, fixtures_path: str = None, latency: LatencyModel = None, real_client=None):
+        self.fixtures_path = fixtures_path
+        self.latency = latency or LatencyModel()
+        self.real_client = real_client
+        self.recordings = {}
+        self.calls = 0
+        self.replayed = 0
+        self.synthesized = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        if fixtures_path and os.path.exists(fixtures_path):
+            with open(fixtures_path, encoding="utf-8") as f:
+                self.recordings = json.load(f).get("chat", {})
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        key = call_key(kwargs)
+        with self._lock:
+            self.calls += 1
+            rec = self.recordings.get(key)
+        if rec is None and self.real_client is not None:
+            rec = self._record(key, kwargs)
+        elif rec is not None:
+            with self._lock:
+                self.replayed += 1
+        else:
+            rec = self._synthesize(kwargs)
+            with self._lock:
+                self.synthesized += 1
+
+        usage = _usage(rec["prompt_tokens"], rec["completion_tokens"])
+        if kwargs.get("stream"):
+            return self._stream(rec["content"], usage, kwargs.get("stream_options"))
+        time.sleep(self.latency.first() + self.latency.per_token() * rec["completion_tokens"])
+        return _response(rec["content"], usage)
+
+    def _stream(self, content: str, usage, stream_options):
+        time.sleep(self.latency.first())
+        # 대략 토큰 크기(4자) 단위로 조각낸다
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)] or [""]
+        per_piece = self.latency.per_token() * usage.completion_tokens / len(pieces)
+        for piece in pieces:
+            if per_piece:
+                time.sleep(per_piece)
+            yield _chunk(piece)
+        if (stream_options or {}).get("include_usage"):
+            yield _chunk(usage=usage)
+
+    def _record(self, key: str, kwargs: dict) -> dict:
+        r = self.real_client.chat.completions.create(**{k: v for k, v in kwargs.items() if k not in ("stream", "stream_options")})
+        rec = {
+            "content": r.choices[0].message.content or "",
+            "prompt_tokens": r.usage.prompt_tokens,
+            "completion_tokens": r.usage.completion_tokens,
+        }
+        with self._lock:
+            self.recordings[key] = rec
+            self.recorded += 1
+        return rec
+
+    @staticmethod
+    def _synthesize(kwargs: dict) -> dict:
+        messages = kwargs.get("messages") or []
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        fmt = kwargs.get("response_format") or {}
+        if fmt.get("type") == "json_schema" and fmt["json_schema"].get("name") == "kics_batch_summaries":
+            content = json.dumps(_synthesize_batch(prompt), ensure_ascii=False)
+        elif fmt.get("type") == "json_schema":
+            content = json.dumps(_synthesize_slots(messages[-1]["content"], fmt["json_schema"]), ensure_ascii=False)
+        else:
+            content = _synthesize_summary(prompt)
+        return {"content": content, "prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(content)}
+
+    def save(self):
+        if not self.fixtures_path:
+            return
+        data = {}
+        if os.path.exists(self.fixtures_path):
+            with open(self.fixtures_path, encoding="utf-8") as f:
+                data = json.load(f)
+        data["chat"] = self.recordings
+        if os.path.dirname(self.fixtures_path):
+            os.makedirs(os.path.dirname(self.fixtures_path), exist_ok=True)
+        with open(self.fixtures_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "replayed": self.replayed, "recorded": self.recorded, "synthesized": self.synthesized}
+
+
+# SLOT_PROMPT 의 "순위, 계산식, 조건 비교" → parsable=false 에 해당하는 표현
+_UNPARSABLE = re.compile(r"(가장|상위|하위|순위|미만|초과|이상|이하|평균|합계|계산|증가율|감소율)")
+
+
+def _synthesize_slots(user_message: str, json_schema: dict) -> dict:
+    # 로컬 파서 결과를 그대로 슬롯 JSON 으로 (지표가 없거나 순위/계산 질문이면 parsable=false → 에이전트 폴백)
+    question = user_message.split("\n[")[0]
+    metrics = json_schema["schema"]["properties"]["metrics"]["items"]["enum"]
+    slots = parse_local_slots(question, metrics)
+    return {
+        "parsable": bool(slots["metrics"]) and not _UNPARSABLE.search(question),
+        "companies": slots["companies"],
+        "closing_ym_from": slots["closing_ym_from"],
+        "closing_ym_to": slots["closing_ym_to"],
+        "metrics": slots["metrics"],
+    }
+
+
+def _synthesize_summary(prompt: str) -> str:
+    series = re.findall(r"^- (.+?): (.+)$", prompt, flags=re.M)
+    lines = [f"- {name}: {stats}" for name, stats in series[:5]] or ["- 조회 결과가 요약할 만한 수치 시리즈를 포함하지 않습니다."]
+    return (
+        "조회 기간 동안 주요 시리즈의 흐름은 다음과 같습니다.\n"
+        + "\n".join(lines)
+        + "\n'closing_ym'을 X축으로, 'value'를 Y축으로 사용하면 추이를 한눈에 볼 수 있습니다."
+    )
+
+
+def _synthesize_batch(prompt: str) -> dict:
+    # Pipeline.summarize_batch 프롬프트의 '### id=...' 블록마다 합성 요약
+    parts = re.split(r"^### id=(.+)$", prompt, flags=re.M)
+    return {"summaries": [{"id": key.strip(), "summary": _synthesize_summary(block)}
+                          for key, block in zip(parts[1::2], parts[2::2])]}
+
+
+# ----------------- SQL 에이전트 -----------------
+class ReplayAgent:
+    """
+    LangChain SQL 에이전트 대용 — invoke({"input": ...}) 에 녹화된 SQL(질문 기준)을 돌려준다.
+    녹화가 없으면 로컬 슬롯으로 SELECT 를 합성. 에이전트 1회 ≈ LLM 왕복 steps 번으로 지연시간 모사.
+    """
+
+    def __init__(self, spec_getter, answers: dict = None, latency: LatencyModel = None, steps: int = 3):
+        self.spec_getter = spec_getter
+        self.answers = answers or {}
+        self.latency = latency or LatencyModel()
+        self.steps = steps
+        self.calls = 0
+        self.synthesized = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, inputs: dict, config: dict = None):
+        question = inputs["input"].split("\n[")[0]
+        with self._lock:
+            self.calls += 1
+        sql = self.answers.get(question)
+        if sql is None:
+            sql = self._synthesize(question)
+            with self._lock:
+                self.synthesized += 1
+        completion = count_tokens(sql)
+        for _ in range(self.steps):
+            time.sleep(self.latency.first() + self.latency.per_token() * completion)
+            for cb in (config or {}).get("callbacks", []):
+                cb.on_llm_end(SimpleNamespace(llm_output={
+                    "token_usage": {"prompt_tokens": count_tokens(inputs["input"]) + 1500, "completion_tokens": completion},
+                }))
+        return {"input": inputs["input"], "output": sql}
+
+    def _synthesize(self, question: str) -> str:
+        spec = self.spec_getter()
+        slots = parse_local_slots(question, spec.metrics)
+        slots["metrics"] = slots["metrics"] or list(spec.metrics)
+        return build_select(slots, spec)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "synthesized": self.synthesized}
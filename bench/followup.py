@@ -0,0 +1,138 @@
+# bench/followup.py — 후속 질문 점검 (대화 모드 끔/켬): 후속 질문당 DB 조회/LLM 호출 수, 지연시간, 결과 일치
+#
+#   python -m bench.followup                         # 기본 대화 시나리오, DB 지연 50ms · LLM 지연 300ms
+#   python -m bench.followup --db-latency-ms 200 --latency-ms 800
+#
+# 끔: 지금까지처럼 질문마다 따로 — 후속 질문은 에이전트가 SQL 을 만들고 DB 를 새로 조회한다.
+#     (에이전트에는 후속 질문의 정답 SQL 을 녹화해 둔다 = 맥락을 완벽히 이해하는 최선의 경우)
+# 켬: Pipeline.answer_followup 으로 직전 슬롯을 고치고 대화 기록의 결과를 재사용한다.
+# 켬 모드의 결과가 기대 슬롯을 DB 에서 직접 조회한 결과와 같아야 통과. SQL 캐시는 끈다 — '{company}도 같이' 템플릿이 맥락 없이 재사용되기 때문.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+
+from bench.fake_openai import LatencyModel, ReplayAgent, ReplayOpenAI
+from bench.seed import seed_kics
+from conversation import Conversation
+from db import create_pooled_engine, fetch_bounded
+from pipeline import Pipeline, PipelineConfig
+from result_cache import ResultCache
+from sql_engine import build_select
+from tracing import TracedChatClient, Tracer
+
+# (질문, 후속 질문이면 기대 슬롯 / 처음 질문이면 None)
+SCENARIO = [
+    ("23년12월 농협생명 K-ICS비율 알려줘", None),
+    ("그럼 삼성생명은?", {"metrics": ["k_ics"], "companies": ["삼성생명"], "closing_ym_from": "202312", "closing_ym_to": "202312"}),
+    ("작년 같은 달은?", {"metrics": ["k_ics"], "companies": ["삼성생명"], "closing_ym_from": "202212", "closing_ym_to": "202212"}),
+    ("농협생명도 같이", {"metrics": ["k_ics"], "companies": ["삼성생명", "농협생명"], "closing_ym_from": "202212", "closing_ym_to": "202212"}),
+    ("2022년 3월부터 2024년 12월까지 농협생명 K-ICS비율 추이", None),
+    ("23년 6월은?", {"metrics": ["k_ics"], "companies": ["농협생명"], "closing_ym_from": "202306", "closing_ym_to": "202306"}),
+    ("삼성생명도 같이", {"metrics": ["k_ics"], "companies": ["농협생명", "삼성생명"], "closing_ym_from": "202306", "closing_ym_to": "202306"}),
+    ("부채도 보여줘", {"metrics": ["k_ics", "liabilities"], "companies": ["농협생명", "삼성생명"], "closing_ym_from": "202306", "closing_ym_to": "202306"}),
+    ("전분기는?", {"metrics": ["k_ics", "liabilities"], "companies": ["농협생명", "삼성생명"], "closing_ym_from": "202303", "closing_ym_to": "202303"}),
+]
+
+
+def run_mode(args, conversation_mode: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="nh_followup_") as work_dir:
+        engine = create_pooled_engine(f"sqlite:///{os.path.join(work_dir, 'kics.sqlite3')}", min_size=1, max_size=4)
+        seed_kics(engine)
+        latency = LatencyModel(args.latency_ms, args.token_ms, args.jitter, seed=args.seed)
+        client = ReplayOpenAI(None, latency=latency)
+        pipe = None
+        agent = ReplayAgent(lambda: pipe.table_spec(), latency=latency)
+        pipe = Pipeline(
+            TracedChatClient(client), engine, PipelineConfig(sql_engine="agent"),
+            result_cache=ResultCache(),
+            tracer=Tracer(keep=10_000), agent_factory=lambda: agent,
+        )
+        spec = pipe.table_spec()
+        pipe.data_version()
+        agent.answers.update({q: build_select(slots, spec) for q, slots in SCENARIO if slots})
+
+        db_queries = [0]
+        lock = threading.Lock()
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            with lock:
+                db_queries[0] += 1
+            time.sleep(args.db_latency_ms / 1000)
+
+        event.listen(engine, "before_cursor_execute", _count)
+        conversation = Conversation()
+        steps = []
+        for question, expected in SCENARIO:
+            before = (db_queries[0], client.stats()["calls"] + agent.stats()["calls"])
+            t0 = time.perf_counter()
+            answer, info = None, {}
+            if conversation_mode:
+                answer = pipe.answer_followup(question, conversation, info)
+            if answer is not None:
+                sql, df = answer
+            else:
+                sql = pipe.generate_sql(question)
+                df = pipe.run_sql(sql, info)
+            pipe.record_turn(conversation, question, sql, df, info)
+            steps.append({
+                "question": question,
+                "followup": expected is not None,
+                "resolved": answer is not None,
+                "source": info.get("source"),
+                "ms": round((time.perf_counter() - t0) * 1000, 1),
+                "db": db_queries[0] - before[0],
+                "llm": client.stats()["calls"] + agent.stats()["calls"] - before[1],
+                "sql": sql,
+                "df": df,
+            })
+        event.remove(engine, "before_cursor_execute", _count)
+        # 정답: 기대 슬롯의 SQL 을 캐시 없이 DB 에서 직접 조회
+        for step, (_, expected) in zip(steps, SCENARIO):
+            truth = fetch_bounded(engine, build_select(expected, spec)) if expected else step["df"]
+            step["correct"] = step["df"].reset_index(drop=True).equals(truth.reset_index(drop=True))
+        return {"steps": steps}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="후속 질문 대화 모드 끔/켬 비교")
+    ap.add_argument("--latency-ms", type=float, default=300, help="LLM 첫 토큰까지 지연 (ms)")
+    ap.add_argument("--token-ms", type=float, default=2)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--db-latency-ms", type=float, default=50, help="DB 쿼리당 추가 지연 (원격 DB 모사)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    off, on = run_mode(args, False), run_mode(args, True)
+    print(f"LLM 지연 {args.latency_ms}ms · DB 지연 {args.db_latency_ms}ms")
+    print(f"{'질문':32}{'끔 ms':>9}{'DB':>4}{'LLM':>5}{'':>2}{'켬 ms':>9}{'DB':>4}{'LLM':>5}  출처")
+    failures = []
+    for a, b in zip(off["steps"], on["steps"]):
+        print(f"{a['question'][:30]:32}{a['ms']:>9}{a['db']:>4}{a['llm']:>5}{'' if a['correct'] else '✗':>2}{b['ms']:>9}{b['db']:>4}{b['llm']:>5}  {b['source'] or '-'}")
+        if not b["correct"]:
+            failures.append(f"결과가 기대 슬롯 조회와 다름: {a['question']}")
+        if a["followup"] and not b["resolved"]:
+            failures.append(f"후속 질문으로 해석 못 함: {a['question']}")
+        if b["followup"] and (b["db"] > 1 or b["llm"]):
+            failures.append(f"후속 질문 상위 호출 초과 (DB {b['db']}, LLM {b['llm']}): {a['question']}")
+
+    def _followups(steps):
+        fs = [s for s in steps if s["followup"]]
+        return sum(s["ms"] for s in fs) / len(fs), sum(s["db"] for s in fs), sum(s["llm"] for s in fs)
+
+    (off_ms, off_db, off_llm), (on_ms, on_db, on_llm) = _followups(off["steps"]), _followups(on["steps"])
+    wrong = sum(not s["correct"] for s in off["steps"])
+    if wrong:
+        print(f"✗ 끔: 맥락 없이 해석돼 기대와 다른 결과 {wrong}건 (예: '부채도 보여줘' → 전체 회사/기간)")
+    print(f"후속 질문 평균 {off_ms:.1f}ms → {on_ms:.1f}ms · DB {off_db} → {on_db}회 · LLM/에이전트 {off_llm} → {on_llm}회")
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# bench/gateway.py — LLM 게이트웨이 부하 테스트 (로컬 가짜 HTTP 서버, 실제 OpenAI SDK 경로)
+#
+#   python -m bench.gateway                                  # 두 시나리오: 한도 초과 폭주 / 느린 꼬리
+#   python -m bench.gateway --requests 300 --concurrency 32 --server-rpm 1200
+#   python -m bench.gateway --out .cache/gateway_bench.json
+#
+# SDK 기본값(max_retries=2, 자체 백오프, 속도 제한 없음)과 게이트웨이(토큰 버킷 + 지터 재시도 + p95 헤징)를 비교.
+# - 폭주: 동시 요청이 서버 측 RPM 한도를 넘는다 → 서버가 돌려준 429 수, 최종 실패 수
+# - 꼬리: 한도 안쪽이지만 일부 응답이 tail-mult 배 느리다 → p95/p99
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from bench.fake_llm_server import FakeLLMServer
+from llm_gateway import GatewayConfig, LLMGateway
+from tracing import _percentile
+
+PROMPT = "질문: 23년12월 농협생명 K-ICS비율\n- 농협생명/k_ics: 평균 210.3, 최소 201.2, 최대 220.1"
+
+
+def run_client(client, n: int, concurrency: int, model: str) -> dict:
+    def _one(i):
+        t0 = time.perf_counter()
+        try:
+            client.chat.completions.create(model=model, messages=[{"role": "user", "content": f"{PROMPT}\n#{i}"}])
+            return (time.perf_counter() - t0) * 1000, None
+        except Exception as e:
+            return (time.perf_counter() - t0) * 1000, type(e).__name__
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_one, range(n)))
+    walls = sorted(ms for ms, _ in results)
+    errors = {}
+    for _, err in results:
+        if err:
+            errors[err] = errors.get(err, 0) + 1
+    return {"wall_s": round(time.perf_counter() - t0, 2), "ok": n - sum(errors.values()), "errors": errors,
+            "p50_ms": _percentile(walls, 50), "p95_ms": _percentile(walls, 95), "p99_ms": _percentile(walls, 99)}
+
+
+def run_scenario(args, name: str, server_kwargs: dict, gateway_config: GatewayConfig) -> dict:
+    out = {}
+    for mode in ("sdk", "gateway"):
+        server = FakeLLMServer(seed=args.seed, **server_kwargs).start()
+        try:
+            gateway = None
+            if mode == "sdk":
+                client = OpenAI(api_key="fake", base_url=server.base_url, timeout=args.timeout_s)
+            else:
+                gateway = LLMGateway(gateway_config)
+                client = OpenAI(api_key="fake", base_url=server.base_url, timeout=args.timeout_s, max_retries=0,
+                                http_client=gateway.http_client(args.timeout_s))
+                if gateway_config.hedge:
+                    # 헤징 기준(p95)을 잡을 표본 — 측정 전에 한도 안쪽으로 채운다
+                    run_client(client, gateway_config.hedge_min_samples, 2, args.model)
+                    server.counts = {k: 0 for k in server.counts}
+            r = run_client(client, args.requests, args.concurrency, args.model)
+            r["server"] = server.stats()
+            if gateway is not None:
+                r["gateway"] = gateway.stats().get(args.model)
+            out[mode] = r
+        finally:
+            server.stop()
+    return {"scenario": name, **out}
+
+
+def print_scenario(s: dict):
+    print(f"\n[{s['scenario']}]")
+    print(f"{'':9}{'성공':>6}{'실패':>6}{'서버429':>8}{'서버요청':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'wall s':>8}")
+    for mode in ("sdk", "gateway"):
+        r = s[mode]
+        print(f"{mode:9}{r['ok']:>6}{sum(r['errors'].values()):>6}{r['server']['rate_limited']:>8}{r['server']['requests']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['wall_s']:>8}")
+    g = s["gateway"]["gateway"]
+    print(f"  게이트웨이: 재시도 {g['retries']} {g['reasons']} · 버킷 대기 {g['throttled']}회 {g['throttle_wait_s']}s · "
+          f"헤징 {g['hedges']} (승 {g['hedge_wins']}, 건너뜀 {g['hedge_skipped']}, 기준 {g['hedge_after_ms']}ms)")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="LLM 게이트웨이 부하 테스트 (가짜 HTTP 서버)")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=24)
+    ap.add_argument("--model", default="gpt-4o-mini")
+    ap.add_argument("--latency-ms", type=float, default=150)
+    ap.add_argument("--server-rpm", type=float, default=1800, help="폭주 시나리오의 서버 측 한도 (분당)")
+    ap.add_argument("--tail-prob", type=float, default=0.04)
+    ap.add_argument("--tail-mult", type=float, default=12)
+    ap.add_argument("--timeout-s", type=float, default=30)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="결과 JSON 저장 경로")
+    args = ap.parse_args(argv)
+
+    scenarios = [
+        run_scenario(args, f"폭주: 동시 {args.concurrency} → 서버 한도 {args.server_rpm:.0f} rpm",
+                     {"latency_ms": args.latency_ms, "rpm": args.server_rpm, "retry_after_s": 1},
+                     GatewayConfig(default_rpm=args.server_rpm * 0.95, burst=5, backoff_base_s=0.25)),
+        run_scenario(args, f"꼬리: {args.tail_prob:.0%} 응답이 {args.tail_mult:.0f}배 느림",
+                     {"latency_ms": args.latency_ms, "tail_prob": args.tail_prob, "tail_mult": args.tail_mult},
+                     GatewayConfig(default_rpm=60_000, burst=args.concurrency * 2, hedge=True)),
+    ]
+    for s in scenarios:
+        print_scenario(s)
+
+    failures = []
+    burst, tail = scenarios
+    if sum(burst["gateway"]["errors"].values()) > sum(burst["sdk"]["errors"].values()):
+        failures.append("폭주: 게이트웨이 실패가 SDK 기본값보다 많음")
+    if tail["gateway"]["p99_ms"] > tail["sdk"]["p99_ms"]:
+        failures.append("꼬리: 게이트웨이 p99 가 SDK 기본값보다 느림")
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(scenarios, f, ensure_ascii=False, indent=1)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# bench/import_profile.py — 앱 콜드 스타트(첫 화면까지) 시간과 import 비용 프로파일
+#
+#   python -m bench.import_profile                          # app.py 를 bare 모드로 1회 실행, 패키지별 import 시간 상위 15개
+#   python -m bench.import_profile --repeat 5 --out import_after.json --baseline import_before.json
+#   python -m bench.import_profile --max-script-ms 1500      # 첫 화면까지 시간이 넘으면 종료 코드 1
+#
+# 새 파이썬 프로세스에서 `python -X importtime` 으로 스크립트를 끝까지 실행한다 (버튼 클릭 전 첫 렌더와 같음).
+# 백그라운드 예열(APP_WARMUP)은 꺼서 스크립트 자체의 비용만 잰다.
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+_CHILD = """
+import os, runpy, sys, time
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+t0 = time.perf_counter()
+runpy.run_path({target!r}, run_name="__main__")
+print("SCRIPT_MS", round((time.perf_counter() - t0) * 1000, 1))
+"""
+
+
+def profile_once(target: str) -> dict:
+    env = dict(os.environ, APP_WARMUP="0", OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "sk-profile")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(root=ROOT, target=target)],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+    m = re.search(r"SCRIPT_MS ([\d.]+)", proc.stdout)
+    if proc.returncode != 0 or not m:
+        raise RuntimeError(f"{target} 실행 실패:\n{proc.stderr[-2000:]}")
+
+    # 최상위(들여쓰기 1칸) import 의 누적 시간만 패키지 단위로 합산
+    packages, modules = Counter(), 0
+    for line in proc.stderr.splitlines():
+        lm = _LINE.match(line)
+        if not lm:
+            continue
+        modules += 1
+        if len(lm.group(3)) == 1:
+            packages[lm.group(4).split(".")[0]] += int(lm.group(2))
+    return {
+        "script_ms": float(m.group(1)),
+        "import_ms": round(sum(packages.values()) / 1000, 1),
+        "modules": modules,
+        "packages": {k: round(v / 1000, 1) for k, v in packages.most_common()},
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="앱 콜드 스타트/import 시간 프로파일")
+    ap.add_argument("--target", default="app.py", help="실행할 스크립트 (저장소 루트 기준)")
+    ap.add_argument("--repeat", type=int, default=3, help="반복 횟수 (가장 빠른 회차 기준)")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", help="결과 JSON 저장 경로")
+    ap.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    ap.add_argument("--max-script-ms", type=float, default=0, help="첫 화면까지 시간 상한 (ms)")
+    args = ap.parse_args(argv)
+
+    runs = [profile_once(args.target) for _ in range(args.repeat)]
+    best = min(runs, key=lambda r: r["script_ms"])
+    report = dict(best, target=args.target, repeat=args.repeat, script_ms_all=[r["script_ms"] for r in runs])
+
+    base = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+
+    print(f"{args.target}: 첫 화면까지 {best['script_ms']}ms (회차별 {report['script_ms_all']}) · "
+          f"import {best['import_ms']}ms · 모듈 {best['modules']}개")
+    if base:
+        print(f"기준 대비: 첫 화면 {base['script_ms']} → {best['script_ms']}ms · "
+              f"import {base['import_ms']} → {best['import_ms']}ms · 모듈 {base['modules']} → {best['modules']}개")
+    print(f"{'package':28} {'ms':>9}" + (f" {'baseline':>9}" if base else ""))
+    names = list(best["packages"])[:args.top]
+    if base:
+        names += [n for n in list(base["packages"])[:args.top] if n not in names]
+    for name in names:
+        line = f"{name:28} {best['packages'].get(name, 0.0):>9}"
+        if base:
+            line += f" {base['packages'].get(name, 0.0):>9}"
+        print(line)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.max_script_ms and best["script_ms"] > args.max_script_ms:
+        print(f"첫 화면까지 {best['script_ms']}ms > 상한 {args.max_script_ms}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# bench/run.py — 오프라인 파이프라인 벤치마크 (OpenAI/Supabase 없이 재현 가능)
+#
+#   python -m bench.run                              # SQLite 합성 DB + 합성/녹화 LLM 응답
+#   python -m bench.run --concurrency 8 --repeat 3   # 동시 실행 + 캐시 적중 구간 포함
+#   python -m bench.run --db-uri postgresql+psycopg://localhost/kics_bench --seed-db
+#   python -m bench.run --record                     # OPENAI_API_KEY 로 실제 호출해 bench/fixtures/llm.json 에 녹화
+#   python -m bench.run --out bench_result.json --baseline bench_baseline.json --tolerance 0.25
+#   python -m bench.run --compare                    # 비교 질문은 회사/연도별 하위 쿼리 동시 실행
+#   python -m bench.run --rollup                     # 피벗 스냅샷(Parquet)으로 응답 가능한 조회는 로컬에서
+#   python -m bench.run --max-p95 generate_sql=50 --max-p95 pipeline=900 --min-qps 5
+#
+# 질문마다 generate_sql → extract_select/validate_sql → run_sql → summarize_answer 를
+# 앱과 같은 Pipeline 코드로 돌리고, 단계별 p50/p95/p99 와 처리량(질문/초)을 보고한다.
+# 기준치(--max-p95/--min-qps/--baseline)를 넘으면 종료 코드 1 → CI 에서 회귀 감지.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_openai import LatencyModel, ReplayAgent, ReplayOpenAI
+from bench.seed import seed_kics
+from chart_prep import prepare_chart
+from db import create_pooled_engine, pool_stats
+from pipeline import Pipeline, PipelineConfig
+from result_cache import ResultCache
+from rollup import RollupStore
+from sql_cache import SQLCache
+from sql_guard import extract_select
+from tracing import TracedChatClient, Tracer, aggregate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUESTIONS = os.path.join(BENCH_DIR, "questions.jsonl")
+DEFAULT_FIXTURES = os.path.join(BENCH_DIR, "fixtures", "llm.json")
+
+
+def load_questions(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_thresholds(items) -> dict:
+    out = {}
+    for item in items or []:
+        stage, _, ms = item.partition("=")
+        out[stage.strip()] = float(ms)
+    return out
+
+
+def run_one(pipe: Pipeline, question: str, stream: bool, compare: bool = False) -> dict:
+    tracer = pipe.tracer
+    meta = {}
+    with tracer.span("pipeline", question=question):
+        plan = pipe.plan_comparison(question) if compare else None
+        if plan is not None:
+            df = pipe.run_comparison(plan)
+            meta["engine"] = "compare"
+        else:
+            sql = pipe.generate_sql(question, meta)
+
+            # 에이전트 출력 정리/검증 단계만 따로 측정 (생성된 SQL 을 다시 통과시킨다)
+            t0 = time.perf_counter()
+            pipe.validate_sql(extract_select(sql))
+            tracer.event("validate_sql", (time.perf_counter() - t0) * 1000)
+
+            df = pipe.run_sql(sql)
+        if df.empty:
+            return {"engine": meta["engine"], "rows": 0}
+        with tracer.span("prepare_chart", rows=len(df)) as span:
+            chart = prepare_chart(df)
+            span.set(points=chart.info.get("points", 0), bytes=chart.info.get("payload_bytes", 0))
+        with tracer.span("summarize_answer", cache_hit=False, streamed=stream, rows=len(df)):
+            if stream:
+                "".join(pipe.stream_summary(question, df))
+            else:
+                pipe.summarize_answer(question, df)
+    return {"engine": meta["engine"], "rows": len(df)}
+
+
+def build_pipeline(args, work_dir: str):
+    db_uri = args.db_uri or f"sqlite:///{os.path.join(work_dir, 'kics_bench.sqlite3')}"
+    engine = create_pooled_engine(db_uri, min_size=2, max_size=max(args.concurrency, 2) + 2, pool_timeout=30)
+    if args.seed_db or not args.db_uri:
+        seed_kics(engine, first_year=args.first_year, last_year=args.last_year)
+
+    latency = LatencyModel(args.latency_ms, args.token_ms, args.jitter, seed=args.seed)
+    real_client = None
+    if args.record:
+        from openai import OpenAI
+        real_client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    client = ReplayOpenAI(args.fixtures, latency=LatencyModel() if args.record else latency, real_client=real_client)
+
+    answers = {q["q"]: q["agent_sql"] for q in load_questions(args.questions) if q.get("agent_sql")}
+    pipe = None
+    agent = ReplayAgent(lambda: pipe.table_spec(), answers=answers, latency=latency)
+    pipe = Pipeline(
+        TracedChatClient(client),
+        engine,
+        PipelineConfig(sql_engine=args.sql_engine, max_rows=args.max_rows, fetch_chunk_rows=args.chunk_rows),
+        sql_cache=None if args.no_cache else SQLCache(os.path.join(work_dir, "sql_cache.sqlite3")),
+        result_cache=None if args.no_cache else ResultCache(),
+        tracer=Tracer(args.trace_log, keep=1_000_000),
+        agent_factory=lambda: agent,
+        rollup=RollupStore(engine, os.path.join(work_dir, "kics_rollup.parquet")) if args.rollup else None,
+    )
+    return pipe, client, agent
+
+
+def run_bench(args) -> dict:
+    questions = [q["q"] for q in load_questions(args.questions)]
+    if args.limit:
+        questions = questions[:args.limit]
+
+    with tempfile.TemporaryDirectory(prefix="nh_bench_") as work_dir:
+        pipe, client, agent = build_pipeline(args, work_dir)
+        pipe.table_spec()  # 스키마 조회는 측정에서 제외 (앱에서는 TTL 캐시)
+        if pipe.rollup is not None:
+            pipe.rollup.refresh(pipe.table_spec())  # 앱에서는 백그라운드 갱신
+
+        engines, errors, passes = Counter(), [], []
+        t_all = time.perf_counter()
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                futures = [(q, pool.submit(run_one, pipe, q, args.stream, args.compare)) for q in questions]
+                for q, fut in futures:
+                    try:
+                        engines[fut.result()["engine"]] += 1
+                    except Exception as e:
+                        errors.append({"question": q, "error": f"{type(e).__name__}: {e}"})
+            wall = time.perf_counter() - t0
+            passes.append({"wall_s": round(wall, 3), "qps": round(len(questions) / wall, 2)})
+        wall_all = time.perf_counter() - t_all
+
+        if args.record:
+            client.save()
+
+        ps = pool_stats(pipe.engine)
+        return {
+            "questions": len(questions),
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "token_ms": args.token_ms,
+            "wall_s": round(wall_all, 3),
+            "throughput_qps": round(len(questions) * args.repeat / wall_all, 2),
+            "passes": passes,
+            "errors": errors,
+            "engines": dict(engines),
+            "stages": aggregate(pipe.tracer.records()),
+            "llm": client.stats(),
+            "agent": agent.stats(),
+            "engine_stats": pipe.stats.snapshot(),
+            "sql_cache": pipe.sql_cache.stats() if pipe.sql_cache else None,
+            "result_cache": pipe.result_cache.stats() if pipe.result_cache else None,
+            "rollup": pipe.rollup.stats() if pipe.rollup is not None else None,
+            "db_pool": {k: ps[k] for k in ("checkouts", "wait_avg_ms", "wait_max_ms", "timeouts", "new_connections")},
+        }
+
+
+def check(report: dict, args) -> list:
+    failures = []
+    stages = {s["stage"]: s for s in report["stages"]}
+    for stage, limit in parse_thresholds(args.max_p95).items():
+        p95 = (stages.get(stage) or {}).get("p95_ms")
+        if p95 is not None and p95 > limit:
+            failures.append(f"{stage} p95 {p95}ms > {limit}ms")
+    if args.min_qps and report["throughput_qps"] < args.min_qps:
+        failures.append(f"throughput {report['throughput_qps']} qps < {args.min_qps} qps")
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            base = {s["stage"]: s for s in json.load(f)["stages"]}
+        for stage, s in stages.items():
+            b = (base.get(stage) or {}).get("p95_ms")
+            if b and s["p95_ms"] is not None and s["p95_ms"] > b * (1 + args.tolerance) + 1:
+                failures.append(f"{stage} p95 {s['p95_ms']}ms > baseline {b}ms (+{args.tolerance:.0%})")
+    if report["errors"] and not args.allow_errors:
+        failures.append(f"{len(report['errors'])}개 질문 실패")
+    return failures
+
+
+def print_report(report: dict):
+    print(f"질문 {report['questions']}개 × {report['repeat']}회 · 동시성 {report['concurrency']} · "
+          f"LLM 지연 {report['latency_ms']}ms + 토큰당 {report['token_ms']}ms")
+    print(f"전체 {report['wall_s']}s · 처리량 {report['throughput_qps']} 질문/초 · "
+          f"회차별 {[p['qps'] for p in report['passes']]}")
+    print(f"엔진: {report['engines']} · LLM: {report['llm']} · 에이전트: {report['agent']}")
+    if report["rollup"]:
+        ro = report["rollup"]
+        print(f"롤업: 응답 {ro['served']} · 범위 밖 {ro['missed']} · 커버리지 {ro['coverage']:.0%} · "
+              f"갱신 {ro['last_refresh_mode']} {ro['last_refresh_s']}s")
+    print(f"{'stage':<18}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'llm':>7}{'hit':>7}")
+    for s in report["stages"]:
+        hit = "-" if s["cache_hit_rate"] is None else f"{s['cache_hit_rate']:.0%}"
+        print(f"{s['stage']:<18}{s['count']:>6}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['llm_calls_avg']:>7}{hit:>7}")
+    for e in report["errors"][:10]:
+        print(f"  실패: {e['question']} — {e['error']}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="NH 챗봇 파이프라인 오프라인 벤치마크")
+    ap.add_argument("--questions", default=DEFAULT_QUESTIONS, help="질문 코퍼스 (JSON lines: q, agent_sql)")
+    ap.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="LLM 녹화 파일 (없으면 합성 응답)")
+    ap.add_argument("--record", action="store_true", help="실제 OpenAI 로 호출해 녹화 (OPENAI_API_KEY 필요)")
+    ap.add_argument("--db-uri", help="벤치마크 DB (기본: 임시 SQLite)")
+    ap.add_argument("--seed-db", action="store_true", help="--db-uri 테이블을 합성 데이터로 다시 만든다")
+    ap.add_argument("--first-year", type=int, default=2019)
+    ap.add_argument("--last-year", type=int, default=2025)
+    ap.add_argument("--sql-engine", default="single_shot", choices=("single_shot", "agent"))
+    ap.add_argument("--latency-ms", type=float, default=300, help="LLM 첫 토큰까지 지연 (ms)")
+    ap.add_argument("--token-ms", type=float, default=2, help="출력 토큰당 지연 (ms)")
+    ap.add_argument("--jitter", type=float, default=0.2, help="첫 토큰 지연의 ± 비율")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=1, help="코퍼스 반복 횟수 (2회차부터 캐시 적중)")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--stream", action="store_true", help="요약을 stream_summary 로 받는다")
+    ap.add_argument("--compare", action="store_true", help="비교 모드(하위 쿼리 동시 실행) 사용")
+    ap.add_argument("--rollup", action="store_true", help="피벗 스냅샷(rollup.RollupStore) 사용")
+    ap.add_argument("--max-rows", type=int, default=5000, help="조회 결과 최대 행 수 (run_sql 행 제한)")
+    ap.add_argument("--chunk-rows", type=int, default=1000, help="서버 측 커서 청크 크기")
+    ap.add_argument("--no-cache", action="store_true", help="SQL/결과 캐시 없이 실행")
+    ap.add_argument("--trace-log", help="단계별 트레이스(JSON lines) 저장 경로")
+    ap.add_argument("--out", help="결과 JSON 저장 경로")
+    ap.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="기준 대비 허용 p95 증가율")
+    ap.add_argument("--max-p95", action="append", metavar="STAGE=MS", help="단계별 p95 상한 (여러 번 지정)")
+    ap.add_argument("--min-qps", type=float, default=0)
+    ap.add_argument("--allow-errors", action="store_true")
+    args = ap.parse_args(argv)
+
+    report = run_bench(args)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+
+    failures = check(report, args)
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
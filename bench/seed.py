@@ -0,0 +1,54 @@
+# bench/seed.py — 합성 kics_solvency_data_flexible 적재 (SQLite 또는 로컬 Postgres)
+import random
+
+from sqlalchemy import text
+
+from question_parser import COMPANY_NAMES
+
+METRICS = ("k_ics", "assets", "liabilities", "revenue")
+
+# 지표별 (시작값 범위, 분기당 변동폭) — 단위: k_ics %, 나머지 억원
+_PROFILE = {
+    "k_ics": ((150.0, 300.0), 0.04),
+    "assets": ((20_000.0, 3_000_000.0), 0.02),
+    "liabilities": ((18_000.0, 2_700_000.0), 0.02),
+    "revenue": ((1_000.0, 300_000.0), 0.06),
+}
+
+
+def closing_yms(first_year: int, last_year: int) -> list:
+    # 분기말 결산년월 (YYYYMM 정수)
+    return [y * 100 + m for y in range(first_year, last_year + 1) for m in (3, 6, 9, 12)]
+
+
+def synthetic_rows(first_year: int = 2019, last_year: int = 2025, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for company in COMPANY_NAMES:
+        for metric in METRICS:
+            (lo, hi), drift = _PROFILE[metric]
+            value = rng.uniform(lo, hi)
+            for ym in closing_yms(first_year, last_year):
+                value *= 1 + rng.uniform(-drift, drift)
+                rows.append({"company_code": company, "closing_ym": ym, "metric": metric, "value": round(value, 2)})
+    return rows
+
+
+def seed_kics(engine, table: str = "kics_solvency_data_flexible", first_year: int = 2019, last_year: int = 2025,
+              seed: int = 7) -> int:
+    """테이블을 새로 만들고 합성 데이터를 넣는다. 반환: 행 수"""
+    rows = synthetic_rows(first_year, last_year, seed)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+        conn.exec_driver_sql(
+            f"CREATE TABLE {table} ("
+            "company_code VARCHAR(64) NOT NULL, closing_ym INTEGER NOT NULL, "
+            "metric VARCHAR(64) NOT NULL, value DOUBLE PRECISION)"
+        )
+        conn.exec_driver_sql(f"CREATE INDEX ix_{table}_ym_co ON {table} (closing_ym, company_code)")
+        conn.execute(
+            text(f"INSERT INTO {table} (company_code, closing_ym, metric, value) "
+                 "VALUES (:company_code, :closing_ym, :metric, :value)"),
+            rows,
+        )
+    return len(rows)
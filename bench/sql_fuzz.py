@@ -0,0 +1,210 @@
+# bench/sql_fuzz.py — sql_guard 검증기 코퍼스/퍼즈/속도 점검 (기존 정규식 검증기와 비교)
+#
+#   python -m bench.sql_fuzz                    # 코퍼스 판정 + 퍼즈 2000건 + 속도
+#   python -m bench.sql_fuzz --fuzz 20000 --seed 7
+#
+# 코퍼스(bench/sql_corpus.jsonl)의 기대 판정과 다르거나, 퍼즈 입력에서 SQLGuardError 가 아닌
+# 예외가 나거나, 안전한 변형을 거부/위험한 변형을 통과시키면 종료 코드 1.
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from sql_guard import SQLGuardError, allowlist_for, extract_select, tokenize, validate_select
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, "sql_corpus.jsonl")
+ALLOW = allowlist_for("kics_solvency_data_flexible", ["company_code", "closing_ym", "metric", "value"])
+
+
+# ----------------- 기존 정규식 검증기 (비교 기준) -----------------
+def _legacy_remove_sql_comments(sql: str) -> str:
+    sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.S)
+    sql = re.sub(r"^\s*--.*?$", "", sql, flags=re.M)
+    return sql.strip()
+
+
+def legacy_validate(sql: str):
+    sql = _legacy_remove_sql_comments(sql)
+    if sql.count(";") > 1:
+        raise ValueError("Multiple statements are not allowed.")
+    if not re.match(r"(?is)^\s*select\b", sql):
+        raise ValueError("Only SELECT queries are allowed.")
+    banned = r"(?is)\b(insert|update|delete|drop|alter|create|grant|revoke|truncate|copy|into|explain|with)\b"
+    if re.search(banned, sql):
+        raise ValueError("Blocked SQL keyword detected.")
+
+
+def _accepts(fn, sql: str) -> bool:
+    try:
+        fn(sql)
+        return True
+    except ValueError:
+        return False
+
+
+# ----------------- 퍼즈 변형 -----------------
+# 안전한 변형: 의미는 그대로 → 통과해야 하고, 정규화 결과는 다시 검증해도 같아야 함
+def _flip_case(sql, rng):
+    return "".join(c.upper() if rng.random() < 0.5 else c.lower() for c in sql) if "'" not in sql else sql
+
+
+def _respace(sql, rng):
+    tokens = tokenize(sql)
+    out, last = [], 0
+    for t in tokens:
+        gap = sql[last:t.start]
+        if gap:
+            gap = rng.choice([" ", "  ", "\n", "\t", "\n  "])
+        out += [gap, sql[t.start:t.end]]
+        last = t.end
+    return "".join(out)
+
+
+def _add_comments(sql, rng):
+    word = rng.choice(["insert", "drop table x", "with", "into", "; delete", "'", '"'])
+    tokens = tokenize(sql)
+    t = rng.choice(tokens[1:]) if len(tokens) > 1 else tokens[0]
+    comment = f"/* {word} */ " if rng.random() < 0.5 or "'" in word else f"-- {word}\n"
+    return sql[:t.start] + comment + sql[t.start:]
+
+
+def _literal_words(sql, rng):
+    word = rng.choice(["into", "with", "delete", "drop table x; --", "pg_sleep(1)", "; select 1", "/*", "--"])
+    return sql.replace("'k_ics'", "'k_ics " + word.replace("'", "''") + "'", 1)
+
+
+SAFE = (_flip_case, _respace, _add_comments, _literal_words)
+
+
+# 위험한 변형: 반드시 거부
+def _append_statement(sql, rng):
+    return sql.rstrip(";") + rng.choice(["; DROP TABLE x", ";DELETE FROM kics_solvency_data_flexible", "; select 1"])
+
+
+def _inject_function(sql, rng):
+    fn = rng.choice(["pg_sleep(5)", "pg_read_file('/etc/passwd')", "set_config('a','b',false)", "lo_import('/x')",
+                     "dblink('h','q')", "current_setting('x')", "version()"])
+    return sql.replace("SELECT ", f"SELECT {fn}, ", 1)
+
+
+def _inject_table(sql, rng):
+    t = rng.choice(["pg_user", "pg_catalog.pg_authid", "information_schema.columns", "secrets", "sqlite_master"])
+    return sql.replace("FROM kics_solvency_data_flexible", f"FROM kics_solvency_data_flexible, {t}", 1)
+
+
+def _inject_write(sql, rng):
+    kw = rng.choice(["INTO backup ", "FOR UPDATE", "FOR SHARE"])
+    if kw.startswith("INTO"):
+        return sql.replace(" FROM ", f" {kw}FROM ", 1)
+    return re.sub(r"\s+LIMIT\s+\d+\s*;?\s*$", "", sql) + " " + kw
+
+
+def _break_quote(sql, rng):
+    return sql.replace("'k_ics'", "'k_ics", 1)
+
+
+UNSAFE = (_append_statement, _inject_function, _inject_table, _inject_write, _break_quote)
+
+
+def _garbage(rng):
+    alphabet = "SELECT from where ' \" ( ) ; , . * -- /* */ $ :: \\ 1 a_b 한글 \n"
+    parts = alphabet.split(" ")
+    return " ".join(rng.choice(parts) for _ in range(rng.randint(1, 30)))
+
+
+# ----------------- 실행 -----------------
+def check_corpus(cases) -> dict:
+    failures, legacy_false_rejects, legacy_false_accepts = [], 0, 0
+    for c in cases:
+        new_ok = _accepts(lambda s: validate_select(s, ALLOW), c["sql"])
+        old_ok = _accepts(legacy_validate, c["sql"])
+        if new_ok != c["ok"]:
+            failures.append(f"corpus: expected {'pass' if c['ok'] else 'reject'} ({c['why']}): {c['sql'][:100]}")
+        legacy_false_rejects += c["ok"] and not old_ok
+        legacy_false_accepts += (not c["ok"]) and old_ok
+    return {
+        "cases": len(cases),
+        "failures": failures,
+        "legacy_false_rejects": legacy_false_rejects,
+        "legacy_false_accepts": legacy_false_accepts,
+    }
+
+
+def fuzz(cases, n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    good = [c["sql"] for c in cases if c["ok"] and "'k_ics'" in c["sql"]]
+    failures, counts = [], {"safe": 0, "unsafe": 0, "garbage": 0}
+    for _ in range(n):
+        roll = rng.random()
+        base = rng.choice(good)
+        try:
+            if roll < 0.5:
+                counts["safe"] += 1
+                mutated = rng.choice(SAFE)(base, rng)
+                try:
+                    out = validate_select(mutated, ALLOW)
+                except SQLGuardError as e:
+                    failures.append(f"safe mutation rejected ({e}): {mutated[:120]!r}")
+                    continue
+                if validate_select(out, ALLOW) != out:
+                    failures.append(f"normalization not idempotent: {mutated[:120]!r}")
+            elif roll < 0.9:
+                counts["unsafe"] += 1
+                mutated = rng.choice(UNSAFE)(base, rng)
+                if mutated != base and _accepts(lambda s: validate_select(s, ALLOW), mutated):
+                    failures.append(f"unsafe mutation accepted: {mutated[:120]!r}")
+            else:
+                counts["garbage"] += 1
+                mutated = _garbage(rng)
+                _accepts(lambda s: validate_select(s, ALLOW), mutated)
+                extract_select(mutated)
+        except Exception as e:  # SQLGuardError(ValueError) 외 예외는 모두 버그
+            failures.append(f"crash {type(e).__name__}: {e}: {mutated[:120]!r}")
+    return {"iterations": n, **counts, "failures": failures}
+
+
+def timing(cases, rounds: int = 200) -> dict:
+    sqls = [c["sql"] for c in cases]
+
+    def _us(fn):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for s in sqls:
+                _accepts(fn, s)
+        return round((time.perf_counter() - t0) / (rounds * len(sqls)) * 1e6, 1)
+
+    return {"legacy_us": _us(legacy_validate), "guard_us": _us(lambda s: validate_select(s, ALLOW))}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="sql_guard 코퍼스/퍼즈/속도 점검")
+    ap.add_argument("--corpus", default=DEFAULT_CORPUS)
+    ap.add_argument("--fuzz", type=int, default=2000, help="퍼즈 반복 횟수")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="결과 JSON 저장 경로")
+    args = ap.parse_args(argv)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    report = {"corpus": check_corpus(cases), "fuzz": fuzz(cases, args.fuzz, args.seed), "timing": timing(cases)}
+
+    c, z, t = report["corpus"], report["fuzz"], report["timing"]
+    print(f"코퍼스 {c['cases']}건 · 불일치 {len(c['failures'])} · "
+          f"기존 정규식: 오탐(정상 거부) {c['legacy_false_rejects']} / 미탐(위험 통과) {c['legacy_false_accepts']}")
+    print(f"퍼즈 {z['iterations']}건 (안전 {z['safe']} · 위험 {z['unsafe']} · 무작위 {z['garbage']}) · 실패 {len(z['failures'])}")
+    print(f"검증 1건당: 기존 {t['legacy_us']}µs · sql_guard {t['guard_us']}µs")
+    failures = c["failures"] + z["failures"]
+    for f in failures[:20]:
+        print("  ✗", f)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
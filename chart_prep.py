@@ -0,0 +1,141 @@
+# chart_prep.py — 차트용 데이터 준비 (컬럼 역할 1회 추론, closing_ym → 날짜, top-N/LTTB 로 점 개수 제한)
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from summary_input import infer_roles
+
+
+class ChartData(NamedTuple):
+    kind: str          # "bar" / "line" / None (그릴 수 없음)
+    data: pd.DataFrame  # 차트에 넘길 최소 컬럼만 (x, y, color)
+    x: str
+    y: str
+    color: str         # 시리즈 구분 컬럼 (시리즈가 하나면 None)
+    info: dict
+
+
+def payload_bytes(df: pd.DataFrame) -> int:
+    # Vega-Lite 인라인 데이터(JSON records) 크기
+    return len(df.to_json(orient="records", date_format="iso").encode("utf-8"))
+
+
+def to_dates(s: pd.Series) -> pd.Series:
+    """YYYYMM(정수/문자열) 또는 날짜 문자열 → datetime64. 해석 못 하면 NaT."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    if pd.api.types.is_numeric_dtype(s):
+        ym = pd.to_numeric(s, errors="coerce")
+        ok = ym.between(100001, 999912) & (ym % 100).between(1, 12)
+        ym = ym.where(ok)
+        return pd.to_datetime(pd.DataFrame({"year": ym // 100, "month": ym % 100, "day": 1}), errors="coerce")
+    text = s.astype("string").str.replace(r"\.0$", "", regex=True).str.strip()
+    out = pd.to_datetime(text.where(text.str.fullmatch(r"\d{6}")), format="%Y%m", errors="coerce")
+    rest = out.isna() & text.notna()
+    if rest.any():
+        out[rest] = pd.to_datetime(text[rest], errors="coerce", format="mixed")
+    return out
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets — 모양을 유지하며 n_out 개 점의 인덱스를 고른다 (x 오름차순)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    bucket = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        nstart, nend = end, min(int((i + 2) * bucket) + 1, n)
+        if nend <= nstart:
+            nstart, nend = n - 1, n
+        avg_x, avg_y = x[nstart:nend].mean(), y[nstart:nend].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def _long(df: pd.DataFrame, roles: dict) -> tuple:
+    # (_cat, _date, _metric, _value) long 포맷 + 표시용 컬럼명
+    ym, metric, cat = roles["ym"], roles["metric"], roles["category"]
+    base = pd.DataFrame(index=df.index)
+    base["_cat"] = df[cat].astype(str) if cat else ""
+    base["_date"] = to_dates(df[ym]) if ym else pd.NaT
+    if metric:
+        value = roles["values"][0]
+        long = base.assign(_metric=df[metric].astype(str), _value=pd.to_numeric(df[value], errors="coerce"))
+    else:
+        value = roles["values"][0] if len(roles["values"]) == 1 else "value"
+        long = pd.concat(
+            [base.assign(_metric=str(c), _value=pd.to_numeric(df[c], errors="coerce")) for c in roles["values"]],
+            ignore_index=True,
+        )
+    return long.dropna(subset=["_value"]), value
+
+
+def prepare_chart(df: pd.DataFrame, max_points: int = 1000, top_n: int = 10, ym_col: str = "closing_ym") -> ChartData:
+    """
+    결산년월이 2개 이상이면 선그래프(시리즈별 LTTB), 아니면 막대그래프(시리즈별 평균 → 상위 top_n).
+    회사가 여러 곳이면 시리즈 = 회사(첫 번째 지표만), 회사가 하나면 시리즈 = 지표.
+    """
+    # 원본을 그대로 넘겼을 때의 크기는 앞부분 샘플로 추정
+    sample = df.head(200)
+    info = {"rows_in": len(df), "raw_payload_bytes": int(payload_bytes(sample) * len(df) / max(len(sample), 1))}
+    roles = infer_roles(df, ym_col)
+    if df.empty or not roles["values"]:
+        return ChartData(None, df.iloc[0:0], None, None, None, info)
+
+    long, value_name = _long(df, roles)
+    ym_name = roles["ym"] or "closing_ym"
+    by_company = long["_cat"].nunique() > 1
+    if by_company and long["_metric"].nunique() > 1:
+        primary = long["_metric"].iloc[0]
+        info["metrics_dropped"] = sorted(set(long["_metric"]) - {primary})
+        long = long[long["_metric"] == primary]
+    key = "_cat" if by_company else "_metric"
+    series_name = (roles["category"] or "company") if by_company else (roles["metric"] or "metric")
+    info.update(series_total=int(long[key].nunique()), methods=[])
+
+    if long["_date"].nunique() > 1:
+        kind = "line"
+        long = long.dropna(subset=["_date"])
+        # 최신 시점 값 기준 상위 top_n 시리즈
+        last = long.sort_values("_date").groupby(key, sort=False)["_value"].last()
+        keep = last.sort_values(ascending=False).index[:top_n]
+        if len(keep) < len(last):
+            info["methods"].append("top_n")
+        long = long[long[key].isin(keep)]
+        budget = max(3, max_points // max(len(keep), 1))
+        parts = []
+        for _, g in long.groupby(key, sort=False):
+            g = g.sort_values("_date")
+            if len(g) > budget:
+                x = g["_date"].to_numpy(dtype="datetime64[s]").astype(np.float64)
+                g = g.iloc[lttb(x, g["_value"].to_numpy(dtype=np.float64), budget)]
+                if "lttb" not in info["methods"]:
+                    info["methods"].append("lttb")
+            parts.append(g)
+        long = pd.concat(parts, ignore_index=True)
+        out = pd.DataFrame({ym_name: long["_date"], value_name: long["_value"]})
+    else:
+        kind = "bar"
+        agg = long.groupby(key, sort=False)["_value"]
+        if (agg.size() > 1).any():
+            info["methods"].append("aggregate")
+        top = agg.mean().sort_values(ascending=False)
+        if len(top) > top_n:
+            info["methods"].append("top_n")
+            top = top.head(top_n)
+        long = top.rename("_value").reset_index()
+        out = pd.DataFrame({value_name: long["_value"]})
+
+    color = series_name if kind == "line" and info["series_total"] > 1 else None
+    if kind == "bar" or color:
+        out.insert(0, series_name, long[key].to_numpy())
+    info.update(series_shown=int(long[key].nunique()), points=len(out), payload_bytes=payload_bytes(out))
+    x = ym_name if kind == "line" else series_name
+    return ChartData(kind, out, x, value_name, color, info)
@@ -0,0 +1,184 @@
+# comparison.py — 비교 모드: 회사별/연도별 하위 쿼리로 나눠 비동기 동시 실행 후 하나의 DataFrame 으로 병합
+import asyncio
+import threading
+import time
+from typing import NamedTuple
+
+import pandas as pd
+
+from db import BoundedReader, bound_sql, fetch_bounded
+from question_parser import parse_local_slots
+from sql_engine import TableSpec, build_select
+
+
+class SubQuery(NamedTuple):
+    label: str    # 회사명 또는 연도 (진행 표시/오류 메시지용)
+    sql: str
+
+
+class ComparisonPlan(NamedTuple):
+    split_by: str          # "company" 또는 "year"
+    parts: tuple           # SubQuery 목록
+    order_by: tuple        # 병합 후 정렬 컬럼 (단일 쿼리의 ORDER BY 와 동일)
+
+    @property
+    def sql(self) -> str:
+        return ";\n".join(p.sql for p in self.parts)
+
+
+def plan_comparison(question: str, spec: TableSpec, max_parts: int = 40):
+    """
+    슬롯만으로 표현되는 질문 중 회사가 2개 이상(업권 그룹 포함)이면 회사별,
+    회사 1개 이하 + 기간이 2개 연도 이상이면 연도별 하위 쿼리로 나눈다. 나눌 수 없으면 None.
+    """
+    slots = parse_local_slots(question, spec.metrics)
+    if not slots["complete"]:
+        return None
+    base = {k: slots[k] for k in ("companies", "closing_ym_from", "closing_ym_to", "metrics")}
+    order_by = (spec.ym_col, spec.company_col, spec.metric_col)
+
+    if len(base["companies"]) >= 2:
+        parts = [SubQuery(c, build_select({**base, "companies": [c]}, spec)) for c in base["companies"]]
+        split_by = "company"
+    elif base["closing_ym_from"] and base["closing_ym_from"][:4] != base["closing_ym_to"][:4]:
+        y0, y1 = int(base["closing_ym_from"][:4]), int(base["closing_ym_to"][:4])
+        parts = []
+        for y in range(y0, y1 + 1):
+            ym_from = max(base["closing_ym_from"], f"{y}01")
+            ym_to = min(base["closing_ym_to"], f"{y}12")
+            parts.append(SubQuery(str(y), build_select({**base, "closing_ym_from": ym_from, "closing_ym_to": ym_to}, spec)))
+        split_by = "year"
+    else:
+        return None
+
+    if len(parts) > max_parts:
+        return None
+    return ComparisonPlan(split_by, tuple(parts), order_by)
+
+
+# ----------------- 하위 쿼리 실행기 -----------------
+# fetch(sql) 는 (DataFrame, 잘림 여부) 를 돌려준다 — 둘 다 db.fetch_bounded 와 같은 타입 변환/max_rows+1 잘림 확인
+class _SQLAlchemyFetcher:
+    """
+    Postgres 가 아닌 엔진(벤치마크용 SQLite 등) 또는 psycopg_pool 미설치 — 동기 엔진을 스레드로 넘겨 동시 실행.
+    ComparisonRunner 의 wait_for 는 기다리기만 멈출 뿐 스레드의 DB 호출은 끊지 못한다.
+    그래서 Postgres 면 같은 시간의 statement_timeout 을 걸어 서버가 쿼리를 끊게 하고,
+    그 밖의 엔진(SQLite)은 시간 초과 후에도 쿼리가 끝날 때까지 스레드를 점유한다.
+    """
+
+    def __init__(self, engine, max_rows: int, statement_timeout_ms: int = None):
+        self.engine = engine
+        self.max_rows = max_rows
+        self.statement_timeout_ms = statement_timeout_ms
+
+    def _read(self, sql: str):
+        info = {}
+        df = fetch_bounded(self.engine, sql, max_rows=self.max_rows, timeout_ms=self.statement_timeout_ms, info=info)
+        return df, info["truncated"]
+
+    async def fetch(self, sql: str):
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, sql)
+
+    async def close(self):
+        pass
+
+
+class _PsycopgFetcher:
+    # psycopg AsyncConnectionPool — 커넥션마다 statement_timeout 을 걸어 서버에서도 하위 쿼리를 끊는다
+    def __init__(self, conninfo: str, max_size: int, statement_timeout_ms: int, max_rows: int, chunk_rows: int = 1000):
+        from psycopg_pool import AsyncConnectionPool
+
+        self.pool = AsyncConnectionPool(
+            conninfo,
+            min_size=1,
+            max_size=max_size,
+            kwargs={"options": f"-c statement_timeout={int(statement_timeout_ms)}"},
+            open=False,
+        )
+        self._opened = False
+        self.max_rows = max_rows
+        self.chunk_rows = chunk_rows
+
+    async def fetch(self, sql: str):
+        if not self._opened:
+            await self.pool.open()
+            self._opened = True
+        bounded, limit = bound_sql(sql, self.max_rows)
+        async with self.pool.connection() as conn:
+            # 이름 있는 커서 = 서버 측 커서: chunk_rows 씩 받고 max_rows 를 넘으면 나머지는 받지 않는다
+            async with conn.cursor(name="kics_compare") as cur:
+                await cur.execute(bounded)
+                reader = BoundedReader([d.name for d in cur.description], min(self.max_rows, limit or self.max_rows),
+                                       limit or self.chunk_rows)
+                while True:
+                    rows = await cur.fetchmany(self.chunk_rows)
+                    if not rows or reader.add(rows):
+                        break
+        return reader.frame(), reader.truncated
+
+    async def close(self):
+        if self._opened:
+            await self.pool.close()
+
+
+class ComparisonRunner:
+    """
+    전용 이벤트 루프 스레드에서 하위 쿼리를 동시에 실행한다 (Streamlit 스크립트 스레드에는 루프가 없음).
+    동시 실행 수는 concurrency 로 제한하고, 하위 쿼리마다 timeout_s 초를 넘기면 취소한다.
+    하위 쿼리도 단일 조회와 같이 max_rows 행까지만 가져온다 (넘으면 잘린 하위 쿼리로 표시).
+    시간 초과는 statement_timeout(= timeout_s)으로 서버에서 끊는다 — 스레드 경로의 한계는 _SQLAlchemyFetcher 참고.
+    """
+
+    def __init__(self, engine, concurrency: int = 6, timeout_s: float = 10.0, max_rows: int = 5000):
+        self.concurrency = concurrency
+        self.timeout_s = timeout_s
+        self.max_rows = max_rows
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="comparison-loop", daemon=True).start()
+        self._fetcher = self._make_fetcher(engine)
+
+    def _make_fetcher(self, engine):
+        if engine.dialect.name == "postgresql":
+            try:
+                conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+                return _PsycopgFetcher(conninfo, self.concurrency, self.timeout_s * 1000, self.max_rows)
+            except ImportError:  # psycopg_pool 미설치 → 동기 풀을 스레드로
+                pass
+        return _SQLAlchemyFetcher(engine, self.max_rows, int(self.timeout_s * 1000))
+
+    async def _run_all(self, parts):
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def _one(part: SubQuery):
+            async with sem:
+                t0 = time.perf_counter()
+                df, truncated = await asyncio.wait_for(self._fetcher.fetch(part.sql), self.timeout_s)
+                return df, truncated, time.perf_counter() - t0
+
+        return await asyncio.gather(*(_one(p) for p in parts), return_exceptions=True)
+
+    def run(self, parts) -> tuple:
+        """반환: ({label: DataFrame}, {label: 오류 메시지}, {label: 소요 초}, max_rows 에서 잘린 label 목록)"""
+        results = asyncio.run_coroutine_threadsafe(self._run_all(parts), self._loop).result()
+        frames, errors, seconds, truncated = {}, {}, {}, []
+        for part, res in zip(parts, results):
+            if isinstance(res, BaseException):
+                errors[part.label] = "시간 초과" if isinstance(res, asyncio.TimeoutError) else f"{type(res).__name__}: {res}"
+            else:
+                frames[part.label], cut, seconds[part.label] = res
+                if cut:
+                    truncated.append(part.label)
+        return frames, errors, seconds, truncated
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._fetcher.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def merge_frames(frames, order_by) -> pd.DataFrame:
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    keys = [c for c in order_by if c in df.columns]
+    return df.sort_values(keys, kind="stable", ignore_index=True) if keys else df
@@ -0,0 +1,162 @@
+# conversation.py — 세션 대화 맥락: 최근 (질문, 슬롯, SQL, 결과) 기록 + 후속 질문 해석/결과 재사용 (Streamlit 비의존)
+from collections import deque
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from question_parser import COMPANY_NAMES, parse_followup
+from sql_engine import TableSpec
+
+SLOT_KEYS = ("metrics", "companies", "closing_ym_from", "closing_ym_to")
+
+
+class Turn(NamedTuple):
+    question: str
+    sql: str
+    slots: Optional[dict]   # build_select 모양의 SQL 이면 parse_select 슬롯, 아니면 None (후속 질문 기준이 못 됨)
+    df: pd.DataFrame
+    complete: bool          # max_rows(또는 SQL 의 LIMIT)로 잘리지 않은 결과인지 — 잘린 결과는 부분 집합 응답에 쓰지 않는다
+    version: Optional[str]  # 조회 당시 데이터 버전 (바뀌면 재사용 안 함)
+    nbytes: int
+
+
+class Conversation:
+    """
+    세션당 최근 max_turns 개 질문의 슬롯/SQL/결과. 결과 합계가 max_bytes 를 넘으면 오래된 것부터 버린다.
+    세션 상태(st.session_state)에 하나씩 두고, 세션 간에는 공유하지 않는다.
+    """
+
+    def __init__(self, max_turns: int = 5, max_bytes: int = 32 * 1024 * 1024):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self._turns = deque()
+
+    def add(self, question: str, sql: str, slots, df: pd.DataFrame, complete: bool, version=None) -> Turn:
+        turn = Turn(question, sql, slots, df, complete, version, int(df.memory_usage(deep=True).sum()))
+        self._turns.append(turn)
+        while len(self._turns) > self.max_turns or (
+            len(self._turns) > 1 and sum(t.nbytes for t in self._turns) > self.max_bytes
+        ):
+            self._turns.popleft()
+        return turn
+
+    def turns(self) -> list:
+        # 최근 것부터
+        return list(reversed(self._turns))
+
+    def last(self) -> Optional[Turn]:
+        # 후속 질문의 기준 — 슬롯으로 되돌릴 수 있는 가장 최근 질문
+        return next((t for t in reversed(self._turns) if t.slots is not None), None)
+
+    def clear(self):
+        self._turns.clear()
+
+    def __len__(self):
+        return len(self._turns)
+
+    def stats(self) -> dict:
+        return {"turns": len(self._turns), "bytes": sum(t.nbytes for t in self._turns), "max_turns": self.max_turns}
+
+
+# ----------------- 후속 질문 → 슬롯 -----------------
+def shift_ym(ym: str, months: int) -> str:
+    y, m = divmod(int(ym[:4]) * 12 + int(ym[4:]) - 1 + months, 12)
+    return f"{y:04d}{m + 1:02d}"
+
+
+def _edit_list(prev: list, new: list, mode: str, universe=None) -> list:
+    if mode == "add":
+        return [] if not prev else list(dict.fromkeys(prev + new))   # 빈 목록 = 전체 → 더해도 전체
+    if mode == "remove":
+        base = prev or list(universe or [])
+        return [v for v in base if v not in new]
+    return list(new)
+
+
+def resolve_followup(question: str, prev_slots: dict, spec: TableSpec):
+    """후속 질문이면 직전 슬롯을 고친 슬롯(build_select 입력), 아니면 None."""
+    f = parse_followup(question, spec.metrics)
+    if not f["followup"]:
+        return None
+    slots = {k: prev_slots[k] for k in SLOT_KEYS}
+
+    if f["metrics"]:
+        slots["metrics"] = _edit_list(slots["metrics"], f["metrics"], f["mode"])
+    if f["companies"]:
+        slots["companies"] = _edit_list(slots["companies"], f["companies"], f["mode"], COMPANY_NAMES)
+
+    ym_from, ym_to = slots["closing_ym_from"], slots["closing_ym_to"]
+    if f["closing_yms"]:
+        ym_from, ym_to = f["closing_ym_from"], f["closing_ym_to"]
+    elif f["shift_months"] or f["year"] or f["month"]:
+        if ym_from is None:
+            return None   # 직전 질문에 기간이 없으면 '작년'/'6월'의 기준이 없다
+        if f["shift_months"]:
+            ym_from, ym_to = shift_ym(ym_from, f["shift_months"]), shift_ym(ym_to, f["shift_months"])
+        elif ym_from != ym_to:
+            return None   # 기간 질문의 연/월만 바꾸는 건 모호하다 → LLM
+        else:
+            ym_from = ym_to = (f["year"] or ym_from[:4]) + (f"{f['month']:02d}" if f["month"] else ym_from[4:])
+    slots["closing_ym_from"], slots["closing_ym_to"] = ym_from, ym_to
+
+    if not slots["metrics"] or (f["companies"] and f["mode"] == "remove" and not slots["companies"]):
+        return None
+    return slots
+
+
+# ----------------- 이전 결과로 응답 -----------------
+def _covers_values(prev: list, new: list) -> bool:
+    # 빈 목록 = 필터 없음(전체)
+    return not prev or (bool(new) and set(new) <= set(prev))
+
+
+def _covers_range(prev_from, prev_to, new_from, new_to) -> bool:
+    return prev_from is None or (new_from is not None and prev_from <= new_from and new_to <= prev_to)
+
+
+def covers(prev_slots: dict, slots: dict) -> bool:
+    """prev_slots 로 조회한 (잘리지 않은) 결과에 slots 의 행이 모두 들어 있는지."""
+    return (_covers_values(prev_slots["metrics"], slots["metrics"])
+            and _covers_values(prev_slots["companies"], slots["companies"])
+            and _covers_range(prev_slots["closing_ym_from"], prev_slots["closing_ym_to"],
+                              slots["closing_ym_from"], slots["closing_ym_to"]))
+
+
+def missing_slots(prev_slots: dict, slots: dict):
+    """
+    slots 중 prev_slots 결과에 없는 부분만 조회할 슬롯 (한 축만 다를 때). 아니면 None.
+    - 회사/지표: 나머지 두 축이 같고 겹치는 값이 있으면 새로 생긴 값만
+    - 기간: 회사/지표가 같고 한쪽으로만 늘어났으면 늘어난 구간만
+    """
+    same = {k: prev_slots[k] == slots[k] for k in SLOT_KEYS}
+    same_period = same["closing_ym_from"] and same["closing_ym_to"]
+    for key, others in (("companies", ("metrics",)), ("metrics", ("companies",))):
+        if same_period and all(same[o] for o in others) and prev_slots[key] and slots[key]:
+            added = [v for v in slots[key] if v not in prev_slots[key]]
+            if added and len(added) < len(slots[key]):
+                return {**slots, key: added}
+    lo, hi = prev_slots["closing_ym_from"], prev_slots["closing_ym_to"]
+    new_lo, new_hi = slots["closing_ym_from"], slots["closing_ym_to"]
+    if same["metrics"] and same["companies"] and None not in (lo, hi, new_lo, new_hi):
+        if new_lo < lo <= new_hi <= hi:
+            return {**slots, "closing_ym_from": new_lo, "closing_ym_to": shift_ym(lo, -1)}
+        if lo <= new_lo <= hi < new_hi:
+            return {**slots, "closing_ym_from": shift_ym(hi, 1), "closing_ym_to": new_hi}
+    return None
+
+
+def slice_frame(df: pd.DataFrame, slots: dict, spec: TableSpec) -> pd.DataFrame:
+    # build_select 와 같은 필터/정렬을 로컬 DataFrame 에 적용
+    mask = df[spec.metric_col].isin(slots["metrics"])
+    if slots["companies"]:
+        mask &= df[spec.company_col].isin(slots["companies"])
+    if slots["closing_ym_from"]:
+        # 숫자로 비교 — 결과 컬럼이 float(202312.0)/문자열('202312') 이어도 같은 기준
+        ym = pd.to_numeric(df[spec.ym_col], errors="coerce")
+        mask &= ym.between(int(slots["closing_ym_from"]), int(slots["closing_ym_to"]))
+    return sort_frame(df[mask], spec)
+
+
+def sort_frame(df: pd.DataFrame, spec: TableSpec) -> pd.DataFrame:
+    cols = [spec.ym_col, spec.company_col, spec.metric_col]
+    return df.sort_values(cols, kind="stable").reset_index(drop=True)
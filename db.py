@@ -0,0 +1,311 @@
+# db.py — 프로세스 공용 DB 커넥션 풀 (run_sql / LangChain SQLDatabase 공용) + 제한 조회
+import re
+import sys
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.connects = 0
+
+    def record_wait(self, ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total_ms += ms
+            self.wait_max_ms = max(self.wait_max_ms, ms)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            out = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "new_connections": self.connects,
+                "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 2),
+            }
+        if pool is not None and isinstance(pool, QueuePool):
+            out.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return out
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool + 체크아웃 대기시간 측정."""
+
+    stats: PoolStats = None
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super().connect()
+        except PoolTimeoutError:
+            if self.stats:
+                self.stats.record_wait((time.perf_counter() - t0) * 1000, timed_out=True)
+            raise
+        if self.stats:
+            self.stats.record_wait((time.perf_counter() - t0) * 1000)
+        return conn
+
+    def recreate(self):
+        # dispose()/무효화 시 새 풀로 교체되어도 통계는 유지
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def create_pooled_engine(
+    uri: str,
+    min_size: int = 2,
+    max_size: int = 10,
+    pool_timeout: float = 10.0,
+    recycle_seconds: int = 1800,
+    statement_timeout_ms: int = 15000,
+):
+    engine = create_engine(
+        uri,
+        poolclass=MeteredQueuePool,
+        pool_size=min_size,
+        max_overflow=max(max_size - min_size, 0),
+        pool_timeout=pool_timeout,
+        pool_recycle=recycle_seconds,  # pooler가 끊는 유휴 커넥션 교체
+        pool_pre_ping=True,            # 체크아웃 시 헬스체크
+    )
+    engine.pool.stats = PoolStats()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        engine.pool.stats.record_connect()
+        if statement_timeout_ms and engine.dialect.name == "postgresql":
+            autocommit = dbapi_conn.autocommit
+            dbapi_conn.autocommit = True
+            cur = dbapi_conn.cursor()
+            cur.execute(f"SET statement_timeout = {int(statement_timeout_ms)}")
+            cur.close()
+            dbapi_conn.autocommit = autocommit
+
+    return engine
+
+
+def warm_pool(engine, n: int):
+    # 첫 질문이 TCP/TLS/인증 비용을 치르지 않도록 최소 커넥션을 미리 연다
+    conns = [engine.connect() for _ in range(n)]
+    for c in conns:
+        c.close()
+
+
+def pool_stats(engine) -> dict:
+    return engine.pool.stats.snapshot(engine.pool)
+
+
+# ----------------- 제한 조회: LIMIT 주입 + 서버 측 커서 청크 + 조기 중단 -----------------
+_TRAILING_LIMIT = re.compile(r"\blimit\s+(\d+)(\s+offset\s+\d+)?\s*$", re.I)
+_TRAILING_PAGING = re.compile(r"\b(limit\s+all|offset\s+\d+|fetch\s+(first|next)\b.*)\s*$", re.I | re.S)
+
+
+def trailing_limit(sql: str):
+    # SQL 끝의 LIMIT n 값 (없으면 None)
+    m = _TRAILING_LIMIT.search(sql.strip().rstrip(";").strip())
+    return int(m.group(1)) if m else None
+
+
+def bound_sql(sql: str, max_rows: int):
+    """
+    잘림 여부를 알 수 있도록 최대 max_rows+1 행만 오게 LIMIT 을 강제한다.
+    SQL 에 LIMIT n 이 있고 n <= max_rows 면 그대로 둔다 (상위 N 질문 — 상한에 잘린 게 아니므로 잘림 아님).
+    n > max_rows 면 max_rows+1 행 — 호출 측은 max_rows 행까지만 쓴다.
+    반환: (SQL, 원래 LIMIT 값 또는 None)
+    """
+    body = sql.strip().rstrip(";").strip()
+    m = _TRAILING_LIMIT.search(body)
+    if m:
+        n = int(m.group(1))
+        if n <= max_rows:
+            return body, n
+        return f"{body[:m.start()]}LIMIT {max_rows + 1}{m.group(2) or ''}", n
+    if _TRAILING_PAGING.search(body):
+        # OFFSET/FETCH FIRST 로 끝나는 쿼리는 뒤에 LIMIT 을 붙일 수 없으므로 감싼다
+        return f"SELECT * FROM ({body}) AS _bounded LIMIT {max_rows + 1}", None
+    return f"{body} LIMIT {max_rows + 1}", None
+
+
+def _kind(values) -> str:
+    # 청크의 한 컬럼 값으로 배열 종류 결정: i(int64) / f(float64) / O(object)
+    seen = [v for v in values if v is not None]
+    if not seen:
+        return "O"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in seen):
+        return "i"
+    if all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in seen):
+        return "f"
+    return "O"
+
+
+class _ColumnBuffer:
+    """컬럼별 numpy 배열을 미리 잡아 두고 청크를 채운다 (용량이 모자라면 2배씩 늘림)."""
+
+    def __init__(self, ncols: int, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.n = 0
+        self.kinds = [None] * ncols
+        self.arrays = [None] * ncols
+        self.nulls = [None] * ncols
+        self.object_bytes = 0
+
+    def _alloc(self, kind: str, size: int):
+        return np.empty(size, dtype={"i": np.int64, "f": np.float64, "O": object}[kind])
+
+    def _grow(self, need: int):
+        cap = max(need, self.capacity * 2)
+        for j, arr in enumerate(self.arrays):
+            if arr is not None:
+                new = self._alloc(self.kinds[j], cap)
+                new[:self.n] = arr[:self.n]
+                self.arrays[j] = new
+                mask = np.zeros(cap, dtype=bool)
+                mask[:self.n] = self.nulls[j][:self.n]
+                self.nulls[j] = mask
+        self.capacity = cap
+
+    def _upcast(self, j: int, kind: str):
+        old, mask = self.arrays[j][:self.n], self.nulls[j][:self.n]
+        new = self._alloc(kind, self.capacity)
+        if kind == "O":
+            vals = old.astype(object)
+            vals[mask] = None
+            new[:self.n] = vals
+        else:
+            # int → float: NULL 자리에 채워 둔 0 을 NaN 으로 (frame() 은 "i" 컬럼만 마스크를 적용)
+            new[:self.n] = old
+            new[:self.n][mask] = np.nan
+        self.arrays[j], self.kinds[j] = new, kind
+
+    def extend(self, rows):
+        if not rows:
+            return
+        need = self.n + len(rows)
+        if need > self.capacity:
+            self._grow(need)
+        for j, values in enumerate(zip(*rows)):
+            kind = _kind(values)
+            if self.arrays[j] is None:
+                self.kinds[j] = kind
+                self.arrays[j] = self._alloc(kind, self.capacity)
+                self.nulls[j] = np.zeros(self.capacity, dtype=bool)
+            elif kind != self.kinds[j] and self.kinds[j] != "O" and not (self.kinds[j] == "f" and kind == "i"):
+                self._upcast(j, "f" if {kind, self.kinds[j]} == {"i", "f"} else "O")
+            cur = self.kinds[j]
+            if cur == "O":
+                self.arrays[j][self.n:need] = values
+                self.object_bytes += sum(sys.getsizeof(v) for v in values if v is not None)
+            else:
+                mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+                fill = 0 if cur == "i" else np.nan
+                self.arrays[j][self.n:need] = [fill if v is None else v for v in values]
+                self.nulls[j][self.n:need] = mask
+        self.n = need
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes + m.nbytes for a, m in zip(self.arrays, self.nulls) if a is not None) + self.object_bytes
+
+    def frame(self, columns) -> pd.DataFrame:
+        series = []
+        for j in range(len(columns)):
+            arr = self.arrays[j]
+            if arr is None:
+                series.append(pd.Series([], dtype=object))
+                continue
+            arr, mask = arr[:self.n], self.nulls[j][:self.n]
+            if self.kinds[j] == "i" and mask.any():
+                arr = arr.astype(np.float64)   # read_sql 과 같게: NULL 섞인 정수 → float
+                arr[mask] = np.nan
+            series.append(pd.Series(arr).infer_objects() if self.kinds[j] == "O" else pd.Series(arr))
+        # 중복 컬럼명(조인 결과 등)도 보존되도록 위치 기준으로 합친 뒤 이름을 붙인다
+        df = pd.concat(series, axis=1, ignore_index=True) if series else pd.DataFrame()
+        df.columns = list(columns)
+        return df
+
+
+class BoundedReader:
+    """
+    청크 단위로 받은 행을 max_rows 까지 _ColumnBuffer 에 채운다 (fetch_bounded / 비교 모드 psycopg 경로 공용).
+    bound_sql 이 max_rows+1 행까지 오게 하므로 넘는 행이 오면 truncated.
+    """
+
+    def __init__(self, columns, max_rows: int, capacity: int):
+        self.columns = list(columns)
+        self.max_rows = max_rows
+        self.buf = _ColumnBuffer(len(self.columns), min(max_rows, capacity))
+        self.rows = 0
+        self.chunks = 0
+        self.truncated = False
+        self.peak_chunk = 0
+
+    def add(self, part) -> bool:
+        # 청크 하나를 채운다. 반환: 더 받을 필요가 없으면(잘림 확인) True
+        self.chunks += 1
+        if part:
+            self.peak_chunk = max(self.peak_chunk, sys.getsizeof(part) + len(part) * sum(sys.getsizeof(v) for v in part[0]))
+        take = part[:self.max_rows - self.rows]
+        self.buf.extend(take)
+        self.rows += len(take)
+        self.truncated = len(take) < len(part)
+        return self.truncated
+
+    def frame(self) -> pd.DataFrame:
+        return self.buf.frame(self.columns)
+
+    def stats(self) -> dict:
+        return {"rows": self.rows, "chunks": self.chunks, "truncated": self.truncated, "max_rows": self.max_rows,
+                "peak_bytes": self.buf.nbytes + self.peak_chunk}
+
+
+def fetch_bounded(engine, sql: str, max_rows: int = 5000, chunk_rows: int = 1000, timeout_ms: int = None, info: dict = None):
+    """
+    read_sql_query 대신 쓰는 제한 조회. 서버 측 커서로 chunk_rows 씩 받아 타입별 배열에 채우고,
+    max_rows 를 넘으면 거기서 끊는다. info 에 행 수/청크 수/잘림 여부/가져오기 시간/최대 메모리(추정)를 채운다.
+    """
+    info = {} if info is None else info
+    bounded, limit = bound_sql(sql, max_rows)
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        if timeout_ms and engine.dialect.name == "postgresql":
+            # 이 트랜잭션에만 적용 (풀 기본값보다 짧게/길게)
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).exec_driver_sql(bounded)
+        reader = BoundedReader(result.keys(), min(max_rows, limit or max_rows), limit or chunk_rows)
+        try:
+            for part in result.partitions(chunk_rows):
+                if not reader.chunks:
+                    info["first_chunk_s"] = round(time.perf_counter() - t0, 4)
+                if reader.add(part):
+                    break
+        finally:
+            result.close()  # 남은 행은 받지 않고 커서를 닫는다
+    df = reader.frame()
+    info.update(
+        reader.stats(),
+        max_rows=max_rows,
+        limit_injected=limit is None or limit > max_rows,
+        fetch_s=round(time.perf_counter() - t0, 4),
+    )
+    return df
@@ -0,0 +1,304 @@
+# llm_gateway.py — 공용 LLM 게이트웨이: 모델별 토큰 버킷, 지터 재시도, p95 헤징, 지연 꼬리/재시도 지표
+# OpenAI SDK 와 ChatOpenAI 모두 http_client 로 끼운다 (httpx 전송 계층). 재시도는 여기서만 하므로 SDK 재시도는 끈다(max_retries=0).
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+import httpx
+
+from tracing import _percentile, current_span
+
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+class GatewayConfig(NamedTuple):
+    default_rpm: float = 500          # 모델별 분당 요청 수 (rpm 에 없는 모델)
+    rpm: dict = {}                    # {"gpt-4o": 100, ...}
+    burst: int = 10                   # 버킷 크기 (순간 동시 요청 허용량)
+    max_wait_s: float = 30            # 버킷 토큰을 기다리는 최대 시간 — 넘으면 429 로 돌려준다
+    max_retries: int = 3              # 429/5xx/타임아웃 재시도 횟수 (요청당)
+    backoff_base_s: float = 0.5       # 지수 백오프 시작값 (full jitter: 0 ~ base·2^n)
+    backoff_max_s: float = 8.0
+    hedge: bool = False               # p95 를 넘긴 비스트리밍 요청은 같은 요청을 한 번 더 보내 먼저 온 응답 사용
+    hedge_quantile: float = 95
+    hedge_min_samples: int = 20       # 이만큼 지연시간이 쌓이기 전에는 헤징하지 않는다
+    hedge_min_delay_s: float = 0.2
+    window: int = 500                 # 모델별 최근 지연시간 표본 수
+
+
+class GatewayThrottled(Exception):
+    pass
+
+
+class _Retryable(Exception):
+    def __init__(self, reason: str, retry_after: float = None, response=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.response = response
+
+
+class TokenBucket:
+    """초당 rate 개씩 채워지고 최대 burst 개까지 쌓이는 토큰 버킷 (스레드 안전)."""
+
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate = rate_per_s
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._at) * self.rate)
+        self._at = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, max_wait_s: float) -> float:
+        """토큰 1개를 가져온다. 반환: 기다린 시간(초). max_wait_s 안에 못 가져오면 GatewayThrottled."""
+        t0 = time.monotonic()
+        slept = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - t0 if slept else 0.0
+                wait_s = (1 - self._tokens) / self.rate
+            if now - t0 + wait_s > max_wait_s:
+                raise GatewayThrottled(f"rate limit 대기 {max_wait_s}s 초과")
+            time.sleep(wait_s)
+            slept = True
+
+
+class _ModelState:
+    def __init__(self, rpm: float, burst: int, window: int):
+        self.bucket = TokenBucket(rpm / 60, burst)
+        self.attempt_ms = deque(maxlen=window)   # 성공한 비스트리밍 시도 1회 지연 (헤징 기준)
+        self.call_ms = deque(maxlen=window)      # 재시도/대기 포함 요청 전체 지연 (꼬리 지표)
+        self.counts = {"requests": 0, "attempts": 0, "retries": 0, "failed": 0, "throttled": 0,
+                       "throttle_wait_s": 0.0, "hedges": 0, "hedge_wins": 0, "hedge_skipped": 0}
+        self.reasons = {}
+
+
+class LLMGateway:
+    """
+    모든 LLM 호출이 지나는 관문 (프로세스 공용).
+    - 모델별 토큰 버킷으로 분당 요청 수를 넘기지 않게 미리 기다린다 (429 를 받고 나서 물러나는 대신)
+    - 429/5xx/타임아웃은 full jitter 지수 백오프로 max_retries 번까지 재시도 (Retry-After 가 있으면 그 이상 대기)
+    - hedge=True 면 비스트리밍 요청이 최근 p95 를 넘길 때 같은 요청을 한 번 더 보내고 먼저 끝난 응답을 쓴다
+      (버킷에 여유가 있을 때만 — 헤징이 rate limit 을 깨지 않게)
+    """
+
+    def __init__(self, config: GatewayConfig = GatewayConfig()):
+        self.config = config
+        self._models = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge") if config.hedge else None
+
+    def _state(self, model: str) -> _ModelState:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                cfg = self.config
+                state = self._models[model] = _ModelState(cfg.rpm.get(model, cfg.default_rpm), cfg.burst, cfg.window)
+            return state
+
+    def _count(self, state: _ModelState, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                state.counts[k] += v
+
+    def _backoff(self, n: int, retry_after: float = None) -> float:
+        cfg = self.config
+        delay = random.uniform(0, min(cfg.backoff_max_s, cfg.backoff_base_s * 2 ** n))
+        return max(delay, min(retry_after, cfg.backoff_max_s)) if retry_after else delay
+
+    def hedge_delay(self, model: str):
+        # 최근 성공한 시도 지연의 p95 (표본이 부족하면 None → 헤징 안 함)
+        cfg = self.config
+        state = self._state(model)
+        with self._lock:
+            samples = sorted(state.attempt_ms)
+        if not cfg.hedge or len(samples) < cfg.hedge_min_samples:
+            return None
+        return max(cfg.hedge_min_delay_s, _percentile(samples, cfg.hedge_quantile) / 1000)
+
+    def execute(self, model: str, attempt, hedgeable: bool = False):
+        """
+        attempt() 를 정책대로 실행한다. attempt 는 재시도할 실패에 _Retryable 을 던진다.
+        재시도를 다 쓰면 마지막 응답(있으면)을 돌려주고, 없으면 마지막 예외를 던진다.
+        """
+        cfg = self.config
+        state = self._state(model)
+        self._count(state, requests=1)
+        t0 = time.perf_counter()
+        retries = hedged = 0
+        waited = 0.0
+        try:
+            for n in range(cfg.max_retries + 1):
+                try:
+                    w = state.bucket.acquire(cfg.max_wait_s)
+                except GatewayThrottled:
+                    self._count(state, failed=1)
+                    raise
+                waited += w
+                self._count(state, attempts=1, throttled=int(w > 0), throttle_wait_s=w)
+                try:
+                    if hedgeable and self._pool is not None:
+                        result, hedge = self._hedged(model, state, attempt)
+                        hedged += hedge
+                    else:
+                        result = self._timed(state, attempt, record=hedgeable)
+                    return result
+                except _Retryable as e:
+                    with self._lock:
+                        state.reasons[e.reason] = state.reasons.get(e.reason, 0) + 1
+                    if n == cfg.max_retries:
+                        self._count(state, failed=1)
+                        if e.response is not None:
+                            return e.response
+                        raise e.__cause__ or e
+                    retries += 1
+                    self._count(state, retries=1)
+                    time.sleep(self._backoff(n, e.retry_after))
+        finally:
+            with self._lock:
+                state.call_ms.append((time.perf_counter() - t0) * 1000)
+            span = current_span()
+            if span is not None and (retries or hedged or waited):
+                span.add_counts(llm_retries=retries, llm_hedged=hedged, llm_throttle_ms=round(waited * 1000, 2))
+
+    def _timed(self, state: _ModelState, attempt, record: bool):
+        t0 = time.perf_counter()
+        result = attempt()
+        if record:
+            with self._lock:
+                state.attempt_ms.append((time.perf_counter() - t0) * 1000)
+        return result
+
+    def _hedged(self, model: str, state: _ModelState, attempt):
+        # 반환: (결과, 헤징 요청을 보냈는지)
+        delay = self.hedge_delay(model)
+        first = self._pool.submit(self._timed, state, attempt, True)
+        if delay is None or wait([first], timeout=delay).done:
+            return first.result(), 0
+        if not state.bucket.try_acquire():
+            self._count(state, hedge_skipped=1)
+            return first.result(), 0
+        self._count(state, hedges=1, attempts=1)
+        second = self._pool.submit(self._timed, state, attempt, True)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is second:
+                        self._count(state, hedge_wins=1)
+                    for other in pending:
+                        other.add_done_callback(_discard)
+                    return fut.result(), 1
+        raise first.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {m: (dict(s.counts), dict(s.reasons), sorted(s.call_ms)) for m, s in self._models.items()}
+        out = {}
+        for model, (c, reasons, calls) in models.items():
+            out[model] = {
+                **c,
+                "throttle_wait_s": round(c["throttle_wait_s"], 3),
+                "retry_rate": round(c["retries"] / c["requests"], 3) if c["requests"] else 0.0,
+                "reasons": reasons,
+                "p50_ms": _percentile(calls, 50),
+                "p95_ms": _percentile(calls, 95),
+                "p99_ms": _percentile(calls, 99),
+                "hedge_after_ms": round(d * 1000, 1) if (d := self.hedge_delay(model)) else None,
+            }
+        return out
+
+    def http_client(self, timeout_s: float = 60, transport: httpx.BaseTransport = None) -> httpx.Client:
+        """OpenAI(http_client=...) / ChatOpenAI(http_client=...) 에 넣을 httpx 클라이언트."""
+        return httpx.Client(transport=GatewayTransport(self, transport), timeout=timeout_s)
+
+
+def _discard(fut):
+    # 헤징에서 진 쪽 응답은 연결만 정리
+    if fut.exception() is None and hasattr(fut.result(), "close"):
+        fut.result().close()
+
+
+class GatewayTransport(httpx.BaseTransport):
+    """요청 본문의 model 로 버킷을 고르고, 상태 코드/네트워크 오류를 보고 LLMGateway 정책대로 재시도/헤징."""
+
+    def __init__(self, gateway: LLMGateway, transport: httpx.BaseTransport = None):
+        self.gateway = gateway
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            body = json.loads(request.read() or b"{}")
+        except ValueError:
+            body = {}
+        model = body.get("model") or "-"
+        stream = bool(body.get("stream"))
+        try:
+            return self.gateway.execute(model, lambda: self._attempt(request, stream), hedgeable=not stream)
+        except GatewayThrottled as e:
+            # SDK 가 RateLimitError 로 받도록 429 응답으로 돌려준다
+            return httpx.Response(429, json={"error": {"message": str(e), "type": "gateway_throttled"}}, request=request)
+
+    def _attempt(self, request: httpx.Request, stream: bool) -> httpx.Response:
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TimeoutException as e:
+            raise _Retryable("timeout") from e
+        except httpx.TransportError as e:
+            raise _Retryable("connection") from e
+        if response.status_code in RETRY_STATUS:
+            response.read()
+            response.close()
+            retry_after = response.headers.get("retry-after")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise _Retryable(str(response.status_code), retry_after, _detached(response, request))
+        if stream:
+            return response
+        # 비스트리밍은 여기서 다 읽어 둔다 — 헤징에서 진 응답을 바로 닫을 수 있고, 지연시간도 전체 기준
+        response.read()
+        response.close()
+        return _detached(response, request)
+
+    def close(self):
+        self.transport.close()
+
+
+def _detached(response: httpx.Response, request: httpx.Request) -> httpx.Response:
+    # 이미 읽은(압축 해제된) 본문으로 새 응답 — 원래 연결과 분리
+    headers = [(k, v) for k, v in response.headers.multi_items()
+               if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+    return httpx.Response(response.status_code, headers=headers, content=response.content,
+                          request=request, extensions={k: v for k, v in response.extensions.items() if k != "network_stream"})
+
+
+def parse_rpm(text: str) -> dict:
+    # "gpt-4o-mini=500,gpt-4o=100" → {"gpt-4o-mini": 500.0, "gpt-4o": 100.0}
+    out = {}
+    for part in (text or "").split(","):
+        if "=" in part:
+            model, rpm = part.split("=", 1)
+            out[model.strip()] = float(rpm)
+    return out
@@ -0,0 +1,53 @@
+# pages/ops.py — 운영 대시보드: 단계별 지연시간(p50/p95/p99), LLM 호출/토큰/재시도/헤징, 캐시 적중
+# 사이드바 내비게이션은 숨겨져 있으므로 URL(/ops)로 직접 접근한다 (/ops?token=...).
+# 사용자 질문 원문이 보이므로 OPS_TOKEN 이 설정되지 않았거나 다르면 아무것도 보여주지 않는다.
+import hmac
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+from tracing import aggregate, load_traces
+
+load_dotenv()
+
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH") or st.secrets.get("TRACE_LOG_PATH", ".cache/traces.jsonl")
+OPS_TOKEN = os.getenv("OPS_TOKEN") or st.secrets.get("OPS_TOKEN", "")
+
+st.set_page_config(page_title="운영 대시보드", page_icon="🛠️", layout="wide")
+
+if not OPS_TOKEN:
+    st.error("운영 대시보드가 비활성화되어 있습니다. OPS_TOKEN 을 설정하세요.")
+    st.stop()
+if not hmac.compare_digest(str(st.query_params.get("token", "")).encode(), str(OPS_TOKEN).encode()):
+    st.error("접근 권한이 없습니다.")
+    st.stop()
+
+st.title("🛠️ 운영 대시보드")
+
+hours = st.select_slider("조회 구간", options=[1, 6, 24, 72, 168], value=24, format_func=lambda h: f"최근 {h}시간")
+records = [r for r in load_traces(TRACE_LOG_PATH) if r.get("ts", 0) >= time.time() - hours * 3600]
+
+if not records:
+    st.info(f"트레이스가 없습니다. ({TRACE_LOG_PATH})")
+    st.stop()
+
+st.markdown("### ⏱️ 단계별 지연시간 / 토큰 / 캐시")
+st.dataframe(pd.DataFrame(aggregate(records)), use_container_width=True, hide_index=True)
+
+df = pd.DataFrame(records)
+df["time"] = pd.to_datetime(df["ts"], unit="s")
+
+if "engine" in df.columns:
+    st.markdown("### 🧭 SQL 엔진 분포")
+    st.bar_chart(df[df["stage"] == "generate_sql"]["engine"].value_counts())
+
+st.markdown("### 📈 단계별 지연시간 추이 (ms)")
+st.line_chart(df.pivot_table(index="time", columns="stage", values="wall_ms", aggfunc="mean"))
+
+st.markdown("### 🧾 최근 트레이스")
+cols = [c for c in ("time", "trace_id", "stage", "wall_ms", "llm_calls", "prompt_tokens", "completion_tokens",
+                    "llm_retries", "llm_hedged", "llm_throttle_ms", "cache_hit", "coalesced", "engine", "rows", "bytes", "error", "question", "question_hash") if c in df.columns]
+st.dataframe(df.sort_values("ts", ascending=False)[cols].head(300), use_container_width=True, hide_index=True)
@@ -0,0 +1,596 @@
+# pipeline.py — 질문 → SQL 생성 → 조회 → 요약 (Streamlit 비의존: 앱/벤치마크가 같은 코드를 쓴다)
+import hashlib
+import json
+import threading
+import time
+from typing import NamedTuple
+
+import pandas as pd
+from sqlalchemy import Integer, Numeric, inspect as sa_inspect
+
+from comparison import ComparisonRunner, merge_frames, plan_comparison
+from conversation import covers, missing_slots, resolve_followup, slice_frame, sort_frame
+from db import fetch_bounded, trailing_limit
+from question_parser import format_slot_hints, normalize_question, parse_local_slots
+from result_cache import normalize_sql
+from sql_engine import (EngineStats, SlotParseError, TableSpec, build_select, generate_sql_single_shot, parse_select,
+                        rule_based_sql)
+from sql_guard import allowlist_for, extract_select, validate_select
+from summary_cache import frame_fingerprint
+from summary_input import build_summary_input, count_tokens
+from tracing import Tracer, current_span, langchain_callback
+
+
+class PipelineConfig(NamedTuple):
+    table: str = "kics_solvency_data_flexible"
+    company_col: str = "company_code"
+    ym_col: str = "closing_ym"
+    metric_col: str = "metric"
+    value_col: str = "value"
+    sql_engine: str = "single_shot"          # "single_shot"(규칙 → 단일 호출 → 에이전트) 또는 "agent"(규칙 엔진도 건너뜀)
+    model: str = "gpt-4o-mini"
+    sql_model: str = ""                       # SQL(슬롯 추출) 전용 모델 — 비우면 model (빠르고 싼 모델 권장)
+    summary_model: str = ""                   # 요약 전용 모델 — 비우면 model
+    summary_token_budget: int = 1500
+    summary_sample_rows: int = 20
+    schema_refresh_seconds: float = 6 * 3600  # 테이블 명세(컬럼/metric 목록) 갱신 주기
+    data_version_ttl: float = 60              # 데이터 버전 확인 주기
+    compare_concurrency: int = 6              # 비교 모드 하위 쿼리 동시 실행 수
+    compare_timeout_s: float = 10.0           # 비교 모드 하위 쿼리당 타임아웃(초)
+    compare_max_parts: int = 40               # 이보다 많이 나뉘면 비교 모드 대신 단일 쿼리
+    max_rows: int = 5000                      # 조회 결과 최대 행 수 (넘으면 잘라서 truncated 표시)
+    fetch_chunk_rows: int = 1000              # 서버 측 커서에서 한 번에 받는 행 수
+    statement_timeout_ms: int = 0             # 조회당 statement_timeout (0 이면 풀 기본값)
+
+
+class _Expiring:
+    # st.cache_resource(ttl=...) 대용 — 값 하나를 TTL 동안 재사용
+    def __init__(self, ttl: float, load):
+        self.ttl = ttl
+        self._load = load
+        self._value = None
+        self._at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._at is None or time.monotonic() - self._at > self.ttl:
+                self._value = self._load()
+                self._at = time.monotonic()
+            return self._value
+
+
+# 질문 1건 요약 프롬프트 ({question}, {data_block} 자리만 채운다)
+SUMMARY_PROMPT = """
+질문: {question}
+너는 뛰어난 재무분석가이자 데이터 시각화 전문가야.
+다음은 조회 결과를 시리즈(회사/지표)별로 미리 집계한 값과 일부 샘플이다. 이를 기반으로, 트렌드를 분석해 **한국어로 요약**해줘.
+- 수치의 단위와 기간을 반드시 명시해.
+- 데이터 패턴(증가/감소, 최고점, 평균 등)을 설명해. 집계값을 그대로 활용하고 새로 계산하지 마.
+- 이후 Python 코드가 차트를 자동 생성할 것이므로, 시각화에 필요한 주요 컬럼 1~2개를 명시적으로 언급해.
+예: 'closing_ym'을 X축으로, 'k_ics_ratio'를 Y축으로 사용하면 좋겠다.
+{data_block}
+"""
+
+# 배치 리포트용 일괄 요약 프롬프트 (질문 여러 건 → LLM 1회, JSON 으로 id 별 요약)
+BATCH_SUMMARY_PROMPT = """
+너는 뛰어난 재무분석가야. 아래 '### id=...' 로 구분된 각 질문마다, 조회 결과를 시리즈(회사/지표)별로 미리 집계한 값과 일부 샘플을 보고
+트렌드를 분석해 **한국어로 요약**해줘. 질문마다 독립적으로 요약하고, 다른 질문의 데이터를 섞지 마.
+- 수치의 단위와 기간을 반드시 명시해.
+- 데이터 패턴(증가/감소, 최고점, 평균 등)을 설명해. 집계값을 그대로 활용하고 새로 계산하지 마.
+- 결과는 summaries 배열에 {id, summary} 로, 입력의 모든 id 에 대해 하나씩 내보내.
+
+""".lstrip()
+
+BATCH_SUMMARY_SCHEMA = {
+    "name": "kics_batch_summaries",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["summaries"],
+        "properties": {
+            "summaries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["id", "summary"],
+                    "properties": {"id": {"type": "string"}, "summary": {"type": "string"}},
+                },
+            },
+        },
+    },
+}
+
+
+# ----------------- 파이프라인 -----------------
+class Pipeline:
+    """
+    client: chat.completions.create 를 가진 OpenAI 클라이언트(또는 같은 인터페이스의 가짜)
+    engine: SQLAlchemy 엔진 (db.create_pooled_engine)
+    agent_factory: 인자 없이 호출하면 .invoke({"input": ...}) 가능한 SQL 에이전트를 돌려주는 함수
+    rollup: rollup.RollupStore — build_select 모양의 조회를 로컬 피벗 스냅샷에서 응답
+    coalescer: singleflight.SingleFlight — 세션 간 동시에 들어온 같은 질문/SQL/요약은 1번만 실행하고 결과 공유
+    """
+
+    def __init__(self, client, engine, config: PipelineConfig = PipelineConfig(), *,
+                 sql_cache=None, result_cache=None, tracer=None, stats=None, agent_factory=None,
+                 comparison_runner=None, rollup=None, coalescer=None):
+        self.client = client
+        self.engine = engine
+        self.config = config
+        self.sql_cache = sql_cache
+        self.result_cache = result_cache
+        self.tracer = tracer or Tracer()
+        self.stats = stats or EngineStats()
+        self.agent_factory = agent_factory
+        self._comparison_runner = comparison_runner
+        self.rollup = rollup
+        self.coalescer = coalescer
+        self._runner_lock = threading.Lock()
+        self._table_spec = _Expiring(config.schema_refresh_seconds, self._load_table_spec)
+        self._data_version = _Expiring(config.data_version_ttl, self._load_data_version)
+        self._allowlist = _Expiring(config.schema_refresh_seconds, self._load_allowlist)
+
+    # single_shot 엔진용 테이블 명세 — 컬럼이 실제 스키마에 없으면 None (항상 에이전트로 폴백)
+    def _load_table_spec(self):
+        c = self.config
+        columns = {col["name"]: col["type"] for col in sa_inspect(self.engine).get_columns(c.table)}
+        if not all(col in columns for col in (c.company_col, c.ym_col, c.metric_col, c.value_col)):
+            return None
+        with self.engine.connect() as conn:
+            metrics = tuple(
+                r[0] for r in conn.exec_driver_sql(
+                    f"SELECT DISTINCT {c.metric_col} FROM {c.table} ORDER BY 1 LIMIT 500"
+                ) if r[0] is not None
+            )
+        return TableSpec(
+            table=c.table,
+            company_col=c.company_col,
+            ym_col=c.ym_col,
+            metric_col=c.metric_col,
+            value_col=c.value_col,
+            ym_numeric=isinstance(columns[c.ym_col], (Integer, Numeric)),
+            metrics=metrics,
+        )
+
+    def table_spec(self):
+        return self._table_spec.get()
+
+    # SQL 검증용 허용 목록 — 설정된 테이블과 그 실제 컬럼만
+    def _load_allowlist(self):
+        columns = [col["name"] for col in sa_inspect(self.engine).get_columns(self.config.table)]
+        return allowlist_for(self.config.table, columns)
+
+    def validate_sql(self, sql: str) -> str:
+        """읽기 전용 단일 SELECT + 허용 목록 검사 후 정규화된 SQL (sql_guard.validate_select). 실패 시 ValueError."""
+        return validate_select(sql, self._allowlist.get())
+
+    # 새 분기 적재 여부만 가볍게 확인 (max(closing_ym), 행 수) — 바뀌면 결과 캐시 전체 무효화
+    def _load_data_version(self) -> str:
+        c = self.config
+        with self.engine.connect() as conn:
+            max_ym, n = conn.exec_driver_sql(f"SELECT MAX({c.ym_col}), COUNT(*) FROM {c.table}").one()
+        return f"{max_ym}:{n}"
+
+    def data_version(self) -> str:
+        return self._data_version.get()
+
+    def _coalesce(self, stage: str, key, fn):
+        # key() 가 같은 호출이 이미 실행 중이면 새로 실행하지 않고 그 결과를 받는다. 반환: (결과, 합류 여부)
+        if self.coalescer is None:
+            return fn(), False
+        return self.coalescer.do(stage, key(), fn)
+
+    # ----------------- SQL 생성 -----------------
+    def generate_sql(self, question: str, meta: dict = None) -> str:
+        # meta["engine"] 에 사용한 엔진(cache/rule/single_shot/agent)을 기록
+        meta = {} if meta is None else meta
+        with self.tracer.span("generate_sql") as span:
+            (sql, meta["engine"]), meta["coalesced"] = self._coalesce(
+                "generate_sql", lambda: normalize_question(question), lambda: self._generate_sql(question, span)
+            )
+            span.set(engine=meta["engine"], cache_hit=meta["engine"] == "cache", coalesced=meta["coalesced"])
+            return sql
+
+    def _generate_sql(self, question: str, span):
+        # 같은 질문(또는 회사/결산년월만 다른 질문)은 에이전트 없이 캐시된 SQL 템플릿 재사용
+        cache = self.sql_cache
+        cached = cache.get(question) if cache else None
+        if cached:
+            return self.validate_sql(cached), "cache"
+
+        stats = self.stats
+        spec = self.table_spec()
+
+        # 슬롯만으로 완전히 표현되는 질문은 LLM 호출 없이 로컬에서 SQL 조립 (SQL_ENGINE=agent 면 항상 에이전트)
+        if spec is not None and self.config.sql_engine != "agent":
+            with stats.timed("rule"):
+                sql = rule_based_sql(question, spec)
+            if sql:
+                sql = self.validate_sql(sql)
+                return self._remember(question, sql), "rule"
+
+        if self.config.sql_engine == "single_shot":
+            try:
+                if spec is None:
+                    raise SlotParseError("single_shot 엔진용 컬럼이 스키마에 없습니다.")
+                model = self.config.sql_model or self.config.model
+                with stats.timed("single_shot"):
+                    sql = self.validate_sql(generate_sql_single_shot(self.client, question, spec, model=model))
+                stats.record_attempt(fell_back=False)
+                return self._remember(question, sql), "single_shot"
+            except ValueError:  # SlotParseError 포함 — 검증 실패도 에이전트로 폴백
+                stats.record_attempt(fell_back=True)
+
+        if self.agent_factory is None:
+            raise ValueError("SQL 에이전트가 설정되지 않았습니다.")
+        with stats.timed("agent"):
+            sql_agent = self.agent_factory()
+            hints = format_slot_hints(parse_local_slots(question, spec.metrics if spec else None))
+            agent_input = f"{question}\n[해석된 슬롯] {hints}" if hints else question
+            result = sql_agent.invoke({"input": agent_input}, config={"callbacks": [langchain_callback(span)]})
+
+            if isinstance(result, dict):
+                text = result.get("output") or result.get("final_answer") or json.dumps(result, ensure_ascii=False)
+            else:
+                text = str(result)
+
+            sql = self.validate_sql(extract_select(text))
+
+        return self._remember(question, sql), "agent"
+
+    def _remember(self, question: str, sql: str) -> str:
+        if self.sql_cache:
+            self.sql_cache.put(question, sql)
+        return sql
+
+    # ----------------- SQL 실행 -----------------
+    def _local_result(self, sql: str, version):
+        # 원격 DB 없이 응답 시도: 결과 캐시 → 롤업 스냅샷. 반환: (DataFrame 또는 None, 출처)
+        if self.result_cache:
+            df = self.result_cache.get(sql, version)
+            if df is not None:
+                return df, "cache"
+        if self.rollup is not None:
+            spec = self.table_spec()
+            df = self.rollup.answer(sql, spec, version) if spec is not None else None
+            if df is not None:
+                return df, "rollup"
+        return None, "db"
+
+    def run_sql(self, sql: str, info: dict = None) -> pd.DataFrame:
+        # info: 잘림 여부/가져오기 통계 (fetch_bounded 참고)
+        info = {} if info is None else info
+        with self.tracer.span("run_sql") as span:
+            # 같은 SQL 이 다른 세션에서 조회 중이면 그 결과(DataFrame)를 함께 받는다
+            (df, shared_info), coalesced = self._coalesce(
+                "run_sql", lambda: normalize_sql(sql), lambda: self._run_sql(sql, span)
+            )
+            info.update(shared_info, coalesced=coalesced)
+            if coalesced:
+                df = df.copy(deep=False)
+            span.set(cache_hit=info["source"] == "cache", source=info["source"], truncated=info["truncated"],
+                     coalesced=coalesced, rows=len(df), bytes=int(df.memory_usage(deep=True).sum()))
+            return df
+
+    def _run_sql(self, sql: str, span):
+        # 반환: (DataFrame, info)
+        info = {}
+        cfg = self.config
+        # 같은 SQL(정규화 기준) + 같은 데이터 버전이면 공유 결과 캐시, 피벗 스냅샷으로 되는 조회는 롤업에서 응답
+        cache = self.result_cache
+        version = self.data_version() if cache or self.rollup is not None else None
+        df, source = self._local_result(sql, version)
+        if df is None:
+            df = fetch_bounded(self.engine, sql, max_rows=cfg.max_rows, chunk_rows=cfg.fetch_chunk_rows,
+                               timeout_ms=cfg.statement_timeout_ms or None, info=info)
+            if cache:
+                cache.put(sql, version, df)
+            span.set(chunks=info["chunks"], fetch_ms=round(info["fetch_s"] * 1000, 2), peak_bytes=info["peak_bytes"])
+        else:
+            # 캐시에는 이미 잘린 결과가 들어가므로 max_rows 행이면 잘린 것으로 본다
+            # (fetch_bounded 와 같은 기준: SQL 의 LIMIT n 이 max_rows 이하면 상한에 잘린 게 아님)
+            df, truncated = self._clip(df)
+            limit = trailing_limit(sql)
+            capped = source == "cache" and (limit is None or limit > cfg.max_rows) and len(df) >= cfg.max_rows
+            info.update(rows=len(df), truncated=truncated or capped)
+        info["source"] = source
+        return df, info
+
+    def _clip(self, df: pd.DataFrame):
+        # 캐시/롤업/비교 병합 결과도 DB 조회와 같은 행 제한을 적용
+        if len(df) > self.config.max_rows:
+            return df.head(self.config.max_rows), True
+        return df, False
+
+    # ----------------- 비교 모드 (회사별/연도별 하위 쿼리 동시 실행) -----------------
+    def comparison_runner(self) -> ComparisonRunner:
+        with self._runner_lock:
+            if self._comparison_runner is None:
+                self._comparison_runner = ComparisonRunner(
+                    self.engine, concurrency=self.config.compare_concurrency, timeout_s=self.config.compare_timeout_s,
+                    max_rows=self.config.max_rows,
+                )
+            return self._comparison_runner
+
+    def plan_comparison(self, question: str):
+        # 나눌 수 있는 비교 질문이면 ComparisonPlan (SQL 생성 단계로 기록), 아니면 None
+        # 하위 쿼리도 로컬 슬롯으로 조립하므로 SQL_ENGINE=agent 면 나누지 않는다
+        spec = self.table_spec() if self.config.sql_engine != "agent" else None
+        if spec is None:
+            return None
+        t0 = time.perf_counter()
+        plan = plan_comparison(question, spec, max_parts=self.config.compare_max_parts)
+        if plan is not None:
+            self.tracer.event("generate_sql", (time.perf_counter() - t0) * 1000,
+                              engine="compare", cache_hit=False, parts=len(plan.parts))
+        return plan
+
+    def run_comparison(self, plan, info: dict = None) -> pd.DataFrame:
+        # 결과 캐시/롤업으로 안 되는 하위 쿼리만 동시에 실행 → 지연시간 ≈ 가장 느린 하위 쿼리
+        info = {} if info is None else info
+        with self.tracer.span("run_sql", mode="comparison", parts=len(plan.parts)) as span:
+            (df, shared_info), coalesced = self._coalesce(
+                "run_comparison", lambda: "\n".join(normalize_sql(p.sql) for p in plan.parts),
+                lambda: self._run_comparison(plan, span),
+            )
+            info.update(shared_info, coalesced=coalesced)
+            span.set(coalesced=coalesced)
+            if coalesced:
+                df = df.copy(deep=False)
+                span.set(cache_hit=False, truncated=info["truncated"], rows=len(df),
+                         bytes=int(df.memory_usage(deep=True).sum()))
+            return df
+
+    def _run_comparison(self, plan, span):
+        # 반환: (DataFrame, info)
+        info = {}
+        cache = self.result_cache
+        version = self.data_version() if cache or self.rollup is not None else None
+        frames, todo, sources = {}, [], set()
+        for part in plan.parts:
+            df, source = self._local_result(part.sql, version)
+            sources.add(source)
+            if df is None:
+                todo.append(part)
+            else:
+                frames[part.label] = df
+
+        fetched, errors, seconds, cut = self.comparison_runner().run(todo) if todo else ({}, {}, {}, [])
+        if cache:
+            for part in todo:
+                if part.label in fetched and part.label not in cut:
+                    cache.put(part.sql, version, fetched[part.label])
+        frames.update(fetched)
+        if errors and not frames:
+            raise RuntimeError("모든 하위 조회가 실패했습니다: " + ", ".join(f"{k} {v}" for k, v in errors.items()))
+
+        df = merge_frames([frames[p.label] for p in plan.parts if p.label in frames], plan.order_by)
+        df, truncated = self._clip(df)
+        truncated = truncated or bool(cut)   # 하위 쿼리가 max_rows 에서 잘렸으면 병합 결과도 불완전
+        info.update(
+            rows=len(df),
+            truncated=truncated,
+            split_by=plan.split_by,
+            parts=len(plan.parts),
+            cached=len(plan.parts) - len(todo),
+            errors=errors,
+            slowest_s=round(max(seconds.values(), default=0.0), 3),
+            sum_s=round(sum(seconds.values()), 3),
+        )
+        span.set(
+            cache_hit=sources == {"cache"},
+            source=sources.pop() if len(sources) == 1 else "mixed",
+            failed=len(errors),
+            truncated=truncated,
+            slowest_ms=round(info["slowest_s"] * 1000, 2),
+            sum_ms=round(info["sum_s"] * 1000, 2),
+            rows=len(df),
+            bytes=int(df.memory_usage(deep=True).sum()),
+        )
+        return df, info
+
+    # ----------------- 후속 질문 (세션 대화 맥락) -----------------
+    def record_turn(self, conversation, question: str, sql: str, df: pd.DataFrame, info: dict = None):
+        # 답한 질문을 대화 기록에 남긴다 — build_select 모양이 아니면 슬롯 없이 (후속 질문 기준에서 제외)
+        spec = self.table_spec()
+        slots = parse_select(sql, spec) if spec is not None else None
+        complete = not (info or {}).get("truncated") and (slots is None or slots["limit"] is None or len(df) < slots["limit"])
+        return conversation.add(question, sql, slots, df, complete, self.data_version())
+
+    def answer_followup(self, question: str, conversation, info: dict = None):
+        """
+        직전 질문의 슬롯을 고쳐서 답할 수 있는 후속 질문이면 (SQL, DataFrame), 아니면 None.
+        SQL 은 LLM 없이 슬롯으로 조립하고, 결과는 대화 기록의 DataFrame 에서 잘라 오거나(DB 0회)
+        기록에 없는 회사/지표/기간만 조회해 합친다(DB 1회). 둘 다 안 되면 고친 SQL 을 그대로 1회 조회.
+        info["source"]: history / history+{cache,rollup,db} / {cache,rollup,db}
+        """
+        info = {} if info is None else info
+        spec = self.table_spec()
+        prev = conversation.last() if spec is not None else None
+        if prev is None:
+            return None
+        t0 = time.perf_counter()
+        slots = resolve_followup(question, prev.slots, spec)
+        if slots is None:
+            return None
+        # 직전 질문에 기대는 질문이므로 SQL 캐시에는 넣지 않는다
+        sql = self.validate_sql(build_select(slots, spec))
+        self.tracer.event("generate_sql", (time.perf_counter() - t0) * 1000, engine="followup", cache_hit=False)
+
+        with self.tracer.span("run_sql", mode="followup") as span:
+            df, shared_info = self._from_history(sql, slots, spec, conversation, span)
+            info.update(shared_info, slots=slots, base_question=prev.question, coalesced=False)
+            span.set(cache_hit=info["source"] == "history", source=info["source"], truncated=info["truncated"],
+                     rows=len(df), bytes=int(df.memory_usage(deep=True).sum()))
+        return sql, df
+
+    def _from_history(self, sql: str, slots: dict, spec: TableSpec, conversation, span):
+        # 반환: (DataFrame, info)
+        version = self.data_version()
+        turns = [t for t in conversation.turns() if t.slots is not None and t.complete and t.version == version]
+        for turn in turns:
+            if covers(turn.slots, slots):
+                df = slice_frame(turn.df, slots, spec)
+                return df, {"source": "history", "rows": len(df), "truncated": False, "db_calls": 0}
+
+        for turn in turns:
+            delta = missing_slots(turn.slots, slots)
+            if delta is None:
+                continue
+            part, part_info = self._run_sql(build_select(delta, spec), span)
+            base = slice_frame(turn.df, slots, spec)
+            if part_info["truncated"] or len(base) + len(part) > self.config.max_rows:
+                break   # 추가분이 잘렸거나 합쳐서 max_rows 를 넘으면 원래 SQL 결과와 다를 수 있다
+            df = sort_frame(pd.concat([base, part], ignore_index=True), spec)
+            if self.result_cache:
+                self.result_cache.put(sql, version, df)
+            source = part_info["source"]
+            return df, {"source": f"history+{source}", "rows": len(df), "truncated": False,
+                        "db_calls": int(source == "db"), "delta": delta}
+
+        df, info = self._run_sql(sql, span)
+        info["db_calls"] = int(info["source"] == "db")
+        return df, info
+
+    # ----------------- 요약 생성 -----------------
+    def build_summary_prompt(self, q: str, df: pd.DataFrame):
+        # 전체 CSV 대신 로컬 집계 + 제한된 샘플만 보낸다 (토큰 예산 내)
+        data_block, info = build_summary_input(
+            df, token_budget=self.config.summary_token_budget, sample_rows=self.config.summary_sample_rows,
+            ym_col=self.config.ym_col,
+        )
+        prompt = SUMMARY_PROMPT.format(question=q, data_block=data_block)
+        info["prompt_tokens"] = count_tokens(prompt)
+        return prompt, info
+
+    def summary_config_key(self) -> str:
+        # 요약 결과를 바꾸는 설정(모델, 토큰 예산, 샘플 행 수, 결산년월 컬럼, 프롬프트) 지문 — 요약 캐시 네임스페이스
+        cfg = self.config
+        raw = repr((cfg.summary_model or cfg.model, cfg.summary_token_budget, cfg.summary_sample_rows, cfg.ym_col,
+                    SUMMARY_PROMPT))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _summary_key(self, q: str, df: pd.DataFrame) -> str:
+        # 요약 캐시와 같은 기준: 정규화 질문 + 결과 지문
+        return f"{normalize_question(q)}|{frame_fingerprint(df)}"
+
+    @staticmethod
+    def _mark_coalesced(info: dict, coalesced: bool):
+        info["coalesced"] = coalesced
+        span = current_span()
+        if span is not None:
+            span.set(coalesced=coalesced)
+
+    def summarize_answer(self, q: str, df: pd.DataFrame, info: dict = None) -> str:
+        # info 에 프롬프트/토큰/지연시간을 채운다 (백그라운드 스레드에서도 호출됨)
+        info = {} if info is None else info
+        (text, shared_info), coalesced = self._coalesce(
+            "summarize_answer", lambda: self._summary_key(q, df), lambda: self._summarize(q, df)
+        )
+        info.update(shared_info)
+        self._mark_coalesced(info, coalesced)
+        return text
+
+    def _summarize(self, q: str, df: pd.DataFrame):
+        # 반환: (요약 텍스트, info)
+        prompt, info = self.build_summary_prompt(q, df)
+        info["prompt"] = prompt
+        t0 = time.perf_counter()
+        r = self.client.chat.completions.create(
+            model=self.config.summary_model or self.config.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2
+        )
+        info["total_s"] = round(time.perf_counter() - t0, 3)
+        if r.usage:
+            info.update(prompt_tokens=r.usage.prompt_tokens, completion_tokens=r.usage.completion_tokens)
+        return r.choices[0].message.content.strip(), info
+
+    def stream_summary(self, q: str, df: pd.DataFrame, info: dict = None):
+        # summarize_answer 의 스트리밍 버전 — 텍스트 조각을 yield, 첫 토큰까지 시간(TTFT) 기록
+        info = {} if info is None else info
+        if self.coalescer is None:
+            self._mark_coalesced(info, False)
+            yield from self._stream_summary(q, df, info)
+            return
+        # 같은 요약이 스트리밍 중이면 리더가 받은 조각을 처음부터 함께 받는다 (info 는 끝난 뒤 리더 것을 복사)
+        t0 = time.perf_counter()
+        shared = {}
+        chunks, coalesced, leader_info = self.coalescer.stream(
+            "stream_summary", self._summary_key(q, df), lambda: self._stream_summary(q, df, shared), context=shared
+        )
+        self._mark_coalesced(info, coalesced)
+        for chunk in chunks:
+            if coalesced:
+                info.setdefault("ttft_s", round(time.perf_counter() - t0, 3))
+            yield chunk
+        if coalesced:
+            info.update({k: v for k, v in leader_info.items() if k not in ("ttft_s", "total_s")},
+                        total_s=round(time.perf_counter() - t0, 3))
+        else:
+            info.update(leader_info)
+
+    def _stream_summary(self, q: str, df: pd.DataFrame, info: dict):
+        prompt, prompt_info = self.build_summary_prompt(q, df)
+        info.update(prompt_info, prompt=prompt)
+        t0 = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=self.config.summary_model or self.config.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.usage:
+                info.update(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+            if chunk.choices and chunk.choices[0].delta.content:
+                info.setdefault("ttft_s", round(time.perf_counter() - t0, 3))
+                yield chunk.choices[0].delta.content
+        info["total_s"] = round(time.perf_counter() - t0, 3)
+
+    # ----------------- 요약 일괄 생성 (배치 리포트) -----------------
+    def build_summary_block(self, key: str, q: str, df: pd.DataFrame):
+        # 일괄 요약 프롬프트에 들어갈 질문 1건 분량. 반환: (텍스트, info)
+        data_block, info = build_summary_input(
+            df, token_budget=self.config.summary_token_budget, sample_rows=self.config.summary_sample_rows,
+            ym_col=self.config.ym_col,
+        )
+        block = f"### id={key}\n질문: {q}\n{data_block}"
+        info["prompt_tokens"] = count_tokens(block)
+        return block, info
+
+    def summarize_batch(self, blocks, info: dict = None) -> dict:
+        """
+        build_summary_block 으로 만든 [(id, 블록)] 여러 건을 LLM 1회로 요약한다. 반환: {id: 요약}.
+        응답에 빠진 id 는 결과에 없으므로 호출한 쪽에서 summarize_answer 로 다시 요약한다.
+        """
+        info = {} if info is None else info
+        ids = [key for key, _ in blocks]
+        prompt = BATCH_SUMMARY_PROMPT + "\n\n".join(block for _, block in blocks)
+        t0 = time.perf_counter()
+        r = self.client.chat.completions.create(
+            model=self.config.summary_model or self.config.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_schema", "json_schema": BATCH_SUMMARY_SCHEMA},
+            temperature=0.2,
+        )
+        info.update(items=len(ids), total_s=round(time.perf_counter() - t0, 3), prompt_tokens=count_tokens(prompt))
+        if r.usage:
+            info.update(prompt_tokens=r.usage.prompt_tokens, completion_tokens=r.usage.completion_tokens)
+        try:
+            raw = json.loads(r.choices[0].message.content or "")
+        except json.JSONDecodeError:
+            raw = {}
+        wanted = set(ids)
+        out = {
+            str(item.get("id")): item["summary"].strip()
+            for item in raw.get("summaries") or []
+            if str(item.get("id")) in wanted and (item.get("summary") or "").strip()
+        }
+        info["missing"] = [key for key in ids if key not in out]
+        return out
+
@@ -0,0 +1,317 @@
+# question_parser.py — 질문 정규화 / 결산년월·회사명·지표 추출 (LLM 호출 전 로컬 규칙 파서)
+import re
+import unicodedata
+
+# DB(kics_solvency_data_flexible)에 저장된 회사명
+COMPANY_NAMES = [
+    "미래에셋생명", "흥국화재", "한화생명", "한화손해", "iM라이프생명", "흥국생명", "메리츠화재",
+    "KB생명", "신한생명", "DB생명", "하나생명", "BNP생명", "푸본현대생명", "ABL생명", "DB손해",
+    "동양생명", "농협생명", "삼성화재", "교보라이프플래닛생명", "메트라이프생명", "처브라이프생명보험",
+    "AIA생명", "현대해상", "교보생명", "롯데손해", "KDB생명", "라이나생명", "IBK생명", "코리안리",
+    "KB손해", "삼성생명", "농협손보",
+]
+
+# 회사 별칭 → DB 회사명 (정식 회사명 자체는 자동 등록)
+COMPANY_ALIASES = {
+    "NH농협생명": "농협생명", "NH생명": "농협생명", "농협생명보험": "농협생명",
+    "농협손해보험": "농협손보", "NH농협손해보험": "농협손보", "NH손보": "농협손보", "농협손해": "농협손보", "농협화재": "농협손보",
+    "KB손해보험": "KB손해", "KB손보": "KB손해", "KB화재": "KB손해",
+    "KB생명보험": "KB생명", "KB라이프": "KB생명", "KB라이프생명": "KB생명",
+    "삼성생명보험": "삼성생명", "삼성화재해상": "삼성화재", "삼성화재해상보험": "삼성화재",
+    "한화생명보험": "한화생명", "한화손해보험": "한화손해", "한화손보": "한화손해",
+    "DB손해보험": "DB손해", "DB손보": "DB손해", "DB생명보험": "DB생명",
+    "현대해상화재": "현대해상", "현대해상화재보험": "현대해상",
+    "메리츠": "메리츠화재", "메리츠화재해상": "메리츠화재",
+    "흥국화재해상": "흥국화재", "흥국생명보험": "흥국생명",
+    "롯데손해보험": "롯데손해", "롯데손보": "롯데손해",
+    "교보생명보험": "교보생명", "교보라이프플래닛": "교보라이프플래닛생명",
+    "미래에셋": "미래에셋생명", "미래에셋생명보험": "미래에셋생명",
+    "신한라이프": "신한생명", "신한라이프생명": "신한생명",
+    "동양생명보험": "동양생명", "푸본현대": "푸본현대생명",
+    "메트라이프": "메트라이프생명", "처브라이프": "처브라이프생명보험", "처브라이프생명": "처브라이프생명보험",
+    "AIA": "AIA생명", "ABL": "ABL생명",
+    "BNP파리바카디프생명": "BNP생명", "BNP파리바카디프": "BNP생명", "카디프생명": "BNP생명",
+    "하나생명보험": "하나생명", "iM라이프": "iM라이프생명", "DGB생명": "iM라이프생명",
+    "KDB생명보험": "KDB생명", "라이나": "라이나생명", "IBK연금보험": "IBK생명", "IBK연금": "IBK생명",
+    "코리안리재보험": "코리안리",
+}
+
+# 업권 그룹 → 소속 회사 ('생명보험사 전체 비교' 같은 질문을 회사 목록으로 펼친다)
+COMPANY_GROUPS = {
+    "life": [n for n in COMPANY_NAMES if "생명" in n],
+    "nonlife": [n for n in COMPANY_NAMES if "생명" not in n],
+}
+GROUP_ALIASES = {
+    "생명보험사": "life", "생명보험": "life", "생보사": "life", "생보": "life",
+    "손해보험사": "nonlife", "손해보험": "nonlife", "손보사": "nonlife", "손보": "nonlife",
+}
+
+# 지표 별칭 → metric 값
+METRIC_ALIASES = {
+    "k_ics": ["K-ICS", "K-ICS비율", "킥스", "킥스비율", "지급여력비율", "지급여력", "신지급여력비율"],
+    "assets": ["자산", "총자산", "자산총계"],
+    "liabilities": ["부채", "총부채", "부채총계"],
+    "revenue": ["매출", "매출액", "수익", "영업수익"],
+}
+
+# 슬롯을 빼고 남아도 '완전 템플릿 질문'으로 볼 수 있는 말 (정규화 후 비교)
+FILLER_WORDS = [
+    "알려줘", "알려주세요", "알려줄래", "보여줘", "보여주세요", "조회", "조회해줘", "확인", "해줘",
+    "얼마야", "얼마예요", "얼마인가요", "얼마", "몇", "어때", "어떻게돼", "추이", "변화", "현황",
+    "비교", "부터", "까지", "에서", "비율", "보험사", "보험", "수치", "값", "기준", "좀", "및", "그리고",
+    "은", "는", "이", "가", "의", "와", "과", "을", "를", "도", "말",
+    "전체", "전부", "모든", "각", "회사별", "별", "들",
+]
+
+# 슬롯 자리표시자 (정규화된 질문 안에서 값 대신 들어감)
+YM_SLOT = "{ym}"
+COMPANY_SLOT = "{company}"
+
+# 'YYYY년 MM월' / 'YY년 MM월'
+_YM_KOREAN = re.compile(r"(?<!\d)(\d{4}|\d{2})\s*년\s*(\d{1,2})\s*월")
+# 'YYYY.MM' / 'YY.MM' (소수/퍼센트와 구분하기 위해 뒤에 숫자·% 금지)
+_YM_DOTTED = re.compile(r"(?<![\d.])(\d{4}|\d{2})\s*[./-]\s*(\d{1,2})(?![\d.]|\s*%)")
+# 'YYYYMM'
+_YM_COMPACT = re.compile(r"(?<!\d)(20\d{2})(0[1-9]|1[0-2])(?!\d)")
+
+
+def _fold(ch: str) -> str:
+    # 트라이 비교용 문자 정규화: 소문자, 공백/기호는 버림
+    return ch.lower() if ch.isalnum() else ""
+
+
+def _is_ascii_letter(ch: str) -> bool:
+    return ch.isascii() and ch.isalpha()
+
+
+class AliasTrie:
+    """띄어쓰기/기호를 무시하고 가장 긴 별칭부터 매칭하는 트라이."""
+
+    _END = object()
+
+    def __init__(self, aliases: dict = None):
+        self._root = {}
+        for alias, value in (aliases or {}).items():
+            self.add(alias, value)
+
+    def add(self, alias: str, value):
+        node = self._root
+        for ch in unicodedata.normalize("NFKC", alias):
+            f = _fold(ch)
+            if f:
+                node = node.setdefault(f, {})
+        node[self._END] = value
+
+    def find_all(self, text: str):
+        # 정규화된 문자열과 원문 위치 매핑
+        chars, index = [], []
+        for i, ch in enumerate(text):
+            f = _fold(ch)
+            if f:
+                chars.append(f)
+                index.append(i)
+
+        spans, i = [], 0
+        while i < len(chars):
+            node, best = self._root, None
+            for j in range(i, len(chars)):
+                node = node.get(chars[j])
+                if node is None:
+                    break
+                if self._END in node:
+                    best = (j, node[self._END])
+            # 영문 단어 중간에서 시작하는 매칭은 버린다 ('XDB생명' 안의 'DB생명')
+            start = index[i]
+            if best and not (start > 0 and _is_ascii_letter(text[start - 1]) and _is_ascii_letter(text[start])):
+                spans.append((index[i], index[best[0]] + 1, best[1]))
+                i = best[0] + 1
+            else:
+                i += 1
+        return spans
+
+
+COMPANY_TRIE = AliasTrie({**{n: n for n in COMPANY_NAMES}, **COMPANY_ALIASES})
+GROUP_TRIE = AliasTrie(GROUP_ALIASES)
+METRIC_TRIE = AliasTrie({alias: metric for metric, aliases in METRIC_ALIASES.items() for alias in aliases})
+_FILLER_RE = re.compile(
+    "(?:" + "|".join(re.escape(w) for w in sorted(FILLER_WORDS, key=len, reverse=True)) + ")*"
+)
+
+
+def _to_closing_ym(year: str, month: str):
+    m = int(month)
+    if not 1 <= m <= 12:
+        return None
+    # 'YY' 는 모두 20YY 로 변환 (AGENT_PREFIX 날짜 규칙과 동일)
+    y = int(year) if len(year) == 4 else 2000 + int(year)
+    return f"{y:04d}{m:02d}"
+
+
+def _find_closing_yms(text: str):
+    spans = []
+    for pattern in (_YM_KOREAN, _YM_DOTTED, _YM_COMPACT):
+        for m in pattern.finditer(text):
+            if any(s < m.end() and m.start() < e for s, e, _ in spans):
+                continue
+            ym = _to_closing_ym(m.group(1), m.group(2))
+            if ym:
+                spans.append((m.start(), m.end(), ym))
+    return sorted(spans)
+
+
+def _find_companies(text: str):
+    return COMPANY_TRIE.find_all(text)
+
+
+def _overlaps(s: int, e: int, spans) -> bool:
+    return any(s < sp[1] and sp[0] < e for sp in spans)
+
+
+def extract_closing_yms(question: str) -> list:
+    return [ym for _, _, ym in _find_closing_yms(unicodedata.normalize("NFKC", question))]
+
+
+def extract_companies(question: str) -> list:
+    return [name for _, _, name in _find_companies(unicodedata.normalize("NFKC", question))]
+
+
+def normalize_question(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text).lower()
+    # 띄어쓰기/구두점은 질문마다 제각각이므로 모두 제거 (슬롯 중괄호는 보존)
+    return re.sub(r"[^\w{}]+", "", t)
+
+
+def parse_question_template(question: str):
+    """질문을 (슬롯화된 정규화 키, {'closing_ym': [...], 'company': [...]}) 로 분해한다."""
+    text = unicodedata.normalize("NFKC", question)
+    params = {"closing_ym": [], "company": []}
+
+    pieces, pos = [], 0
+    spans = [(s, e, "closing_ym", v) for s, e, v in _find_closing_yms(text)]
+    for s, e, v in _find_companies(text):
+        if not _overlaps(s, e, spans):
+            spans.append((s, e, "company", v))
+
+    for s, e, kind, value in sorted(spans):
+        pieces.append(text[pos:s])
+        pieces.append(f" {YM_SLOT if kind == 'closing_ym' else COMPANY_SLOT} ")
+        params[kind].append(value)
+        pos = e
+    pieces.append(text[pos:])
+
+    return normalize_question("".join(pieces)), params
+
+
+def parse_local_slots(question: str, metrics=None) -> dict:
+    """LLM 없이 결산년월/회사/지표를 추출한다.
+
+    complete=True 이면 슬롯 외에 남은 말이 모두 FILLER_WORDS 라서 LLM 없이 SQL을 조립해도 된다.
+    metrics 가 주어지면 그 목록(DB에 실제 있는 값)에 있는 지표만 인정한다.
+    """
+    text = unicodedata.normalize("NFKC", question)
+    spans = [(s, e, "closing_ym", v) for s, e, v in _find_closing_yms(text)]
+    for kind, trie in (("company", COMPANY_TRIE), ("group", GROUP_TRIE), ("metric", METRIC_TRIE)):
+        for s, e, v in trie.find_all(text):
+            if not _overlaps(s, e, spans):
+                spans.append((s, e, kind, v))
+
+    found = {"closing_ym": [], "company": [], "group": [], "metric": []}
+    residual, pos = [], 0
+    for s, e, kind, value in sorted(spans):
+        residual.append(text[pos:s])
+        found[kind].append(value)
+        pos = e
+    residual.append(text[pos:])
+
+    yms = sorted(set(found["closing_ym"]))
+    # 결산년월이 2개면 '부터/까지/~' 가 있을 때만 기간으로 본다 (아니면 두 시점 비교 → LLM)
+    is_range = len(yms) < 2 or bool(re.search(r"부터|까지|~", text))
+    metric_list = list(dict.fromkeys(found["metric"]))
+    unknown_metric = metrics is not None and any(m not in metrics for m in metric_list)
+    rest = normalize_question("".join(residual))
+    # 업권 그룹('생명보험사')은 소속 회사로 펼쳐서 회사 목록에 합친다
+    groups = list(dict.fromkeys(found["group"]))
+    companies = found["company"] + [c for g in groups for c in COMPANY_GROUPS[g]]
+    return {
+        "companies": list(dict.fromkeys(companies)),
+        "groups": groups,
+        "closing_ym_from": yms[0] if yms else None,
+        "closing_ym_to": yms[-1] if yms else None,
+        "closing_yms": yms,
+        "metrics": metric_list,
+        "residual": rest,
+        "complete": bool(metric_list) and not unknown_metric and len(yms) <= 2 and is_range
+                    and _FILLER_RE.fullmatch(rest) is not None,
+    }
+
+
+def format_slot_hints(slots: dict) -> str:
+    parts = []
+    if slots.get("closing_yms"):
+        parts.append("closing_ym=" + ",".join(slots["closing_yms"]))
+    if slots.get("companies"):
+        parts.append("회사명=" + ",".join(f"'{c}'" for c in slots["companies"]))
+    if slots.get("metrics"):
+        parts.append("metric=" + ",".join(f"'{m}'" for m in slots["metrics"]))
+    return " / ".join(parts)
+
+
+# ----------------- 후속 질문 ("그럼 삼성생명은?", "작년 같은 달은?") -----------------
+# 직전 결산년월 기준 상대 기간 → 개월 수
+RELATIVE_PERIODS = {
+    "재작년": -24, "전전년": -24, "2년전": -24,
+    "작년": -12, "전년": -12, "지난해": -12, "1년전": -12, "내년": 12, "다음해": 12,
+    "전분기": -3, "직전분기": -3, "지난분기": -3, "다음분기": 3,
+}
+# 직전 질문을 이어받는다는 표시 (정규화 후 비교)
+FOLLOWUP_MARKERS = [
+    "그럼", "그러면", "그렇다면", "이번엔", "이번에는", "대신", "같은달", "같은기간", "같은시점", "동월", "동기",
+    "빼고", "제외하고", "제외", "추가로", "추가", "같이", "함께", "포함해서", "포함", "도",
+]
+# 후속 질문에서 슬롯 외에 남아도 되는 말 (FILLER_WORDS 와 함께)
+FOLLOWUP_WORDS = FOLLOWUP_MARKERS + ["요", "은요", "는요", "으로", "로", "더"]
+
+# 월 없는 연도('23년은?') / 연도 없는 월('6월은?') — 직전 결산년월의 나머지 부분은 그대로 둔다
+_YEAR_ONLY = re.compile(r"(?<!\d)(\d{4}|\d{2})년")
+_MONTH_ONLY = re.compile(r"(?<!\d)(\d{1,2})월")
+_RELATIVE_RE = re.compile("|".join(re.escape(w) for w in sorted(RELATIVE_PERIODS, key=len, reverse=True)))
+_MARKER_RE = re.compile("|".join(re.escape(w) for w in sorted(FOLLOWUP_MARKERS, key=len, reverse=True)))
+_FOLLOWUP_FILLER_RE = re.compile(
+    "(?:" + "|".join([_YEAR_ONLY.pattern, _MONTH_ONLY.pattern] + [
+        re.escape(w) for w in sorted(set(FILLER_WORDS + FOLLOWUP_WORDS) | set(RELATIVE_PERIODS), key=len, reverse=True)
+    ]) + ")*"
+)
+
+
+def parse_followup(question: str, metrics=None) -> dict:
+    """직전 질문의 슬롯을 고쳐 쓰는 후속 질문인지 판단하고 바뀐 부분만 돌려준다.
+
+    followup=True 이면 슬롯/상대 기간/연·월 외에 남은 말이 모두 FILLER_WORDS·FOLLOWUP_WORDS 다.
+    mode 는 회사/지표를 직전 값에 더할지(add), 뺄지(remove), 바꿀지(replace).
+    슬롯 두 종류 이상으로 완전한 질문은 이어받는 표시('그럼', '도' …)나 상대 기간이 있을 때만 후속 질문으로 본다.
+    """
+    local = parse_local_slots(question, metrics)
+    rest = local["residual"].replace("년도", "년")  # '23년도' 의 '도'는 추가 표시가 아니다
+    relative = _RELATIVE_RE.search(rest)
+    year = _YEAR_ONLY.search(rest)
+    month = _MONTH_ONLY.search(rest)
+    marker = _MARKER_RE.search(rest)
+    if re.search(r"빼고|제외", rest):
+        mode = "remove"
+    elif re.search(r"도|추가|같이|함께|포함", rest):
+        mode = "add"
+    else:
+        mode = "replace"
+
+    kinds = sum(bool(local[k]) for k in ("companies", "metrics", "closing_yms"))
+    standalone = local["complete"] and kinds >= 2 and not (marker or relative)
+    followup = (bool(kinds or relative or year or month) and not standalone
+                and _FOLLOWUP_FILLER_RE.fullmatch(rest) is not None)
+    return {
+        **local,
+        "followup": followup,
+        "mode": mode,
+        "shift_months": RELATIVE_PERIODS[relative.group()] if relative else 0,
+        "year": _to_closing_ym(year.group(1), "1")[:4] if year else None,
+        "month": int(month.group(1)) if month and 1 <= int(month.group(1)) <= 12 else None,
+    }
@@ -0,0 +1,150 @@
+# result_cache.py — 정규화 SQL → 결과 DataFrame 캐시 (Parquet 바이트, 용량 기준 LRU + 디스크 스필)
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+
+def normalize_sql(sql: str) -> str:
+    # 문자열 리터럴은 그대로 두고, 나머지는 소문자 + 공백 정리 + 끝 세미콜론 제거
+    parts = _STRING_LITERAL.split(sql.strip().rstrip(";").strip())
+    out = []
+    for i, part in enumerate(parts):
+        out.append(part if i % 2 else re.sub(r"\s+", " ", part.lower()))
+    return "".join(out).strip()
+
+
+class ResultCache:
+    """
+    max_bytes: 메모리에 두는 Parquet 바이트 상한 (넘치면 오래 안 쓴 항목부터 spill_dir 로 내보냄)
+    spill_max_bytes: 디스크 스필 상한 — 넘치면 오래 안 쓴 파일부터 지운다 (기본: max_bytes 와 같음)
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, spill_dir: str = None, spill_max_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = max_bytes if spill_max_bytes is None else spill_max_bytes
+        self._entries = OrderedDict()   # key -> parquet bytes
+        self._bytes = 0
+        self._spilled = OrderedDict()   # key -> 파일 크기 (디스크 LRU 순서)
+        self._spill_bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.spilled = 0
+        self.spill_evicted = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            # 이전 프로세스가 남긴 파일은 데이터 버전을 알 수 없으므로 지운다
+            self._clear_spill()
+
+    @staticmethod
+    def _key(sql: str, version) -> str:
+        raw = f"{version}|{normalize_sql(sql)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.parquet")
+
+    def _clear_spill(self):
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".parquet"):
+                os.remove(os.path.join(self.spill_dir, name))
+        self._spilled.clear()
+        self._spill_bytes = 0
+
+    def _check_version(self, version):
+        # 데이터 버전이 바뀌면 메모리/디스크 항목 모두 무효화
+        if version == self._version:
+            return
+        self._entries.clear()
+        self._bytes = 0
+        if self.spill_dir:
+            self._clear_spill()
+        self._version = version
+
+    def _spill(self, key: str, blob: bytes):
+        # 디스크로 내보내고, 스필 상한을 넘으면 오래 안 쓴 파일부터 삭제
+        if len(blob) > self.spill_max_bytes:
+            return
+        with open(self._spill_path(key), "wb") as f:
+            f.write(blob)
+        self._spill_bytes += len(blob) - self._spilled.pop(key, 0)
+        self._spilled[key] = len(blob)
+        self.spilled += 1
+        while self._spill_bytes > self.spill_max_bytes:
+            k, size = self._spilled.popitem(last=False)
+            self._spill_bytes -= size
+            try:
+                os.remove(self._spill_path(k))
+            except FileNotFoundError:
+                pass
+            self.spill_evicted += 1
+
+    def get(self, sql: str, version):
+        key = self._key(sql, version)
+        with self._lock:
+            self._check_version(version)
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            elif key in self._spilled and os.path.exists(self._spill_path(key)):
+                with open(self._spill_path(key), "rb") as f:
+                    blob = f.read()
+                self._spilled.move_to_end(key)
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                return None
+        return pd.read_parquet(io.BytesIO(blob))
+
+    def put(self, sql: str, version, df: pd.DataFrame) -> bool:
+        buf = io.BytesIO()
+        try:
+            df.to_parquet(buf, index=False, compression="zstd")
+        except (ValueError, TypeError, NotImplementedError, ImportError):
+            return False  # Parquet 으로 표현할 수 없는 타입이면 캐시하지 않음
+        blob = buf.getvalue()
+        if len(blob) > self.max_bytes:
+            return False
+
+        key = self._key(sql, version)
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                k, b = self._entries.popitem(last=False)
+                self._bytes -= len(b)
+                if self.spill_dir:
+                    self._spill(k, b)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+                "entries": len(self._entries),
+                "bytes_held": self._bytes,
+                "spilled": self.spilled,
+                "spill_entries": len(self._spilled),
+                "spill_bytes": self._spill_bytes,
+                "spill_evicted": self.spill_evicted,
+                "data_version": self._version,
+            }
@@ -0,0 +1,205 @@
+# rollup.py — 회사 × 결산년월 × 지표 피벗 스냅샷 (로컬 Parquet) — 자주 묻는 조회를 원격 DB 없이 응답
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from sql_engine import TableSpec, parse_select
+
+
+class RollupStore:
+    """
+    원격 테이블을 (회사, 결산년월) 행 × 지표 열로 피벗해 Parquet 로 보관한다.
+    - 새 closing_ym 행이 생기면 그 이후 행만 가져와 덧붙이고(증분), 기존 구간 행 수가 바뀌면 전체 재생성
+    - build_select 모양의 SQL(규칙/단일 호출/캐시 템플릿/비교 하위 쿼리)만 응답, 나머지는 None → 원격 DB
+    - 같은 (회사, 결산년월, 지표)가 여러 행이거나 value 가 NULL 인 지표는 피벗으로 똑같이 재현할 수 없으므로 제외
+    """
+
+    def __init__(self, engine, path: str):
+        self.engine = engine
+        self.path = path
+        self.meta_path = os.path.splitext(path)[0] + ".json"
+        self._wide = None
+        self._meta = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()   # 갱신(파일 쓰기)은 한 번에 하나만
+        self._refreshing = False
+        self.served = 0
+        self.missed = 0     # SQL 모양/지표가 스냅샷 범위 밖
+        self.stale = 0      # 스냅샷이 아직 없거나 원격 데이터 버전과 다름 (갱신 대기)
+        self.last_error = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.path) and os.path.exists(self.meta_path)):
+            return
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            wide = pd.read_parquet(self.path)
+        except (OSError, ValueError):  # 깨진 스냅샷은 무시하고 다음 갱신 때 다시 만든다
+            return
+        self._wide, self._meta = wide, meta
+
+    # ----------------- 갱신 -----------------
+    @staticmethod
+    def _pivot(long: pd.DataFrame, spec: TableSpec):
+        # 반환: (피벗 DataFrame, 제외할 지표 집합)
+        keys = [spec.company_col, spec.ym_col, spec.metric_col]
+        bad = set(long.loc[long.duplicated(keys, keep=False), spec.metric_col])
+        bad |= set(long.loc[long[spec.value_col].isna(), spec.metric_col])
+        long = long[~long[spec.metric_col].isin(bad)]
+        wide = (
+            long.assign(**{spec.value_col: pd.to_numeric(long[spec.value_col], errors="coerce")})
+            .pivot(index=[spec.company_col, spec.ym_col], columns=spec.metric_col, values=spec.value_col)
+            .reset_index()
+        )
+        wide.columns = [str(c) for c in wide.columns]
+        return wide, bad
+
+    def refresh(self, spec: TableSpec, full: bool = False) -> dict:
+        with self._refresh_lock:
+            return self._refresh(spec, full)
+
+    def _refresh(self, spec: TableSpec, full: bool) -> dict:
+        t0 = time.perf_counter()
+        cols = f"{spec.company_col}, {spec.ym_col}, {spec.metric_col}, {spec.value_col}"
+        with self.engine.connect() as conn:
+            max_ym, total = conn.exec_driver_sql(f"SELECT MAX({spec.ym_col}), COUNT(*) FROM {spec.table}").one()
+            version = f"{max_ym}:{total}"
+            with self._lock:
+                meta, wide = dict(self._meta), self._wide
+            if meta.get("version") == version and meta.get("table") == spec.table and not full:
+                mode = "noop"
+            else:
+                local_max = meta.get("max_ym")
+                incremental = (
+                    not full and wide is not None and local_max is not None and meta.get("table") == spec.table
+                    and conn.exec_driver_sql(
+                        f"SELECT COUNT(*) FROM {spec.table} WHERE {spec.ym_col} <= {self._ym_literal(local_max, spec)}"
+                    ).scalar() == meta.get("rows")
+                )
+                if incremental:
+                    mode = "incremental"
+                    new = pd.read_sql_query(
+                        f"SELECT {cols} FROM {spec.table} WHERE {spec.ym_col} > {self._ym_literal(local_max, spec)}", conn
+                    )
+                    new_wide, bad = self._pivot(new, spec)
+                    bad |= set(meta.get("excluded_metrics", []))
+                    wide = pd.concat([wide, new_wide], ignore_index=True)
+                    wide = wide.drop(columns=[c for c in bad if c in wide.columns])
+                    rows = meta["rows"] + len(new)
+                else:
+                    mode = "full"
+                    long = pd.read_sql_query(f"SELECT {cols} FROM {spec.table}", conn)
+                    wide, bad = self._pivot(long, spec)
+                    rows = len(long)
+
+                wide = wide.sort_values([spec.ym_col, spec.company_col], kind="stable", ignore_index=True)
+                meta = {
+                    "table": spec.table,
+                    "version": version,
+                    "max_ym": None if max_ym is None else str(max_ym),
+                    "rows": rows,
+                    "cells": int(wide.drop(columns=[spec.company_col, spec.ym_col]).notna().sum().sum()),
+                    "metrics": sorted(c for c in wide.columns if c not in (spec.company_col, spec.ym_col)),
+                    "excluded_metrics": sorted(bad),
+                }
+                tmp = self.path + ".tmp"
+                wide.to_parquet(tmp, index=False, compression="zstd")
+                os.replace(tmp, self.path)
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+
+        meta.update(last_refresh_mode=mode, last_refresh_s=round(time.perf_counter() - t0, 3), refreshed_at=time.time())
+        with self._lock:
+            self._wide, self._meta = wide, meta
+        return meta
+
+    def refresh_async(self, spec: TableSpec):
+        # 요청 스레드를 막지 않도록 백그라운드에서 1개만 실행
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh(spec)
+                self.last_error = None
+            except Exception as e:  # 갱신 실패 시 원격 DB 경로로 계속 응답
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="rollup-refresh", daemon=True).start()
+
+    @staticmethod
+    def _ym_literal(ym, spec: TableSpec) -> str:
+        return str(int(ym)) if spec.ym_numeric else "'" + str(ym).replace("'", "''") + "'"
+
+    # ----------------- 조회 -----------------
+    def answer(self, sql: str, spec: TableSpec, version: str):
+        """스냅샷으로 응답할 수 있으면 원격 DB 와 같은 모양의 DataFrame, 아니면 None."""
+        with self._lock:
+            wide, meta = self._wide, self._meta
+        slots = parse_select(sql, spec)
+        if slots is None:
+            with self._lock:
+                self.missed += 1
+            return None
+        if wide is None or meta.get("version") != version:
+            with self._lock:
+                self.stale += 1
+            self.refresh_async(spec)
+            return None
+        if any(m not in meta["metrics"] for m in slots["metrics"]):
+            with self._lock:
+                self.missed += 1
+            return None
+
+        mask = pd.Series(True, index=wide.index)
+        if slots["companies"]:
+            mask &= wide[spec.company_col].isin(slots["companies"])
+        if slots["closing_ym_from"]:
+            lo, hi = slots["closing_ym_from"], slots["closing_ym_to"]
+            if spec.ym_numeric:
+                lo, hi = int(lo), int(hi)
+            mask &= wide[spec.ym_col].between(lo, hi)
+
+        df = (
+            wide.loc[mask, [spec.company_col, spec.ym_col, *slots["metrics"]]]
+            .melt(id_vars=[spec.company_col, spec.ym_col], var_name=spec.metric_col, value_name=spec.value_col)
+            .dropna(subset=[spec.value_col])
+            .sort_values([spec.ym_col, spec.company_col, spec.metric_col], kind="stable", ignore_index=True)
+        )
+        if slots["limit"] is not None:
+            df = df.head(slots["limit"])
+        with self._lock:
+            self.served += 1
+        return df
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.served + self.missed + self.stale
+            meta = dict(self._meta)
+            return {
+                "served": self.served,
+                "missed": self.missed,
+                "stale": self.stale,
+                "coverage": round(self.served / total, 3) if total else 0.0,
+                "version": meta.get("version"),
+                "rows": meta.get("rows"),
+                "cells": meta.get("cells"),
+                "metrics": meta.get("metrics", []),
+                "excluded_metrics": meta.get("excluded_metrics", []),
+                "last_refresh_mode": meta.get("last_refresh_mode"),
+                "last_refresh_s": meta.get("last_refresh_s"),
+                "refreshing": self._refreshing,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,131 @@
+# singleflight.py — 같은 키로 동시에 들어온 호출을 1번만 실행하고 결과를 나눠 준다 (프로세스 공용)
+import threading
+from concurrent.futures import Future
+
+
+class _Stream:
+    # 진행 중인 스트리밍 호출 1건 — 리더가 받은 조각을 쌓아 두고 팔로워가 순서대로 읽는다
+    def __init__(self, context):
+        self.context = context
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def push(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done, self.error = True, error
+            self.cond.notify_all()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                if i >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                chunk = self.chunks[i]
+            i += 1
+            yield chunk
+
+
+class SingleFlight:
+    """
+    단계(stage)별 키 → 진행 중인 호출. 같은 키가 이미 실행 중이면 새로 실행하지 않고 그 결과를 기다린다.
+    - 리더(처음 온 호출)의 예외도 팔로워에게 그대로 전달
+    - 완료되면 키를 지우므로 그 뒤에 온 호출은 다시 실행 (결과 재사용은 캐시의 몫)
+    - coalescing_ratio = 팔로워 / 전체 호출 — 합쳐져서 아낀 상위(LLM/DB) 호출 비율
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counts = {}   # stage -> [리더, 팔로워]
+
+    def _join(self, stage: str, key, make):
+        # 반환: (진행 중 호출, 리더 여부)
+        with self._lock:
+            counts = self._counts.setdefault(stage, [0, 0])
+            call = self._calls.get((stage, key))
+            if call is not None:
+                counts[1] += 1
+                return call, False
+            call = self._calls[(stage, key)] = make()
+            counts[0] += 1
+            return call, True
+
+    def _leave(self, stage: str, key, call):
+        with self._lock:
+            if self._calls.get((stage, key)) is call:
+                del self._calls[(stage, key)]
+
+    def do(self, stage: str, key, fn):
+        """fn() 을 키당 1번만 실행. 반환: (결과, 다른 호출의 결과를 받았는지)."""
+        fut, leader = self._join(stage, key, Future)
+        if not leader:
+            return fut.result(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(value)
+            return value, False
+        finally:
+            self._leave(stage, key, fut)
+
+    def stream(self, stage: str, key, fn, context=None):
+        """
+        fn() 이 돌려주는 이터레이터를 키당 1번만 소비하고 조각을 팔로워에게도 흘려보낸다.
+        반환: (조각 이터레이터, 합류 여부, 리더의 context) — 리더의 context 는 스트림이 끝난 뒤에 다 채워진다.
+        """
+        call, leader = self._join(stage, key, lambda: _Stream(context))
+        if not leader:
+            return call.follow(), True, call.context
+        return self._lead(stage, key, call, fn), False, context
+
+    def _lead(self, stage: str, key, call: _Stream, fn):
+        error = RuntimeError("리더 스트림이 중간에 중단되었습니다.")
+        try:
+            for chunk in fn():
+                call.push(chunk)
+                yield chunk
+            error = None
+        except GeneratorExit:  # 리더가 끝까지 읽지 않음 → 팔로워에게는 중단 오류
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            call.finish(error)
+            self._leave(stage, key, call)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    "leaders": lead,
+                    "followers": follow,
+                    "coalescing_ratio": round(follow / (lead + follow), 3) if lead + follow else 0.0,
+                }
+                for stage, (lead, follow) in self._counts.items()
+            }
+            in_flight = len(self._calls)
+        leaders = sum(s["leaders"] for s in stages.values())
+        followers = sum(s["followers"] for s in stages.values())
+        return {
+            "leaders": leaders,
+            "followers": followers,
+            "coalescing_ratio": round(followers / (leaders + followers), 3) if leaders + followers else 0.0,
+            "in_flight": in_flight,
+            "stages": stages,
+        }
@@ -0,0 +1,95 @@
+# sql_agent.py — LangChain SQL 에이전트 구성 (Streamlit 비의존: 앱/배치가 같은 프롬프트를 쓴다)
+# LangChain 은 무거우므로 실제로 에이전트를 만들 때만 import 한다
+from functools import lru_cache
+
+# {table}, {*_col} 은 설정된 테이블/컬럼으로 채운다 (agent_prefix)
+AGENT_PREFIX_TEMPLATE = """
+당신은 PostgreSQL SQL 전문가다. 다음 규칙을 반드시 지켜라. (sql_guard 검증을 통과하지 못한 SQL 은 버려진다)
+
+- 읽기 전용 SELECT 한 문장만 작성한다. WITH(CTE)로 시작해도 되지만 WITH RECURSIVE 는 금지.
+  (INSERT/UPDATE/DELETE/MERGE/ALTER/DROP/CREATE/GRANT/REVOKE/TRUNCATE/COPY/EXPLAIN/SET 등과 FOR UPDATE/SHARE 금지)
+- 결과는 SQL만 내보낸다. 백틱/설명/자연어/코드블록/주석 없이 SQL 한 문장만 출력한다. 세미콜론은 끝에 최대 1개.
+- 대상 테이블: {table} 하나뿐이다 (다른 테이블, pg_*/information_schema 등 시스템 스키마 금지).
+  컬럼: {company_col}(회사명), {ym_col}(결산년월 YYYYMM), {metric_col}(지표), {value_col}(값) — 이 밖의 컬럼은 쓰지 않는다.
+- 함수는 집계/윈도우/수학/문자열/날짜 기본 함수(count, sum, avg, min, max, rank, lag, round, coalesce, to_char 등)만 쓴다.
+- 시계열을 조회할 때는 항상 ORDER BY {ym_col} 을 포함한다.
+- 한국어 질의의 의미를 스스로 판단해 컬럼/값을 매핑한다.
+  예: '매출/수익'→ {metric_col}='revenue', '자산'→ 'assets', '부채'→ 'liabilities', 'K-ICS/킥스'→ 'k_ics'
+- 질문 끝에 [해석된 슬롯]이 있으면 {ym_col}/회사명/{metric_col}은 그 값을 그대로 쓴다. (로컬 파서가 확정한 값)
+- 슬롯이 없으면 회사명({company_col})과 기간을 스스로 추론한다. 날짜는 {ym_col} = YYYYMM (YY년 → 20YY).
+- 행 수 제한은 앱이 하므로 LIMIT 은 질문이 상위 N개를 요구할 때만 정수로 쓴다.
+- SELECT * 대신 필요한 컬럼만 선택하고, where 절에 기간/회사/지표 필터를 상식적으로 건다.
+- 최근 연말로 추정하거나 자동 보정하지 않는다.
+""".strip()
+
+# 설정이 없을 때의 기본 테이블/컬럼 (앱/배치 기본 설정과 같다)
+_DEFAULT_COLUMNS = {
+    "table": "kics_solvency_data_flexible",
+    "company_col": "company_code",
+    "ym_col": "closing_ym",
+    "metric_col": "metric",
+    "value_col": "value",
+}
+
+
+def agent_prefix(spec=None) -> str:
+    # spec: PipelineConfig / TableSpec 등 table, company_col, ym_col, metric_col, value_col 속성이 있는 객체
+    return AGENT_PREFIX_TEMPLATE.format(**{k: getattr(spec, k, None) or v for k, v in _DEFAULT_COLUMNS.items()})
+
+
+AGENT_PREFIX = agent_prefix()
+
+AGENT_SUFFIX = "스키마는 이미 위에 있다. 테이블 목록/스키마를 조회하지 말고 바로 SELECT를 작성하겠다."
+
+
+def build_agent_prefix(schema: str, spec=None) -> str:
+    return f"{agent_prefix(spec)}\n\n아래는 대상 테이블의 스키마와 샘플 행이다. 테이블 목록/스키마 조회 없이 이것만 사용한다.\n{schema}"
+
+
+# ====== LangChain SQL 도구 (create_sql_agent 경로 버전별 대응) ======
+@lru_cache(maxsize=1)
+def langchain_sql():
+    """반환: (SQLDatabase, 쿼리 도구만 남긴 SQLDatabaseToolkit, create_sql_agent)."""
+    from langchain_community.utilities import SQLDatabase
+    try:
+        from langchain_community.agent_toolkits import SQLDatabaseToolkit, create_sql_agent
+    except ImportError:
+        try:
+            from langchain_community.agent_toolkits.sql.base import create_sql_agent
+            from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+        except ImportError:
+            from langchain.agents.agent_toolkits import SQLDatabaseToolkit, create_sql_agent
+
+    # 스키마를 이미 프롬프트에 넣었으므로 목록/스키마/체커 도구는 빼고 쿼리 도구만 남긴다
+    class _QueryOnlyToolkit(SQLDatabaseToolkit):
+        def get_tools(self):
+            return [t for t in super().get_tools() if t.name == "sql_db_query"]
+
+    return SQLDatabase, _QueryOnlyToolkit, create_sql_agent
+# ====================================
+
+
+def make_lc_db(engine, table: str):
+    # 대상 테이블만 리플렉션 + 샘플 3행 (스냅샷에 포함)
+    SQLDatabase, _, _ = langchain_sql()
+    return SQLDatabase(engine, include_tables=[table], sample_rows_in_table_info=3)
+
+
+def make_llm(api_key: str, model: str = "gpt-4o-mini", http_client=None, base_url: str = None, timeout_s: float = None):
+    # http_client: llm_gateway.LLMGateway.http_client() — 재시도는 게이트웨이가 하므로 SDK 재시도는 끈다
+    from langchain_openai import ChatOpenAI
+    kwargs = {"http_client": http_client, "max_retries": 0} if http_client is not None else {}
+    return ChatOpenAI(model=model, temperature=0, api_key=api_key, base_url=base_url, timeout=timeout_s, **kwargs)
+
+
+def build_sql_agent(llm, lc_db, schema: str, spec=None):
+    _, QueryOnlyToolkit, create_sql_agent = langchain_sql()
+    return create_sql_agent(
+        llm=llm,
+        toolkit=QueryOnlyToolkit(db=lc_db, llm=llm),
+        agent_type="openai-tools",
+        verbose=False,
+        # create_sql_agent 가 prefix.format() 을 호출하므로 샘플 행의 중괄호를 이스케이프
+        prefix=build_agent_prefix(schema, spec).replace("{", "{{").replace("}", "}}"),
+        suffix=AGENT_SUFFIX,
+    )
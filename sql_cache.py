@@ -0,0 +1,135 @@
+# sql_cache.py — 질문 → 검증된 SELECT 시맨틱 캐시 (SQLite 영속 + TTL/LRU)
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from question_parser import parse_question_template
+
+_PLACEHOLDER = re.compile(r"\{(closing_ym|company)_(\d+)\}")
+_WORD = r"A-Za-z0-9가-힣"
+
+
+def _dedupe(values):
+    return list(dict.fromkeys(values))
+
+
+def templatize_sql(sql: str, params: dict):
+    """SQL 안의 결산년월/회사명 리터럴을 자리표시자로 바꾼다. 모든 값이 SQL에 있어야 성공."""
+    template = sql
+    for kind in ("company", "closing_ym"):
+        values = _dedupe(params.get(kind, []))
+        # 긴 값부터 치환해야 'KDB생명' / 'DB생명' 같은 부분 일치를 피한다
+        for i, value in sorted(enumerate(values), key=lambda iv: -len(iv[1])):
+            pattern = re.compile(rf"(?<![{_WORD}]){re.escape(value)}(?![{_WORD}])")
+            template, n = pattern.subn(f"{{{kind}_{i}}}", template)
+            if n == 0:
+                return None
+    return template
+
+
+def render_sql(template: str, params: dict) -> str:
+    values = {kind: _dedupe(params.get(kind, [])) for kind in ("closing_ym", "company")}
+
+    def _sub(m):
+        v = values[m.group(1)][int(m.group(2))]
+        return v.replace("'", "''") if m.group(1) == "company" else v
+
+    return _PLACEHOLDER.sub(_sub, template)
+
+
+def _arity(params: dict) -> str:
+    return f"ym{len(_dedupe(params['closing_ym']))}_co{len(_dedupe(params['company']))}"
+
+
+class SQLCache:
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 500):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.template_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key        TEXT PRIMARY KEY,
+                sql        TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    # 정확 일치 키: 슬롯 값까지 포함 / 템플릿 키: 슬롯 개수만 포함
+    @staticmethod
+    def _keys(question: str):
+        key, params = parse_question_template(question)
+        exact = f"exact|{key}|{json.dumps(params, ensure_ascii=False, sort_keys=True)}"
+        template = f"tmpl|{_arity(params)}|{key}"
+        return exact, template, params
+
+    def get(self, question: str):
+        exact, template, params = self._keys(question)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            for key in (exact, template):
+                row = self._conn.execute("SELECT sql FROM sql_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    if key == template:
+                        self.template_hits += 1
+                        return render_sql(row[0], params)
+                    return row[0]
+            self._conn.commit()
+            self.misses += 1
+        return None
+
+    def put(self, question: str, sql: str):
+        exact, template, params = self._keys(question)
+        now = time.time()
+        rows = [(exact, sql, now, now)]
+        tmpl_sql = templatize_sql(sql, params)
+        if tmpl_sql is not None and (params["closing_ym"] or params["company"]):
+            rows.append((template, tmpl_sql, now, now))
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?)", rows)
+            # LRU: 가장 오래 사용되지 않은 항목부터 정리
+            self._conn.execute(
+                """
+                DELETE FROM sql_cache WHERE key IN (
+                    SELECT key FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "template_hits": self.template_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size,
+        }
@@ -0,0 +1,209 @@
+# sql_engine.py — 단일 호출(structured output) SQL 생성 엔진 + 엔진별 지표
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from question_parser import COMPANY_NAMES, format_slot_hints, parse_local_slots
+
+
+class SlotParseError(ValueError):
+    pass
+
+
+class TableSpec(NamedTuple):
+    table: str
+    company_col: str
+    ym_col: str
+    metric_col: str
+    value_col: str
+    ym_numeric: bool      # closing_ym 이 정수형이면 따옴표 없이 비교
+    metrics: tuple        # DB에 실제로 있는 metric 값 목록
+
+
+SLOT_PROMPT = """
+너는 보험사 경영공시 질의를 슬롯으로 분해하는 파서다.
+질문에서 회사명, 결산년월(closing_ym, YYYYMM) 범위, 지표(metric)를 뽑아 JSON으로만 답한다.
+- 회사명은 주어진 목록에서만 고른다. 회사 언급이 없으면 빈 배열.
+- [사전 추출 슬롯]이 주어지면 그 값은 확정값이므로 그대로 쓴다.
+- 날짜는 YYYYMM 으로 변환한다 (YY는 20YY).
+- 단일 시점이면 closing_ym_from = closing_ym_to. 기간이 없으면 둘 다 null.
+- 최근 연말로 추정하거나 자동 보정하지 않는다.
+- 지표는 주어진 목록에서만 고른다. 예: '매출/수익'→'revenue', '자산'→'assets', '부채'→'liabilities', 'K-ICS/킥스'→'k_ics'
+- 이 형식으로 표현할 수 없는 질문(순위, 계산식, 조건 비교 등)이면 parsable=false.
+""".strip()
+
+
+def slot_json_schema(metrics) -> dict:
+    # 빈 enum 은 strict json_schema 로 받아주지 않아 API 호출 자체가 실패한다 → 호출 전에 에이전트로 폴백
+    if not metrics:
+        raise SlotParseError("DB 에 metric 값이 없어 슬롯 스키마를 만들 수 없습니다.")
+    ym = {"type": ["string", "null"]}  # YYYYMM — 형식 검증은 parse_slots 에서
+    return {
+        "name": "kics_slots",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["parsable", "companies", "closing_ym_from", "closing_ym_to", "metrics"],
+            "properties": {
+                "parsable": {"type": "boolean"},
+                "companies": {"type": "array", "items": {"type": "string", "enum": COMPANY_NAMES}},
+                "closing_ym_from": ym,
+                "closing_ym_to": ym,
+                "metrics": {"type": "array", "items": {"type": "string", "enum": list(metrics)}},
+            },
+        },
+    }
+
+
+def parse_slots(raw: dict, spec: TableSpec) -> dict:
+    if not raw.get("parsable"):
+        raise SlotParseError("질문을 슬롯으로 표현할 수 없습니다.")
+    metrics = [m for m in dict.fromkeys(raw.get("metrics") or []) if m in spec.metrics]
+    if not metrics:
+        raise SlotParseError("지표(metric)를 찾지 못했습니다.")
+    companies = [c for c in dict.fromkeys(raw.get("companies") or []) if c in COMPANY_NAMES]
+
+    ym_from, ym_to = raw.get("closing_ym_from"), raw.get("closing_ym_to")
+    ym_from, ym_to = ym_from or ym_to, ym_to or ym_from
+    for ym in (ym_from, ym_to):
+        if ym is not None and not (len(ym) == 6 and ym.isdigit()):
+            raise SlotParseError(f"잘못된 결산년월: {ym}")
+    if ym_from and ym_from > ym_to:
+        ym_from, ym_to = ym_to, ym_from
+
+    return {"companies": companies, "closing_ym_from": ym_from, "closing_ym_to": ym_to, "metrics": metrics}
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def build_select(slots: dict, spec: TableSpec) -> str:
+    # LIMIT 은 붙이지 않는다 — 행 제한은 fetch_bounded 의 max_rows(+1 행으로 잘림 확인)가 맡는다.
+    # 오름차순 정렬에 고정 LIMIT 을 걸면 기간 없는 추이 질문이 가장 오래된 분기만 받고도 잘림 표시가 없다.
+    ym = (lambda v: v) if spec.ym_numeric else _quote
+    where = [f"{spec.metric_col} IN ({', '.join(_quote(m) for m in slots['metrics'])})"]
+    if slots["companies"]:
+        where.append(f"{spec.company_col} IN ({', '.join(_quote(c) for c in slots['companies'])})")
+    if slots["closing_ym_from"]:
+        if slots["closing_ym_from"] == slots["closing_ym_to"]:
+            where.append(f"{spec.ym_col} = {ym(slots['closing_ym_from'])}")
+        else:
+            where.append(f"{spec.ym_col} BETWEEN {ym(slots['closing_ym_from'])} AND {ym(slots['closing_ym_to'])}")
+
+    return (
+        f"SELECT {spec.company_col}, {spec.ym_col}, {spec.metric_col}, {spec.value_col} "
+        f"FROM {spec.table} "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY {spec.ym_col}, {spec.company_col}, {spec.metric_col}"
+    )
+
+
+_LITERAL = r"'(?:[^']|'')*'"
+_YM_LITERAL = r"\d{6}|'\d{6}'"
+
+
+def _unquote_list(text: str) -> list:
+    return [v[1:-1].replace("''", "'") for v in re.findall(_LITERAL, text)]
+
+
+def parse_select(sql: str, spec: TableSpec):
+    """build_select 가 만든 모양의 SQL 이면 슬롯(+ limit)으로 되돌린다. 아니면 None.
+
+    limit 은 SQL 캐시 등에 남은 예전 모양(끝에 LIMIT n)일 때만 값이 있고, 없으면 None.
+    """
+    c, y, m, v = (re.escape(x) for x in (spec.company_col, spec.ym_col, spec.metric_col, spec.value_col))
+    pattern = (
+        rf"SELECT {c}, {y}, {m}, {v} FROM {re.escape(spec.table)} "
+        rf"WHERE {m} IN \((?P<metrics>{_LITERAL}(?:, {_LITERAL})*)\)"
+        rf"(?: AND {c} IN \((?P<companies>{_LITERAL}(?:, {_LITERAL})*)\))?"
+        rf"(?: AND {y} (?:= (?P<eq>{_YM_LITERAL})|BETWEEN (?P<lo>{_YM_LITERAL}) AND (?P<hi>{_YM_LITERAL})))? "
+        rf"ORDER BY {y}, {c}, {m}(?: LIMIT (?P<limit>\d+))?"
+    )
+    match = re.fullmatch(pattern, re.sub(r"\s+", " ", sql.strip().rstrip(";").strip()))
+    if not match:
+        return None
+    ym_from = (match["eq"] or match["lo"] or "").strip("'") or None
+    ym_to = (match["eq"] or match["hi"] or "").strip("'") or None
+    return {
+        "metrics": _unquote_list(match["metrics"]),
+        "companies": _unquote_list(match["companies"] or ""),
+        "closing_ym_from": ym_from,
+        "closing_ym_to": ym_to,
+        "limit": int(match["limit"]) if match["limit"] else None,
+    }
+
+
+def rule_based_sql(question: str, spec: TableSpec):
+    # 슬롯만으로 완전히 표현되는 질문은 LLM 호출 없이 바로 조립 (아니면 None)
+    local = parse_local_slots(question, spec.metrics)
+    if not local["complete"]:
+        return None
+    return build_select(parse_slots({"parsable": True, **local}, spec), spec)
+
+
+def extract_slots(client, question: str, spec: TableSpec, model: str = "gpt-4o-mini") -> dict:
+    hints = format_slot_hints(parse_local_slots(question, spec.metrics))
+    user = f"{question}\n[사전 추출 슬롯] {hints}" if hints else question
+    r = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SLOT_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        response_format={"type": "json_schema", "json_schema": slot_json_schema(spec.metrics)},
+        temperature=0,
+    )
+    try:
+        raw = json.loads(r.choices[0].message.content or "")
+    except json.JSONDecodeError as e:
+        raise SlotParseError(f"슬롯 JSON 파싱 실패: {e}") from e
+    return parse_slots(raw, spec)
+
+
+def generate_sql_single_shot(client, question: str, spec: TableSpec, model: str = "gpt-4o-mini") -> str:
+    return build_select(extract_slots(client, question, spec, model=model), spec)
+
+
+# ----------------- 엔진별 지연시간 / 폴백률 -----------------
+class EngineStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}     # engine -> [count, total_s, max_s]
+        self.attempts = 0     # single_shot 시도 수
+        self.fallbacks = 0    # single_shot → agent 폴백 수
+
+    def record(self, engine: str, seconds: float):
+        with self._lock:
+            n, total, mx = self.latency.get(engine, (0, 0.0, 0.0))
+            self.latency[engine] = (n + 1, total + seconds, max(mx, seconds))
+
+    def record_attempt(self, fell_back: bool):
+        with self._lock:
+            self.attempts += 1
+            self.fallbacks += int(fell_back)
+
+    @contextmanager
+    def timed(self, engine: str):
+        # 실패해서 폴백한 시도도 그 엔진의 지연시간에 넣는다
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(engine, time.perf_counter() - t0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "engines": {
+                    e: {"count": n, "avg_s": round(total / n, 3), "max_s": round(mx, 3)}
+                    for e, (n, total, mx) in self.latency.items()
+                },
+                "fallback_rate": round(self.fallbacks / self.attempts, 3) if self.attempts else 0.0,
+                "fallbacks": self.fallbacks,
+                "attempts": self.attempts,
+            }
@@ -0,0 +1,419 @@
+# sql_guard.py — LLM 이 만든 SQL 의 토크나이저 기반 검증 (읽기 전용 SELECT + 테이블/컬럼/함수 허용 목록 + LIMIT 정규화)
+import re
+from typing import NamedTuple
+
+
+class SQLGuardError(ValueError):
+    pass
+
+
+class Token(NamedTuple):
+    kind: str     # word / qident / str / num / op / punct
+    value: str    # word 는 소문자, qident 는 따옴표를 벗긴 원래 이름
+    start: int
+    end: int
+
+
+# 공백/주석은 토큰으로 내지 않는다. 리터럴과 따옴표 식별자는 통째로 한 토큰 → 안의 단어는 검사 대상이 아님
+_LEXER = re.compile(
+    r"""
+      (?P<ws>\s+)
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*.*?\*/)
+    | (?P<estr>[eE]'(?:[^'\\]|\\.|'')*')
+    | (?P<str>(?:[bBxXnN])?'(?:[^']|'')*')
+    | (?P<qident>"(?:[^"]|"")+")
+    | (?P<num>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<word>[^\W\d]\w*)
+    | (?P<cast>::)
+    | (?P<open_comment>/\*)
+    | (?P<op>(?:(?!--|/\*)[+\-*/%^<>=!~|&#@?])+)
+    | (?P<punct>[(),;.\[\]])
+    | (?P<bad>.)
+    """,
+    re.S | re.X,
+)
+
+# U&'..' / U&".." — 유니코드 이스케이프로 키워드/이름을 숨길 수 있으므로 거부
+_UNICODE_ESCAPE = re.compile(r"[uU]&['\"]")
+
+
+def tokenize(sql: str, stop_at_semicolon: bool = False) -> list:
+    """주석/공백을 건너뛰고 토큰 목록을 돌려준다. 닫히지 않은 리터럴/주석, 달러 인용, 역슬래시 명령은 거부."""
+    tokens = []
+    append = tokens.append
+    for m in _LEXER.finditer(sql):
+        kind = m.lastgroup
+        if kind == "ws" or kind == "line_comment":
+            continue
+        text = m.group()
+        start, end = m.span()
+        if kind == "word":
+            if text[0] in "uU" and _UNICODE_ESCAPE.match(sql, start):
+                raise SQLGuardError("Unicode escape strings are not allowed.")
+            append(Token("word", text.lower(), start, end))
+        elif kind == "punct" or kind == "op" or kind == "num":
+            append(Token(kind, text, start, end))
+            if stop_at_semicolon and text == ";":
+                break
+        elif kind == "str" or kind == "estr":
+            append(Token("str", text, start, end))
+        elif kind == "qident":
+            append(Token("qident", text[1:-1].replace('""', '"'), start, end))
+        elif kind == "cast":
+            append(Token("op", "::", start, end))
+        elif kind == "block_comment":
+            if "/*" in text[2:]:
+                raise SQLGuardError("Nested comments are not allowed.")
+        elif text in "'\"":
+            raise SQLGuardError("Unterminated quoted literal.")
+        elif kind == "open_comment":
+            raise SQLGuardError("Unterminated comment.")
+        else:
+            raise SQLGuardError(f"Unexpected character {text!r} in SQL.")
+    return tokens
+
+
+# ----------------- 허용/차단 목록 -----------------
+KEYWORDS = frozenset("""
+    select from where group by having order asc desc nulls first last limit offset fetch next rows row only
+    as on join inner left right full outer cross natural using and or not in is null true false like ilike
+    similar escape between symmetric case when then else end distinct all any some exists union intersect except
+    with over partition range groups preceding following unbounded current filter within window lateral
+    cast extract interval date time timestamp zone at year quarter month week day hour minute second epoch dow doy
+    collate materialized values to for percent ties array
+    current_date current_time current_timestamp localtime localtimestamp
+""".split())
+
+# 쓰기/세션/권한 변경 — 리터럴이나 따옴표 식별자 밖에서 나오면 거부
+BANNED = frozenset("""
+    insert update delete merge upsert drop alter create grant revoke truncate copy into explain analyze
+    vacuum call do execute prepare deallocate lock unlisten listen notify set reset show begin commit rollback
+    savepoint release refresh comment security load import discard cluster reindex checkpoint attach detach pragma
+    recursive operator
+""".split())
+
+FUNCTIONS = frozenset("""
+    count sum avg min max stddev stddev_pop stddev_samp variance var_pop var_samp string_agg array_agg bool_and
+    bool_or every percentile_cont percentile_disc mode corr covar_pop covar_samp regr_slope regr_intercept
+    row_number rank dense_rank ntile lag lead first_value last_value nth_value percent_rank cume_dist
+    abs round trunc floor ceil ceiling power sqrt cbrt exp ln log log10 sign mod div greatest least
+    coalesce nullif cast extract date_part date_trunc to_char to_date to_number to_timestamp make_date age
+    lower upper trim btrim ltrim rtrim length char_length substring substr left right replace concat concat_ws
+    lpad rpad split_part position strpos starts_with unnest
+""".split())
+
+TYPES = frozenset("""
+    int integer bigint smallint numeric decimal real float double precision text varchar char character varying
+    boolean bool date timestamp timestamptz
+""".split())
+
+# 괄호 안에서 FROM 을 인자 구분자로 쓰는 함수 (EXTRACT(YEAR FROM x) 등) — 테이블 절이 아님
+_FROM_ARG_FUNCTIONS = frozenset(("extract", "substring", "trim", "overlay", "position"))
+# 이 단어 다음의 이름은 새로 선언하는 별칭
+_ALIAS_INTRODUCERS = frozenset(("as", "window", "over"))
+# 이 토큰으로 끝나면 값 — 바로 뒤의 (키워드가 아닌) 단어는 AS 없는 별칭
+_VALUE_END_WORDS = frozenset((
+    "end", "null", "true", "false", "current_date", "current_time", "current_timestamp", "localtime", "localtimestamp",
+))
+_FROM_CLAUSE_END = frozenset((
+    "select", "where", "group", "having", "order", "limit", "offset", "fetch", "union", "intersect", "except", "window",
+))
+_SYSTEM_PREFIXES = ("pg_", "information_schema", "sqlite_")
+
+
+class Allowlist(NamedTuple):
+    tables: frozenset             # 조회 가능한 테이블 (소문자)
+    columns: frozenset            # 참조 가능한 컬럼 (소문자)
+    functions: frozenset = FUNCTIONS
+    schemas: frozenset = frozenset(("public",))
+
+
+def allowlist_for(table: str, columns) -> Allowlist:
+    return Allowlist(tables=frozenset((table.lower(),)), columns=frozenset(c.lower() for c in columns))
+
+
+# ----------------- 추출 -----------------
+_FENCED = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.S)
+_START = re.compile(r"(?is)\bselect\b|\bwith\s+[^\W\d]\w*\s+as\s*\(")
+
+
+def _strip_code_fences(text: str) -> str:
+    t = text.strip()
+    m = _FENCED.search(t)
+    if m:
+        return m.group(1).strip()
+    t = re.sub(r"^```[a-zA-Z]*\s*", "", t)
+    t = re.sub(r"\s*```$", "", t)
+    return t.strip()
+
+
+def extract_select(text: str) -> str:
+    """에이전트 출력(설명문/코드 블록 포함)에서 첫 SELECT(또는 WITH ... AS ( ) 문장만 잘라낸다."""
+    cleaned = _strip_code_fences(text)
+    m = _START.search(cleaned)
+    if not m:
+        return cleaned
+    tail = cleaned[m.start():]
+    try:
+        tokens = tokenize(tail, stop_at_semicolon=True)
+    except SQLGuardError:  # 뒤쪽 설명문의 따옴표 등 — 검증 단계에서 다시 판단
+        return tail.strip()
+    if tokens and tokens[-1].value == ";":
+        return tail[:tokens[-1].start].strip()
+    return tail.strip()
+
+
+# ----------------- 검증 -----------------
+class _Frame:
+    __slots__ = ("opener", "in_from", "expect_table", "alias_list")
+
+    def __init__(self, opener=None, alias_list=False):
+        self.opener = opener          # 여는 괄호 바로 앞 단어 (함수명/키워드)
+        self.in_from = False          # FROM 목록 안 (쉼표 뒤가 테이블)
+        self.expect_table = False     # 다음 단어가 테이블 이름
+        self.alias_list = alias_list  # 별칭 뒤 컬럼 목록 — 안의 단어는 선언
+
+
+def _cte_names(tokens) -> tuple:
+    # WITH name [(col, ...)] AS [NOT] [MATERIALIZED] ( ... ) [, ...] — 반환: (CTE 이름 집합, 이름/컬럼 토큰 위치)
+    names, marked = set(), set()
+    n = len(tokens)
+    for i, t in enumerate(tokens):
+        if not (t.kind == "word" and t.value == "with" and (i == 0 or tokens[i - 1].value == "(")):
+            continue
+        j = i + 1
+        while j < n and tokens[j].kind in ("word", "qident"):
+            names.add(tokens[j].value.lower())
+            marked.add(j)
+            j += 1
+            if j < n and tokens[j].value == "(":
+                j += 1
+                while j < n and tokens[j].value != ")":
+                    marked.add(j)
+                    j += 1
+                j += 1
+            while j < n and tokens[j].kind == "word" and tokens[j].value in ("as", "not", "materialized"):
+                j += 1
+            if j >= n or tokens[j].value != "(":
+                break
+            depth = 0
+            while j < n:
+                depth += {"(": 1, ")": -1}.get(tokens[j].value, 0) if tokens[j].kind == "punct" else 0
+                j += 1
+                if depth == 0:
+                    break
+            if j < n and tokens[j].value == ",":
+                j += 1
+            else:
+                break
+    return names, marked
+
+
+def _is_value_end(t: Token) -> bool:
+    if t.kind in ("qident", "str", "num"):
+        return True
+    if t.kind == "punct":
+        return t.value == ")"
+    return t.kind == "word" and (t.value not in KEYWORDS or t.value in _VALUE_END_WORDS)
+
+
+def _check(tokens, allow: Allowlist):
+    first = next((t for t in tokens if t.value != "("), None)
+    if first is None or first.kind != "word" or first.value not in ("select", "with"):
+        raise SQLGuardError("Only SELECT queries are allowed.")
+    ctes, marked = _cte_names(tokens)
+    functions = allow.functions if allow else FUNCTIONS
+    declared = set(ctes)
+    refs, quals = [], []
+    stack = [_Frame()]
+    n = len(tokens)
+
+    for i, t in enumerate(tokens):
+        prev = tokens[i - 1] if i else None
+        nxt = tokens[i + 1] if i + 1 < n else None
+        frame = stack[-1]
+
+        if t.kind == "punct":
+            if t.value == "(":
+                opener = prev.value if prev is not None and prev.kind in ("word", "qident") else None
+                alias_list = (frame.in_from and prev is not None and prev.kind in ("word", "qident")
+                              and prev.value.lower() in declared)
+                frame.expect_table = False
+                stack.append(_Frame(opener, alias_list))
+            elif t.value == ")":
+                if len(stack) == 1:
+                    raise SQLGuardError("Unbalanced parentheses.")
+                stack.pop()
+            elif t.value == ";":
+                raise SQLGuardError("Multiple statements are not allowed.")
+            elif t.value == "," and frame.in_from:
+                frame.expect_table = True
+            continue
+        if t.kind not in ("word", "qident"):
+            continue
+
+        w = t.value
+        key = w.lower()
+        if t.kind == "word" and w in BANNED:
+            raise SQLGuardError(f"Blocked SQL keyword detected: {w.upper()}")
+        if i in marked:  # CTE 이름/컬럼 목록
+            declared.add(key)
+            continue
+        if frame.alias_list:
+            declared.add(key)
+            continue
+
+        if t.kind == "word" and w in KEYWORDS and not (nxt is not None and nxt.value == "(" and w in functions):
+            if prev is not None and prev.kind == "word" and prev.value == "as":
+                declared.add(key)  # AS year 처럼 키워드 모양 별칭
+            elif w == "from":
+                is_distinct_from = (prev is not None and prev.value == "distinct"
+                                    and i >= 2 and tokens[i - 2].value in ("is", "not"))
+                if frame.opener not in _FROM_ARG_FUNCTIONS and not is_distinct_from:
+                    frame.in_from = frame.expect_table = True
+            elif w == "join":
+                frame.in_from = frame.expect_table = True
+            elif w in _FROM_CLAUSE_END:
+                frame.in_from = frame.expect_table = False
+            elif w == "for" and nxt is not None and nxt.value in ("share", "key", "no", "update"):
+                raise SQLGuardError("Row locking clauses are not allowed.")
+            continue
+
+        if prev is not None and prev.kind == "op" and prev.value == "::":
+            if key not in TYPES:
+                raise SQLGuardError(f"Type not allowed: {w}")
+            continue
+        if prev is not None and prev.kind == "word" and prev.value in _ALIAS_INTRODUCERS:
+            declared.add(key)
+            continue
+
+        if frame.expect_table:
+            if nxt is not None and nxt.value == "(":
+                if key not in functions:
+                    raise SQLGuardError(f"Function not allowed: {w}")
+            elif nxt is not None and nxt.value == ".":
+                if key.startswith(_SYSTEM_PREFIXES) or (allow and key not in allow.schemas):
+                    raise SQLGuardError(f"Schema not allowed: {w}")
+                continue  # 다음 단어(테이블)도 테이블 자리
+            else:
+                _check_table(key, ctes, allow)
+                declared.add(key)
+                frame.expect_table = False
+            continue
+
+        if nxt is not None and nxt.value == "(" and not (frame.in_from and _is_alias_position(prev)):
+            if key not in functions:
+                raise SQLGuardError(f"Function not allowed: {w}")
+            continue
+        if nxt is not None and nxt.value == ".":
+            quals.append(key)
+            continue
+        if prev is not None and prev.value != "." and _is_value_end(prev):
+            declared.add(key)  # AS 없는 별칭
+            continue
+        refs.append((w, t.kind == "qident"))
+
+    if len(stack) != 1:
+        raise SQLGuardError("Unbalanced parentheses.")
+    if allow is None:
+        return
+    tables = allow.tables | ctes
+    for q in quals:
+        if q not in declared and q not in tables and q not in allow.schemas:
+            raise SQLGuardError(f"Unknown table or alias: {q}")
+    for name, quoted in refs:
+        if (name if quoted else name.lower()) in allow.columns or name.lower() in declared:
+            continue
+        raise SQLGuardError(f"Column not allowed: {name}")
+
+
+def _is_alias_position(prev) -> bool:
+    # FROM 절의 ") alias(" / "table alias(" — 별칭 뒤 컬럼 목록이지 함수 호출이 아님
+    return prev is not None and (prev.value == ")" or (prev.kind in ("word", "qident") and prev.value not in KEYWORDS))
+
+
+def _check_table(name: str, ctes, allow):
+    if name.startswith(_SYSTEM_PREFIXES):
+        raise SQLGuardError(f"Table not allowed: {name}")
+    if allow is not None and name not in allow.tables and name not in ctes:
+        raise SQLGuardError(f"Table not allowed: {name}")
+
+
+# ----------------- LIMIT 정규화 -----------------
+def _paging_tail(tokens) -> tuple:
+    """
+    최상위 LIMIT/OFFSET/FETCH 절을 읽어 (시작 토큰 위치, limit, offset) 를 돌려준다. 없으면 (None, None, None).
+    값은 정수 리터럴만 허용 (서브쿼리/식은 거부).
+    """
+    depth, start = 0, None
+    for i, t in enumerate(tokens):
+        if t.kind == "punct" and t.value in "()":
+            depth += 1 if t.value == "(" else -1
+        elif depth == 0 and t.kind == "word" and t.value in ("limit", "offset", "fetch"):
+            start = i
+            break
+    if start is None:
+        return None, None, None
+
+    limit = offset = None
+    i, n = start, len(tokens)
+
+    def _int(j):
+        if j >= n or tokens[j].kind != "num" or not tokens[j].value.isdigit():
+            raise SQLGuardError("LIMIT/OFFSET must be an integer literal.")
+        return int(tokens[j].value)
+
+    while i < n:
+        w = tokens[i].value
+        if w == "limit":
+            if i + 1 < n and tokens[i + 1].value == "all":
+                i += 2
+            else:
+                limit, i = _int(i + 1), i + 2
+        elif w == "offset":
+            offset, i = _int(i + 1), i + 2
+            if i < n and tokens[i].value in ("row", "rows"):
+                i += 1
+        elif w == "fetch":
+            if i + 1 >= n or tokens[i + 1].value not in ("first", "next"):
+                raise SQLGuardError("Unsupported FETCH clause.")
+            i += 2
+            if i < n and tokens[i].kind == "num":
+                limit, i = _int(i), i + 1
+            else:
+                limit = 1
+            words = [t.value for t in tokens[i:i + 2]]
+            if words != ["rows", "only"] and words != ["row", "only"]:
+                raise SQLGuardError("Unsupported FETCH clause.")
+            i += 2
+        else:
+            raise SQLGuardError(f"Unexpected token after LIMIT: {tokens[i].value}")
+    return start, limit, offset
+
+
+def validate_select(sql: str, allow: Allowlist = None) -> str:
+    """
+    읽기 전용 단일 SELECT 인지 확인하고 정규화된 SQL 을 돌려준다 (주석·끝 세미콜론 제거,
+    최상위 LIMIT/OFFSET/FETCH → 끝의 "LIMIT n [OFFSET m]" 하나로). allow 가 있으면 테이블/컬럼도 검사.
+    """
+    tokens = tokenize(sql)
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    _check(tokens, allow)
+
+    start, limit, offset = _paging_tail(tokens)
+    body_tokens = tokens if start is None else tokens[:start]
+    # 원문 간격은 살리고 주석만 뺀다
+    parts, last = [], body_tokens[0].start
+    for t in body_tokens:
+        gap = sql[last:t.start]
+        parts.append((" " if "\n" not in gap else "\n") if gap and not gap.isspace() else gap)
+        parts.append(sql[t.start:t.end])
+        last = t.end
+    body = "".join(parts).strip()
+    if limit is not None:
+        body += f" LIMIT {limit}"
+    if offset:
+        body += f" OFFSET {offset}"
+    return body
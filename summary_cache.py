@@ -0,0 +1,87 @@
+# summary_cache.py — (정규화 질문, 결과 지문) → 요약 캐시 (SQLite 영속 + TTL)
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from question_parser import normalize_question
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    # 컬럼명 + 행 단위 값 해시 → 내용이 같으면 같은 지문
+    # (결과 캐시의 Parquet 왕복으로 dtype 표기만 바뀌는 경우도 같은 지문이 되도록 dtype 은 제외)
+    h = hashlib.sha256()
+    h.update(repr([str(c) for c in df.columns]).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:  # 해시 불가 객체(리스트 등)가 섞인 경우
+        h.update(df.to_csv(index=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, namespace: str = ""):
+        # namespace: 요약 설정(모델/토큰 예산/프롬프트) 지문 — 설정이 바뀌면 예전 요약은 키가 달라져 안 쓰인다
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summary_cache (
+                key        TEXT PRIMARY KEY,
+                summary    TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _key(self, question: str, df: pd.DataFrame) -> str:
+        raw = f"{self.namespace}|{normalize_question(question)}|{frame_fingerprint(df)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, df: pd.DataFrame):
+        key = self._key(question, df)
+        with self._lock:
+            self._conn.execute("DELETE FROM summary_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+            row = self._conn.execute("SELECT summary FROM summary_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        return None
+
+    def put(self, question: str, df: pd.DataFrame, summary: str):
+        if not summary:
+            return
+        key = self._key(question, df)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO summary_cache VALUES (?, ?, ?)", (key, summary, time.time()))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM summary_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM summary_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size,
+        }
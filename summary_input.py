@@ -0,0 +1,171 @@
+# summary_input.py — 요약 프롬프트용 입력 생성 (로컬 집계 + 제한된 샘플, 토큰 예산)
+import re
+
+import numpy as np
+import pandas as pd
+
+_ENC = None
+
+# 결산년월 컬럼: 설정된 ym_col 이 있으면 그 이름, 없으면 이름 전체가 아래 중 하나 (부분 일치 아님 — 'payment_ym_amt' 등 제외)
+_YM_COL = re.compile(r"(closing_ym|ym|yyyymm|date|month|기간|년월|결산년월)", re.I)
+_CAT_COL = re.compile(r"(name|company|code|보험|사명|회사)", re.I)
+_METRIC_COL = re.compile(r"^(metric|지표|항목)$", re.I)
+
+
+def _encoder():
+    global _ENC
+    if _ENC is None:
+        try:
+            import tiktoken
+            _ENC = tiktoken.get_encoding("o200k_base")
+        except Exception:  # tiktoken 미설치/인코딩 다운로드 실패 시 근사치 사용
+            _ENC = False
+    return _ENC
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoder()
+    if enc:
+        return len(enc.encode(text))
+    # 한글 위주 텍스트 근사: 약 2자당 1토큰
+    return max(1, len(text) // 2)
+
+
+def infer_roles(df: pd.DataFrame, ym_col: str = "closing_ym") -> dict:
+    cols = list(df.columns)
+    numeric = {c for c in cols if pd.api.types.is_numeric_dtype(df[c])}
+    ym = next((c for c in cols if str(c).lower() == ym_col.lower()), None) if ym_col else None
+    ym = ym or next((c for c in cols if _YM_COL.fullmatch(str(c))), None)
+    metric = next((c for c in cols if _METRIC_COL.search(str(c)) and c not in numeric), None)
+    others = [c for c in cols if c not in (ym, metric) and c not in numeric]
+    # 이름으로 못 알아보면 첫 번째 비수치 컬럼을 회사(범주) 컬럼으로 본다 (예: insurer)
+    category = next((c for c in others if _CAT_COL.search(str(c))), others[0] if others else None)
+    values = [c for c in cols if c not in (ym, metric) and c in numeric]
+    return {"ym": ym, "metric": metric, "category": category, "values": values}
+
+
+def _fmt(v) -> str:
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return "-"
+    if isinstance(v, (int, np.integer)):
+        return str(int(v))
+    return f"{float(v):,.4g}" if abs(float(v)) < 1e4 else f"{float(v):,.0f}"
+
+
+def _yoy(s: pd.Series):
+    # s: closing_ym(YYYYMM 정수) 인덱스의 시계열 → 마지막 시점의 전년 동월 대비 변화율(%)
+    if s.empty:
+        return None
+    # 같은 결산년월이 여러 행이면 (중복 적재 등) 마지막 값만 — 아니면 s.get 이 Series 를 돌려준다
+    s = s[~s.index.duplicated(keep="last")]
+    last_ym = s.index[-1]
+    try:
+        prev = s.get(int(last_ym) - 100)
+    except (TypeError, ValueError):
+        return None
+    if prev is None or prev == 0 or pd.isna(prev):
+        return None
+    return (s.iloc[-1] - prev) / abs(prev) * 100
+
+
+def _to_long(df: pd.DataFrame, roles: dict) -> pd.DataFrame:
+    # (_cat, _ym, _metric, _value) 형태의 long 포맷으로 통일
+    ym, metric, cat = roles["ym"], roles["metric"], roles["category"]
+    base = pd.DataFrame(index=df.index)
+    base["_cat"] = df[cat].astype(str) if cat else ""
+    base["_ym"] = pd.to_numeric(df[ym], errors="coerce") if ym else np.nan
+    if metric:
+        long = base.assign(_metric=df[metric].astype(str), _value=pd.to_numeric(df[roles["values"][0]], errors="coerce"))
+    else:
+        long = pd.concat(
+            [base.assign(_metric=str(c), _value=pd.to_numeric(df[c], errors="coerce")) for c in roles["values"]],
+            ignore_index=True,
+        )
+    return long.dropna(subset=["_value"])
+
+
+def series_aggregates(df: pd.DataFrame, roles: dict) -> pd.DataFrame:
+    long = _to_long(df, roles)
+    has_ym = roles["ym"] is not None
+    rows = []
+    for (cat, metric), g in long.groupby(["_cat", "_metric"], sort=False):
+        if has_ym:
+            g = g.sort_values("_ym")
+        s = pd.Series(g["_value"].to_numpy(dtype=float), index=g["_ym"].to_numpy())
+        vals = s.to_numpy()
+        rows.append({
+            "_cat": cat, "_metric": metric,
+            "n": len(vals),
+            "first": vals[0], "last": vals[-1],
+            "min": vals.min(), "max": vals.max(), "mean": vals.mean(),
+            "from_ym": s.index[0] if has_ym else None, "to_ym": s.index[-1] if has_ym else None,
+            "yoy_pct": _yoy(s) if has_ym else None,
+        })
+    agg = pd.DataFrame(rows)
+
+    # 결산년월마다 지표별 회사 순위 → 시리즈별 처음/마지막/최고 순위
+    if roles["category"] and has_ym and not long.empty:
+        per = long.dropna(subset=["_ym"]).drop_duplicates(["_cat", "_metric", "_ym"], keep="last")
+        per = per.assign(_rank=per.groupby(["_ym", "_metric"])["_value"].rank(ascending=False, method="min"))
+        g = per.sort_values("_ym", kind="stable").groupby(["_cat", "_metric"], sort=False)["_rank"]
+        ranks = pd.DataFrame({"rank_first": g.first(), "rank_latest": g.last(), "rank_best": g.min()}).reset_index()
+        agg = agg.merge(ranks, on=["_cat", "_metric"], how="left")
+    return agg
+
+
+def _agg_lines(agg: pd.DataFrame, roles: dict) -> list:
+    lines = []
+    for r in agg.to_dict("records"):
+        name = " / ".join(v for v in (r["_cat"], r["_metric"]) if v)
+        parts = [f"n={r['n']}", f"처음={_fmt(r['first'])}", f"마지막={_fmt(r['last'])}",
+                 f"최소={_fmt(r['min'])}", f"최대={_fmt(r['max'])}", f"평균={_fmt(r['mean'])}"]
+        if r.get("from_ym") is not None and not pd.isna(r["from_ym"]):
+            parts.insert(0, f"기간={_fmt(int(r['from_ym']))}~{_fmt(int(r['to_ym']))}")
+        if r.get("yoy_pct") is not None:
+            parts.append(f"전년동월대비={r['yoy_pct']:+.1f}%")
+        if r.get("rank_latest") is not None and not pd.isna(r.get("rank_latest")):
+            if r["rank_first"] != r["rank_latest"]:
+                parts.append(f"순위={int(r['rank_first'])}위→{int(r['rank_latest'])}위(최고 {int(r['rank_best'])}위)")
+            else:
+                parts.append(f"최신순위={int(r['rank_latest'])}")
+        lines.append(f"- {name or '전체'}: " + ", ".join(parts))
+    return lines
+
+
+def build_summary_input(df: pd.DataFrame, token_budget: int = 1500, sample_rows: int = 20, ym_col: str = "closing_ym"):
+    """요약 LLM 에 보낼 데이터 블록을 만든다. 반환: (text, info)"""
+    roles = infer_roles(df, ym_col)
+    lines = _agg_lines(series_aggregates(df, roles), roles) if roles["values"] else []
+    sample = df.head(sample_rows)
+
+    def _render(n_lines, n_sample):
+        parts = [f"[결과 개요] 전체 {len(df)}행, 컬럼: {', '.join(map(str, df.columns))}"]
+        if n_lines:
+            parts.append(f"[시리즈별 집계] ({n_lines}/{len(lines)}개)")
+            parts.extend(lines[:n_lines])
+        if n_sample:
+            parts.append(f"[샘플 {n_sample}행 CSV]")
+            parts.append(sample.head(n_sample).to_csv(index=False).strip())
+        return "\n".join(parts)
+
+    # 예산을 넘으면 샘플 → 집계 줄 순으로 줄인다
+    n_lines, n_sample = len(lines), len(sample)
+    text = _render(n_lines, n_sample)
+    while count_tokens(text) > token_budget and (n_sample or n_lines > 1):
+        if n_sample:
+            n_sample = n_sample // 2
+        else:
+            n_lines = max(1, n_lines * 3 // 4)
+        text = _render(n_lines, n_sample)
+
+    info = {
+        "rows": len(df),
+        "series": len(lines),
+        "series_sent": n_lines,
+        "sample_rows_sent": n_sample,
+        "input_tokens": count_tokens(text),
+        # 전체 CSV 를 보냈을 때의 토큰 수 (샘플 기준 추정)
+        "full_csv_tokens": int(count_tokens(sample.to_csv(index=False)) * len(df) / max(len(sample), 1)),
+        "truncated": n_lines < len(lines) or n_sample < min(len(df), sample_rows),
+    }
+    return text, info
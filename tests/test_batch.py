@@ -0,0 +1,92 @@
+# tests/test_batch.py — 일괄 응답 (중복 제거, 묶음 요약, 실패 뒤 체크포인트 이어받기) — 가짜 파이프라인
+import json
+import threading
+
+import pandas as pd
+
+from batch import _with_ids, run_batch
+from tracing import Tracer
+
+SQLS = {
+    "농협생명 킥스": "SELECT value FROM t WHERE company_code = '농협생명'",
+    "삼성생명 킥스": "SELECT value FROM t WHERE company_code = '삼성생명'",
+    "한화생명 킥스": "SELECT value FROM t WHERE company_code = '한화생명'",
+    "농협생명 K-ICS": "SELECT value FROM t WHERE company_code = '농협생명'",   # 같은 SQL
+}
+
+
+class _FakePipeline:
+    # run_batch 가 쓰는 Pipeline 메서드만 흉내낸다 (호출 기록 + 지정한 SQL 은 조회 실패)
+    def __init__(self, fail_sql=None, drop_ids=()):
+        self.tracer = Tracer()
+        self.fail_sql = fail_sql
+        self.drop_ids = set(drop_ids)
+        self.calls = {"sql": [], "data": [], "batch": [], "single": []}
+        self._lock = threading.Lock()
+
+    def _record(self, stage, value):
+        with self._lock:
+            self.calls[stage].append(value)
+
+    def generate_sql(self, q, meta):
+        self._record("sql", q)
+        meta["engine"] = "rule"
+        return SQLS[q]
+
+    def run_sql(self, sql, info):
+        self._record("data", sql)
+        if sql == self.fail_sql:
+            raise TimeoutError("statement timeout")
+        info.update(truncated=False, source="db")
+        return pd.DataFrame({"closing_ym": [202312], "value": [float(len(sql))]})
+
+    def build_summary_block(self, key, q, df):
+        return f"### id={key}\n질문: {q}", {"prompt_tokens": 10}
+
+    def summarize_batch(self, blocks):
+        self._record("batch", [n for n, _ in blocks])
+        return {n: f"요약 {n}" for n, _ in blocks if n not in self.drop_ids}
+
+    def summarize_answer(self, q, df):
+        self._record("single", q)
+        return f"개별 요약 {q}"
+
+
+def _items():
+    return _with_ids([{"q": q} for q in SQLS] + [{"q": "농협생명  킥스"}])
+
+
+def _answers(out):
+    return pd.read_parquet(out / "answers.parquet").set_index("question")
+
+
+def test_dedupes_and_resummarizes_dropped_ids(tmp_path):
+    pipe = _FakePipeline(drop_ids={"1", "3"})
+    report = run_batch(pipe, _items(), str(tmp_path), llm_workers=4, summary_batch_size=2, excel=False, log=lambda _: None)
+    assert (report["unique_questions"], report["unique_sql"]) == (4, 3)
+    assert len(pipe.calls["sql"]) == 4 and len(pipe.calls["data"]) == 3
+    assert report["stages"]["summary"]["batches"] == 2
+    assert report["stages"]["summary"]["single"] == 2 and len(pipe.calls["single"]) == 2
+    assert report["answered"] == 5 and not report["errors"]
+
+
+def test_resume_after_failure_only_redoes_failed_items(tmp_path):
+    failing = SQLS["삼성생명 킥스"]
+    first = run_batch(_FakePipeline(fail_sql=failing), _items(), str(tmp_path), excel=False, log=lambda _: None)
+    assert first["answered"] == 4
+    assert [e["question"] for e in first["errors"]] == ["삼성생명 킥스"]
+    assert "TimeoutError" in _answers(tmp_path).loc["삼성생명 킥스", "error"]
+
+    pipe = _FakePipeline()
+    second = run_batch(pipe, _items(), str(tmp_path), excel=False, log=lambda _: None)
+    assert pipe.calls["sql"] == []                     # SQL 은 모두 체크포인트에서
+    assert pipe.calls["data"] == [failing]             # 실패한 조회만 다시
+    assert second["stages"]["summary"]["questions"] == 1 and second["stages"]["summary"]["resumed"] == 3
+    assert second["answered"] == 5 and not second["errors"]
+    answers = _answers(tmp_path)
+    assert answers["error"].isna().all() and answers["summary"].notna().all()
+
+    # 실패 기록 뒤 성공 기록이 덧붙어 있다 — 다시 읽어도 완료 상태
+    recs = [json.loads(line) for line in open(tmp_path / "checkpoint.jsonl", encoding="utf-8")]
+    data = [r for r in recs if r["stage"] == "data" and r["key"] == answers.loc["삼성생명 킥스", "data_key"]]
+    assert "error" in data[0] and "error" not in data[-1]
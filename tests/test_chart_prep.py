@@ -0,0 +1,54 @@
+# tests/test_chart_prep.py — LTTB 다운샘플링과 차트 데이터 준비
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.seed import closing_yms
+from chart_prep import lttb, prepare_chart, to_dates
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 50), (101, 3), (10, 9)])
+def test_lttb_keeps_endpoints(n, n_out):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 7) * 100
+    idx = lttb(x, y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert (np.diff(idx) > 0).all()       # x 오름차순, 중복 없음
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(500)
+    y[237] = 1000.0
+    assert 237 in lttb(x, y, 20)
+
+
+@pytest.mark.parametrize("n_out", [0, 2, 10, 11])
+def test_lttb_returns_all_when_nothing_to_cut(n_out):
+    x = np.arange(10, dtype=np.float64)
+    assert lttb(x, x, n_out).tolist() == list(range(10))
+
+
+def test_line_chart_downsamples_each_series_with_endpoints():
+    yms = closing_yms(1990, 2025)
+    df = pd.DataFrame({
+        "company_code": [c for c in ("A", "B") for _ in yms],
+        "closing_ym": yms * 2,
+        "metric": "k_ics",
+        "value": np.r_[np.linspace(100, 200, len(yms)), np.linspace(300, 150, len(yms))],
+    })
+    chart = prepare_chart(df, max_points=40)
+    assert chart.kind == "line" and chart.color == "company_code"
+    assert "lttb" in chart.info["methods"] and chart.info["points"] == 40
+    first, last = to_dates(pd.Series([yms[0], yms[-1]]))
+    for _, g in chart.data.groupby("company_code"):
+        assert g["closing_ym"].min() == first and g["closing_ym"].max() == last
+
+
+def test_bar_chart_keeps_top_n():
+    df = pd.DataFrame({"company_code": [f"회사{i:02d}" for i in range(15)], "closing_ym": 202312,
+                       "metric": "k_ics", "value": [float(i) for i in range(15)]})
+    chart = prepare_chart(df, top_n=5)
+    assert chart.kind == "bar" and "top_n" in chart.info["methods"]
+    assert chart.data["company_code"].tolist() == ["회사14", "회사13", "회사12", "회사11", "회사10"]
@@ -0,0 +1,129 @@
+# tests/test_comparison.py — 비교 모드 하위 쿼리 실행기 (SQLite / psycopg 경로)
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+from bench.seed import seed_kics
+from comparison import ComparisonRunner, _PsycopgFetcher, plan_comparison
+from db import fetch_bounded
+from pipeline import Pipeline, PipelineConfig
+from sql_engine import TableSpec
+
+METRICS = ("k_ics", "assets", "liabilities", "revenue")
+SPEC = TableSpec("kics_solvency_data_flexible", "company_code", "closing_ym", "metric", "value", True, METRICS)
+QUESTION = "2019년 3월부터 2025년 12월까지 삼성생명과 농협생명 킥스 추이"
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('kics') / 'kics.sqlite3'}")
+    seed_kics(engine)
+    return engine
+
+
+def test_comparison_matches_single_query(engine):
+    pipe = Pipeline(None, engine, PipelineConfig())
+    plan = pipe.plan_comparison(QUESTION)
+    assert plan.split_by == "company" and len(plan.parts) == 2
+    info = {}
+    df = pipe.run_comparison(plan, info)
+    single = fetch_bounded(engine, pipe.generate_sql(QUESTION))
+    assert df.equals(single)
+    assert df["value"].dtype == "float64"
+    assert not info["truncated"] and not info["errors"]
+
+
+def test_comparison_reports_truncated_part(engine):
+    pipe = Pipeline(None, engine, PipelineConfig(max_rows=20))
+    info = {}
+    df = pipe.run_comparison(pipe.plan_comparison(QUESTION), info)
+    assert len(df) == 20
+    assert info["truncated"]
+
+
+# ----------------- psycopg 경로 (서버 측 커서 + BoundedReader) -----------------
+class _FakeCursor:
+    # psycopg AsyncCursor 대용 — 이름 있는 커서와 fetchmany 청크만 흉내낸다
+    def __init__(self, rows, name):
+        self.name = name
+        self.rows = rows
+        self.executed = None
+        self.description = [SimpleNamespace(name=n) for n in ("company_code", "closing_ym", "metric", "value")]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql):
+        self.executed = sql
+
+    async def fetchmany(self, size):
+        part, self.rows = self.rows[:size], self.rows[size:]
+        return part
+
+
+class _FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+
+    async def open(self):
+        pass
+
+    @asynccontextmanager
+    async def connection(self):
+        def cursor(name=None):
+            cur = _FakeCursor(list(self.rows), name)
+            self.cursors.append(cur)
+            return cur
+        yield SimpleNamespace(cursor=cursor)
+
+
+def _psycopg_fetcher(rows, max_rows):
+    pytest.importorskip("psycopg_pool")
+    fetcher = _PsycopgFetcher("postgresql://localhost/none", 1, 1000, max_rows, chunk_rows=3)
+    fetcher.pool = _FakePool(rows)
+    return fetcher
+
+
+def test_psycopg_fetcher_coerces_decimal_and_reports_truncation():
+    rows = [("농협생명", 202300 + m, "k_ics", Decimal(f"2{m}0.5")) for m in range(1, 9)]
+    fetcher = _psycopg_fetcher(rows, max_rows=5)
+    df, truncated = asyncio.run(fetcher.fetch("SELECT company_code, closing_ym, metric, value FROM t"))
+    cur = fetcher.pool.cursors[0]
+    assert cur.name is not None                    # 서버 측 커서
+    assert cur.executed.endswith("LIMIT 6")        # max_rows + 1 행으로 잘림 확인
+    assert truncated and len(df) == 5
+    assert df["value"].dtype == "float64" and df["value"].iloc[0] == 210.5
+    assert df["closing_ym"].dtype == "int64"
+
+
+def test_psycopg_fetcher_not_truncated_at_exact_size():
+    rows = [("농협생명", 202312, "k_ics", Decimal("1.5"))] * 5
+    df, truncated = asyncio.run(_psycopg_fetcher(rows, max_rows=5).fetch("SELECT 1"))
+    assert len(df) == 5 and not truncated
+
+
+@pytest.mark.skipif(not os.getenv("KICS_TEST_PG_URL"), reason="KICS_TEST_PG_URL 이 없으면 Postgres 통합 테스트는 건너뜀")
+def test_psycopg_runner_against_postgres():
+    # 예: KICS_TEST_PG_URL=postgresql+psycopg://user:pw@localhost:5432/kics_test (테이블을 새로 만든다)
+    pytest.importorskip("psycopg_pool")
+    engine = create_engine(os.environ["KICS_TEST_PG_URL"])
+    seed_kics(engine)
+    plan = plan_comparison(QUESTION, SPEC)
+    runner = ComparisonRunner(engine, concurrency=2, timeout_s=10, max_rows=5000)
+    try:
+        frames, errors, _, truncated = runner.run(plan.parts)
+    finally:
+        runner.close()
+    assert not errors and not truncated
+    for part in plan.parts:
+        assert frames[part.label]["value"].dtype == "float64"
+        assert frames[part.label].equals(fetch_bounded(engine, part.sql))
@@ -0,0 +1,72 @@
+# tests/test_conversation.py — 후속 질문 슬롯 병합과 이전 결과 잘라 쓰기
+import pandas as pd
+import pytest
+
+from conversation import Conversation, covers, missing_slots, resolve_followup, slice_frame
+from sql_engine import TableSpec
+
+METRICS = ("k_ics", "assets", "liabilities", "revenue")
+SPEC = TableSpec("kics_solvency_data_flexible", "company_code", "closing_ym", "metric", "value", True, METRICS)
+BASE = {"metrics": ["k_ics"], "companies": ["농협생명"], "closing_ym_from": "202312", "closing_ym_to": "202312"}
+RANGE = {**BASE, "closing_ym_from": "202203", "closing_ym_to": "202412"}
+
+
+# ----------------- 후속 질문 → 슬롯 -----------------
+@pytest.mark.parametrize("question, prev, expected", [
+    ("그럼 삼성생명은?", BASE, {**BASE, "companies": ["삼성생명"]}),
+    ("삼성생명도 같이", BASE, {**BASE, "companies": ["농협생명", "삼성생명"]}),
+    ("부채도 보여줘", BASE, {**BASE, "metrics": ["k_ics", "liabilities"]}),
+    ("작년 같은 달은?", BASE, {**BASE, "closing_ym_from": "202212", "closing_ym_to": "202212"}),
+    ("전분기는?", BASE, {**BASE, "closing_ym_from": "202309", "closing_ym_to": "202309"}),
+    ("23년 6월은?", RANGE, {**BASE, "closing_ym_from": "202306", "closing_ym_to": "202306"}),
+])
+def test_followup_merges_slots(question, prev, expected):
+    assert resolve_followup(question, prev, SPEC) == expected
+
+
+@pytest.mark.parametrize("question, prev", [
+    ("23년12월 삼성생명 K-ICS비율 알려줘", BASE),                        # 완전한 새 질문
+    ("작년 같은 달은?", {**BASE, "closing_ym_from": None, "closing_ym_to": None}),   # 기준 기간 없음
+    ("농협생명 빼고", BASE),                                               # 회사가 하나도 안 남음
+])
+def test_not_a_followup(question, prev):
+    assert resolve_followup(question, prev, SPEC) is None
+
+
+def test_covers_and_missing_slots():
+    assert covers(RANGE, BASE)
+    assert not covers(BASE, RANGE)
+    both = {**BASE, "companies": ["농협생명", "삼성생명"]}
+    assert missing_slots(BASE, both) == {**BASE, "companies": ["삼성생명"]}
+    later = {**RANGE, "closing_ym_to": "202512"}
+    assert missing_slots(RANGE, later) == {**RANGE, "closing_ym_from": "202501", "closing_ym_to": "202512"}
+
+
+# ----------------- 이전 결과 잘라 쓰기 -----------------
+def _frame(ym_dtype):
+    yms = [202212, 202306, 202312, 202312, 202412]
+    return pd.DataFrame({
+        "company_code": ["농협생명", "농협생명", "삼성생명", "농협생명", "농협생명"],
+        "closing_ym": pd.Series(yms).astype(ym_dtype),
+        "metric": "k_ics",
+        "value": [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+
+@pytest.mark.parametrize("ym_dtype", ["int64", "float64", "str"])
+def test_slice_frame_compares_periods_numerically(ym_dtype):
+    # 결과 캐시/Parquet 왕복으로 closing_ym 이 float(202312.0) 이 되어도 같은 행
+    df = _frame(ym_dtype)
+    assert slice_frame(df, BASE, SPEC)["value"].tolist() == [4.0]
+    got = slice_frame(df, {**BASE, "companies": [], "closing_ym_from": "202306"}, SPEC)
+    assert got["value"].tolist() == [2.0, 4.0, 3.0]      # closing_ym, 회사 순
+    assert list(got.index) == [0, 1, 2]
+
+
+def test_conversation_keeps_recent_turns():
+    conv = Conversation(max_turns=2)
+    df = _frame("int64")
+    for i in range(3):
+        conv.add(f"q{i}", "SELECT 1", BASE if i < 2 else None, df, complete=True)
+    assert [t.question for t in conv.turns()] == ["q2", "q1"]
+    assert conv.last().question == "q1"    # 슬롯이 없는 질문은 후속 질문 기준이 못 된다
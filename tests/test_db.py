@@ -0,0 +1,51 @@
+# tests/test_db.py — 제한 조회 (fetch_bounded): 타입 변환, NULL, 잘림 확인
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+
+from db import bound_sql, fetch_bounded
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 't.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER, v)")
+        conn.exec_driver_sql("INSERT INTO t VALUES (1, 1), (2, NULL), (3, 2), (4, 2.5), (5, 3)")
+    return engine
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 10])
+def test_null_survives_int_to_float_upcast(engine, chunk_rows):
+    # 타입 없는 컬럼은 값 그대로 돌려준다 → 첫 청크는 int, 2.5 가 오면 float 로 승격
+    df = fetch_bounded(engine, "SELECT v FROM t ORDER BY id", chunk_rows=chunk_rows)
+    assert df["v"].dtype == np.float64
+    assert df["v"].isna().tolist() == [False, True, False, False, False]
+    assert df["v"].fillna(-1).tolist() == [1.0, -1.0, 2.0, 2.5, 3.0]
+
+
+def test_null_in_int_column(engine):
+    df = fetch_bounded(engine, "SELECT CASE WHEN id = 2 THEN NULL ELSE id END AS i FROM t ORDER BY id", chunk_rows=2)
+    assert df["i"].isna().tolist() == [False, True, False, False, False]
+
+
+@pytest.mark.parametrize("sql, max_rows, rows, truncated", [
+    ("SELECT id FROM t ORDER BY id", 10, 5, False),
+    ("SELECT id FROM t ORDER BY id", 3, 3, True),
+    ("SELECT id FROM t ORDER BY id LIMIT 3", 10, 3, False),   # 상위 N (SQL 의 LIMIT) 은 잘림이 아님
+    ("SELECT id FROM t ORDER BY id LIMIT 5", 10, 5, False),
+    ("SELECT id FROM t ORDER BY id LIMIT 9", 10, 5, False),
+    ("SELECT id FROM t ORDER BY id LIMIT 4", 2, 2, True),
+    ("SELECT id FROM t ORDER BY id LIMIT 2 OFFSET 3", 10, 2, False),
+])
+def test_truncation_probe(engine, sql, max_rows, rows, truncated):
+    info = {}
+    df = fetch_bounded(engine, sql, max_rows=max_rows, chunk_rows=2, info=info)
+    assert len(df) == rows == info["rows"]
+    assert info["truncated"] is truncated
+
+
+def test_bound_sql_probes_one_more_row():
+    assert bound_sql("SELECT 1 FROM t", 100) == ("SELECT 1 FROM t LIMIT 101", None)
+    assert bound_sql("SELECT 1 FROM t LIMIT 10;", 100) == ("SELECT 1 FROM t LIMIT 10", 10)
+    assert bound_sql("SELECT 1 FROM t LIMIT 500 OFFSET 5", 100) == ("SELECT 1 FROM t LIMIT 101 OFFSET 5", 500)
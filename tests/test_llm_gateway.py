@@ -0,0 +1,138 @@
+# tests/test_llm_gateway.py — LLM 게이트웨이 (토큰 버킷, 재시도/Retry-After, 헤징) — httpx.MockTransport 로
+import threading
+import time
+
+import httpx
+import pytest
+
+from llm_gateway import GatewayConfig, GatewayThrottled, LLMGateway, TokenBucket, parse_rpm
+from tracing import Tracer
+
+URL = "https://llm.test/v1/chat/completions"
+BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "q"}]}
+
+
+def _client(handler, **config):
+    gateway = LLMGateway(GatewayConfig(**{"backoff_base_s": 0.001, **config}))
+    return gateway, gateway.http_client(timeout_s=5, transport=httpx.MockTransport(handler))
+
+
+def _ok(request):
+    return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+
+def test_parse_rpm():
+    assert parse_rpm("gpt-4o-mini=500, gpt-4o=100,broken") == {"gpt-4o-mini": 500.0, "gpt-4o": 100.0}
+    assert parse_rpm("") == {}
+
+
+# ----------------- 토큰 버킷 -----------------
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate_per_s=20, burst=1)
+    assert bucket.acquire(1) == 0.0
+    assert 0.03 < bucket.acquire(1) < 0.5        # 1/20 초 뒤 다음 토큰
+    with pytest.raises(GatewayThrottled):
+        bucket.acquire(0.001)
+
+
+def test_throttled_request_becomes_429_without_upstream_call():
+    calls = []
+    gateway, client = _client(lambda r: calls.append(r) or _ok(r), default_rpm=1, burst=1, max_wait_s=0.01)
+    assert client.post(URL, json=BODY).status_code == 200
+    r = client.post(URL, json=BODY)
+    assert r.status_code == 429 and r.json()["error"]["type"] == "gateway_throttled"
+    assert len(calls) == 1
+    assert gateway.stats()["gpt-4o-mini"]["failed"] == 1
+
+
+def test_buckets_are_per_model():
+    gateway, client = _client(_ok, rpm={"gpt-4o": 1}, burst=1, max_wait_s=0.01)
+    assert client.post(URL, json={**BODY, "model": "gpt-4o"}).status_code == 200
+    assert client.post(URL, json={**BODY, "model": "gpt-4o"}).status_code == 429
+    assert client.post(URL, json=BODY).status_code == 200       # 다른 모델은 기본 rpm 버킷
+
+
+# ----------------- 재시도 -----------------
+def test_retries_429_honouring_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("llm_gateway.time.sleep", sleeps.append)
+    statuses = iter([429, 503])
+
+    def handler(request):
+        status = next(statuses, 200)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "2"}, json={"error": {"message": "busy"}})
+        return _ok(request)
+
+    gateway, client = _client(handler)
+    tracer = Tracer()
+    with tracer.span("generate_sql"):
+        r = client.post(URL, json=BODY)
+    assert r.status_code == 200 and r.json()["choices"][0]["message"]["content"] == "ok"
+    assert sleeps == [2.0, 2.0]                   # 지터 백오프보다 Retry-After 가 길면 그만큼 기다린다
+    stats = gateway.stats()["gpt-4o-mini"]
+    assert (stats["requests"], stats["attempts"], stats["retries"]) == (1, 3, 2)
+    assert stats["reasons"] == {"429": 1, "503": 1}
+    assert tracer.records()[0]["llm_retries"] == 2
+
+
+def test_connection_error_is_retried():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("reset", request=request)
+        return _ok(request)
+
+    gateway, client = _client(handler)
+    assert client.post(URL, json=BODY).status_code == 200
+    assert gateway.stats()["gpt-4o-mini"]["reasons"] == {"connection": 1}
+
+
+def test_exhausted_retries_return_last_response():
+    attempts = []
+    gateway, client = _client(lambda r: attempts.append(r) or httpx.Response(500, text="down"), max_retries=2)
+    r = client.post(URL, json=BODY)
+    assert r.status_code == 500 and r.text == "down"
+    assert len(attempts) == 3
+    stats = gateway.stats()["gpt-4o-mini"]
+    assert (stats["retries"], stats["failed"]) == (2, 1)
+
+
+def test_non_retryable_status_is_returned_as_is():
+    attempts = []
+    _, client = _client(lambda r: attempts.append(r) or httpx.Response(400, json={"error": {"message": "bad"}}))
+    assert client.post(URL, json=BODY).status_code == 400
+    assert len(attempts) == 1
+
+
+# ----------------- 헤징 -----------------
+def test_slow_request_is_hedged_and_faster_copy_wins():
+    lock, n = threading.Lock(), [0]
+
+    def handler(request):
+        with lock:
+            n[0] += 1
+            i = n[0]
+        if i == 4:            # 워밍업 3건 뒤 첫 요청만 느리다 → 헤징한 두 번째 요청이 먼저 끝남
+            time.sleep(0.5)
+        return _ok(request)
+
+    gateway, client = _client(handler, hedge=True, hedge_min_samples=3, hedge_min_delay_s=0.05)
+    for _ in range(3):
+        client.post(URL, json=BODY)
+    assert gateway.hedge_delay("gpt-4o-mini") == pytest.approx(0.05)
+    t0 = time.perf_counter()
+    assert client.post(URL, json=BODY).status_code == 200
+    assert time.perf_counter() - t0 < 0.4
+    stats = gateway.stats()["gpt-4o-mini"]
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_streaming_requests_are_not_hedged():
+    gateway, client = _client(_ok, hedge=True, hedge_min_samples=1, hedge_min_delay_s=0.0)
+    for _ in range(3):
+        assert client.post(URL, json={**BODY, "stream": True}).status_code == 200
+    assert gateway.hedge_delay("gpt-4o-mini") is None     # 스트리밍은 헤징 기준 표본에도 안 들어간다
+    assert gateway.stats()["gpt-4o-mini"]["hedges"] == 0
@@ -0,0 +1,89 @@
+# tests/test_question_parser.py — 로컬 슬롯 파서 (LLM/DB 없이)
+import pytest
+
+from question_parser import COMPANY_GROUPS, extract_closing_yms, extract_companies, parse_local_slots
+from sql_engine import TableSpec, rule_based_sql
+
+METRICS = ("k_ics", "assets", "liabilities", "revenue")
+SPEC = TableSpec("kics_solvency_data_flexible", "company_code", "closing_ym", "metric", "value", True, METRICS)
+
+
+# ----------------- 회사/지표 별칭 -----------------
+@pytest.mark.parametrize("question, expected", [
+    ("NH농협생명 킥스", ["농협생명"]),
+    ("NH 농협 생명 킥스", ["농협생명"]),           # 띄어쓰기 무시
+    ("KB손보 부채", ["KB손해"]),
+    ("kb손해보험 부채", ["KB손해"]),               # 영문 대소문자 무시
+    ("KDB생명 자산", ["KDB생명"]),                 # 가장 긴 별칭 우선 ('DB생명' 아님)
+    ("XDB생명 킥스", []),                          # 영문 단어 중간에서 시작하는 매칭은 버림
+    ("삼성생명과 한화생명 킥스", ["삼성생명", "한화생명"]),
+])
+def test_company_aliases(question, expected):
+    assert extract_companies(question) == expected
+
+
+def test_group_alias_expands_to_companies():
+    slots = parse_local_slots("23년 12월 생보사 킥스", METRICS)
+    assert slots["groups"] == ["life"]
+    assert slots["companies"] == COMPANY_GROUPS["life"]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("농협생명 K-ICS비율", ["k_ics"]),
+    ("농협생명 지급여력비율", ["k_ics"]),
+    ("농협생명 총부채와 매출액", ["liabilities", "revenue"]),
+])
+def test_metric_aliases(question, expected):
+    assert parse_local_slots(question, METRICS)["metrics"] == expected
+
+
+# ----------------- 결산년월 -----------------
+@pytest.mark.parametrize("question, expected", [
+    ("23년12월 농협생명 킥스", ["202312"]),
+    ("2023년 3월 농협생명 킥스", ["202303"]),
+    ("농협생명 킥스 2023.12", ["202312"]),
+    ("농협생명 킥스 23-06", ["202306"]),
+    ("농협생명 킥스 202409", ["202409"]),
+    ("23년 13월 농협생명 킥스", []),               # 없는 달은 버림
+    ("킥스 12.5% 이상", []),                       # 소수/퍼센트는 결산년월이 아님
+])
+def test_closing_yms(question, expected):
+    assert extract_closing_yms(question) == expected
+
+
+def test_range_needs_from_to_words():
+    ranged = parse_local_slots("2022년 3월부터 2024년 12월까지 농협생명 자산 추이", METRICS)
+    assert (ranged["closing_ym_from"], ranged["closing_ym_to"]) == ("202203", "202412")
+    assert ranged["complete"]
+    # 기간 표시 없는 두 시점은 두 시점 비교 → LLM
+    points = parse_local_slots("23년 6월, 24년 6월 삼성생명 킥스", METRICS)
+    assert points["closing_yms"] == ["202306", "202406"]
+    assert not points["complete"]
+
+
+# ----------------- 군더더기 말 / 완전 템플릿 판정 -----------------
+@pytest.mark.parametrize("question", [
+    "23년12월 농협생명 K-ICS비율 알려줘",
+    "농협생명의 23년 12월 킥스 얼마야?",
+    "2022년 3월부터 2024년 12월까지 농협생명 자산 추이 보여주세요",
+    "K-ICS비율 추이",
+])
+def test_filler_only_questions_are_complete(question):
+    slots = parse_local_slots(question, METRICS)
+    assert slots["complete"], slots["residual"]
+
+
+@pytest.mark.parametrize("question", [
+    "삼성생명 킥스가 가장 높은 분기는?",     # 순위 질문
+    "킥스 비율 12.5% 이상인 회사",           # 조건 비교
+    "농협생명 알려줘",                       # 지표 없음
+    "23년 12월 농협생명 배당금",             # 목록에 없는 지표
+])
+def test_incomplete_questions_fall_through(question):
+    assert not parse_local_slots(question, METRICS)["complete"]
+    assert rule_based_sql(question, SPEC) is None
+
+
+def test_unknown_metric_in_db_falls_through():
+    # 별칭은 있지만 DB 에 없는 지표면 로컬 조립하지 않는다
+    assert not parse_local_slots("23년 12월 농협생명 매출", ("k_ics",))["complete"]
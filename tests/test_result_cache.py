@@ -0,0 +1,59 @@
+# tests/test_result_cache.py — 결과 캐시 (메모리 LRU + 디스크 스필 상한)
+import os
+
+import pandas as pd
+
+from result_cache import ResultCache
+
+
+def _frame(i: int) -> pd.DataFrame:
+    return pd.DataFrame({"company_code": [f"회사{i:02d}"] * 200, "closing_ym": range(200), "value": [float(i)] * 200})
+
+
+def _blob_size(df: pd.DataFrame) -> int:
+    # 항목마다 몇 바이트씩 다를 수 있으므로 여유를 둔다
+    cache = ResultCache()
+    cache.put("select 1", "v", df)
+    return cache.stats()["bytes_held"] + 16
+
+
+def _spill_files(path) -> int:
+    return sum(name.endswith(".parquet") for name in os.listdir(path))
+
+
+def test_spill_dir_is_capped(tmp_path):
+    size = _blob_size(_frame(0))
+    cache = ResultCache(max_bytes=size * 2, spill_dir=str(tmp_path), spill_max_bytes=size * 3)
+    for i in range(20):
+        assert cache.put(f"select {i}", "v", _frame(i))
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["spill_entries"] == 3 == _spill_files(tmp_path)
+    assert stats["spill_bytes"] <= size * 3
+    assert stats["spill_evicted"] == 15
+    # 가장 최근에 스필된 항목은 디스크에서, 오래된 항목은 삭제됨
+    assert cache.get("select 17", "v")["value"].iloc[0] == 17.0
+    assert cache.get("select 0", "v") is None
+
+
+def test_disk_hit_refreshes_lru(tmp_path):
+    size = _blob_size(_frame(0))
+    cache = ResultCache(max_bytes=size, spill_dir=str(tmp_path), spill_max_bytes=size * 2)
+    for i in range(3):          # 0, 1 → 디스크 / 2 → 메모리
+        cache.put(f"select {i}", "v", _frame(i))
+    assert cache.get("select 0", "v") is not None   # 0 을 최근 사용으로
+    cache.put("select 3", "v", _frame(3))           # 2 가 스필되며 1 이 삭제됨
+    assert cache.get("select 0", "v") is not None
+    assert cache.get("select 1", "v") is None
+    assert cache.stats()["disk_hits"] == 2
+
+
+def test_version_change_clears_spill(tmp_path):
+    size = _blob_size(_frame(0))
+    cache = ResultCache(max_bytes=size, spill_dir=str(tmp_path))
+    for i in range(3):
+        cache.put(f"select {i}", "v1", _frame(i))
+    assert _spill_files(tmp_path) == 1             # 기본 스필 상한 = max_bytes
+    assert cache.get("select 0", "v2") is None
+    assert _spill_files(tmp_path) == 0
+    assert cache.stats()["spill_bytes"] == 0
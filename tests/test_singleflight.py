@@ -0,0 +1,104 @@
+# tests/test_singleflight.py — 진행 중 호출 합류 (결과/예외 전달, 스트리밍)
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _wait_followers(sf: SingleFlight, n: int):
+    deadline = time.monotonic() + 5
+    while sf.stats()["followers"] < n:
+        assert time.monotonic() < deadline, "팔로워가 합류하지 않았습니다"
+        time.sleep(0.001)
+
+
+def test_followers_share_leader_result():
+    sf, started, release, calls = SingleFlight(), threading.Event(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "sql"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(sf.do, "generate_sql", "q", fn)
+        started.wait(5)
+        followers = [pool.submit(sf.do, "generate_sql", "q", fn) for _ in range(3)]
+        _wait_followers(sf, 3)
+        release.set()
+        assert leader.result() == ("sql", False)
+        assert [f.result() for f in followers] == [("sql", True)] * 3
+    assert len(calls) == 1
+    assert sf.stats()["stages"]["generate_sql"]["coalescing_ratio"] == 0.75
+
+
+def test_leader_exception_reaches_followers_and_key_is_released():
+    sf, started, release = SingleFlight(), threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise TimeoutError("LLM 시간 초과")
+
+    with ThreadPoolExecutor(3) as pool:
+        leader = pool.submit(sf.do, "summarize_answer", "k", fail)
+        started.wait(5)
+        followers = [pool.submit(sf.do, "summarize_answer", "k", fail) for _ in range(2)]
+        _wait_followers(sf, 2)
+        release.set()
+        for f in [leader, *followers]:
+            with pytest.raises(TimeoutError, match="LLM 시간 초과"):
+                f.result()
+    # 실패한 키는 지워졌으므로 다음 호출은 새로 실행
+    assert sf.do("summarize_answer", "k", lambda: "ok") == ("ok", False)
+    assert sf.stats()["in_flight"] == 0
+
+
+def test_stream_followers_get_chunks_then_leader_error():
+    sf, gate = SingleFlight(), threading.Event()
+
+    def chunks():
+        yield "가"
+        gate.wait(5)
+        yield "나"
+        raise ConnectionError("끊김")
+
+    lead, coalesced, _ = sf.stream("stream_summary", "k", chunks)
+    assert not coalesced and next(lead) == "가"
+    follow, coalesced, _ = sf.stream("stream_summary", "k", chunks)
+    assert coalesced
+
+    got = []
+
+    def _follow():
+        try:
+            for c in follow:
+                got.append(c)
+        except ConnectionError as e:
+            got.append(e)
+
+    t = threading.Thread(target=_follow)
+    t.start()
+    gate.set()
+    assert next(lead) == "나"
+    with pytest.raises(ConnectionError):
+        next(lead)
+    t.join(5)
+    assert got[:2] == ["가", "나"] and isinstance(got[2], ConnectionError)
+
+
+def test_abandoned_leader_stream_fails_followers():
+    sf = SingleFlight()
+    lead, _, _ = sf.stream("stream_summary", "k", lambda: iter(["가", "나"]))
+    assert next(lead) == "가"
+    follow, coalesced, _ = sf.stream("stream_summary", "k", lambda: iter(()))
+    assert coalesced
+    lead.close()   # 리더가 끝까지 읽지 않음
+    assert next(follow) == "가"
+    with pytest.raises(RuntimeError):
+        next(follow)
+    assert sf.stats()["in_flight"] == 0
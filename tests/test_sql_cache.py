@@ -0,0 +1,66 @@
+# tests/test_sql_cache.py — 질문 → SQL 캐시 (정확 일치 / 템플릿 재사용 / TTL / LRU)
+import time
+
+from sql_cache import SQLCache, render_sql, templatize_sql
+
+SQL = ("SELECT company_code, closing_ym, value FROM kics_solvency_data_flexible "
+       "WHERE company_code = '농협생명' AND closing_ym = 202312 AND metric = 'k_ics'")
+
+
+def _cache(tmp_path, **kwargs) -> SQLCache:
+    return SQLCache(str(tmp_path / "sql_cache.sqlite3"), **kwargs)
+
+
+def test_exact_hit_ignores_spacing(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("23년12월 농협생명 K-ICS비율 알려줘", SQL)
+    assert cache.get("23년 12월 농협생명 K-ICS 비율 알려줘") == SQL
+    assert cache.stats()["hits"] == 1 and cache.stats()["template_hits"] == 0
+
+
+def test_template_hit_renders_new_slot_values(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("23년12월 농협생명 K-ICS비율 알려줘", SQL)
+    sql = cache.get("24년6월 삼성생명 K-ICS비율 알려줘")
+    assert sql == SQL.replace("농협생명", "삼성생명").replace("202312", "202406")
+    assert cache.stats()["template_hits"] == 1
+
+
+def test_template_needs_same_slot_count(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("23년12월 농협생명 K-ICS비율 알려줘", SQL)
+    assert cache.get("23년12월 농협생명과 삼성생명 K-ICS비율 알려줘") is None
+    assert cache.get("23년12월 농협생명 부채 알려줘") is None
+
+
+def test_templatize_prefers_longest_company():
+    # 'DB생명' 이 'KDB생명' 안에서 치환되면 안 된다
+    sql = "SELECT 1 WHERE company_code IN ('KDB생명', 'DB생명')"
+    template = templatize_sql(sql, {"company": ["DB생명", "KDB생명"], "closing_ym": []})
+    assert template == "SELECT 1 WHERE company_code IN ('{company_1}', '{company_0}')"
+    assert render_sql(template, {"company": ["하나생명", "O'Neil생명"], "closing_ym": []}) == \
+        "SELECT 1 WHERE company_code IN ('O''Neil생명', '하나생명')"
+    assert templatize_sql(sql, {"company": ["삼성생명"], "closing_ym": []}) is None
+
+
+def test_ttl_expires_entries(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=0.05)
+    cache.put("23년12월 농협생명 K-ICS비율 알려줘", SQL)
+    time.sleep(0.1)
+    assert cache.get("23년12월 농협생명 K-ICS비율 알려줘") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_keeps_max_entries_and_clear(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    for q in ("농협생명 자산", "농협생명 부채", "농협생명 매출"):
+        cache.put(q, f"SELECT '{q}'")
+    assert cache.stats()["entries"] == 2
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.get("농협생명 매출") is None
+
+
+def test_persists_across_instances(tmp_path):
+    _cache(tmp_path).put("23년12월 농협생명 K-ICS비율 알려줘", SQL)
+    assert _cache(tmp_path).get("23년12월 농협생명 K-ICS비율 알려줘") == SQL
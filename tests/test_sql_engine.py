@@ -0,0 +1,111 @@
+# tests/test_sql_engine.py — 슬롯 SQL 조립/역파싱과 규칙 엔진 조회 (합성 SQLite)
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+from bench.seed import closing_yms, seed_kics
+from pipeline import Pipeline, PipelineConfig
+from question_parser import COMPANY_NAMES
+from result_cache import ResultCache
+from sql_engine import EngineStats, SlotParseError, TableSpec, build_select, extract_slots, parse_select
+
+METRICS = ("k_ics", "assets", "liabilities", "revenue")
+SPEC = TableSpec("kics_solvency_data_flexible", "company_code", "closing_ym", "metric", "value", True, METRICS)
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('kics') / 'kics.sqlite3'}")
+    seed_kics(engine)   # 2019~2025 분기말, 회사 32곳 × 지표 4개
+    return engine
+
+
+def _pipeline(engine, **config):
+    return Pipeline(None, engine, PipelineConfig(**config))
+
+
+@pytest.mark.parametrize("slots", [
+    {"metrics": ["k_ics"], "companies": [], "closing_ym_from": None, "closing_ym_to": None},
+    {"metrics": ["k_ics", "assets"], "companies": ["농협생명", "O'Brien"], "closing_ym_from": "202312", "closing_ym_to": "202312"},
+    {"metrics": ["revenue"], "companies": ["삼성생명"], "closing_ym_from": "202203", "closing_ym_to": "202412"},
+])
+def test_build_parse_round_trip(slots):
+    sql = build_select(slots, SPEC)
+    assert "LIMIT" not in sql
+    assert parse_select(sql, SPEC) == {**slots, "limit": None}
+
+
+def test_parse_select_accepts_legacy_limit():
+    # SQL 캐시에 남은 예전 모양 (끝에 LIMIT n)
+    sql = build_select({"metrics": ["k_ics"], "companies": [], "closing_ym_from": None, "closing_ym_to": None}, SPEC)
+    assert parse_select(f"{sql} LIMIT 300", SPEC)["limit"] == 300
+
+
+@pytest.mark.parametrize("question, companies", [
+    ("K-ICS비율 추이", COMPANY_NAMES),
+    ("2019년 3월부터 2025년 12월까지 생보사 킥스 추이", [c for c in COMPANY_NAMES if "생명" in c]),
+])
+def test_broad_trend_question_returns_all_periods(engine, question, companies):
+    # 회귀: 오름차순 + 고정 LIMIT 300 이면 가장 오래된 분기만 오고 잘림 표시도 없었다
+    pipe = _pipeline(engine)
+    meta, info = {}, {}
+    df = pipe.run_sql(pipe.generate_sql(question, meta), info)
+    assert meta["engine"] == "rule"
+    assert len(df) == len(companies) * len(closing_yms(2019, 2025))
+    assert df["closing_ym"].min() == 201903 and df["closing_ym"].max() == 202512
+    assert not info["truncated"]
+
+
+def test_broad_trend_question_reports_truncation(engine):
+    pipe = _pipeline(engine, max_rows=300)
+    info = {}
+    df = pipe.run_sql(pipe.generate_sql("K-ICS비율 추이"), info)
+    assert len(df) == 300
+    assert info["truncated"]
+
+
+def test_top_n_limit_is_not_truncation_on_cache_hit(engine):
+    # 상위 N (SQL 의 LIMIT n <= max_rows) 은 DB 조회든 결과 캐시 적중이든 잘림이 아니다
+    pipe = _pipeline(engine, max_rows=20)
+    pipe.result_cache = ResultCache()
+    for sql, truncated in (("SELECT company_code FROM kics_solvency_data_flexible ORDER BY company_code LIMIT 20", False),
+                           ("SELECT company_code FROM kics_solvency_data_flexible ORDER BY company_code", True)):
+        for source in ("db", "cache"):
+            info = {}
+            df = pipe.run_sql(sql, info)
+            assert (info["source"], len(df), info["truncated"]) == (source, 20, truncated)
+
+
+class _FailingClient:
+    # 호출되면 안 되는 클라이언트 — 호출 횟수만 센다
+    def __init__(self):
+        self.calls = 0
+        self.chat = self.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise AssertionError("LLM 이 호출되면 안 된다")
+
+
+def test_empty_metrics_fail_before_llm_call():
+    client = _FailingClient()
+    with pytest.raises(SlotParseError):
+        extract_slots(client, "농협생명 킥스", SPEC._replace(metrics=()))
+    assert client.calls == 0
+
+
+def test_failed_single_shot_is_timed_and_falls_back(engine):
+    class _Agent:
+        def invoke(self, inputs, config=None):
+            return {"output": "SELECT company_code FROM kics_solvency_data_flexible"}
+
+    stats = EngineStats()
+    pipe = Pipeline(_FailingClient(), engine, PipelineConfig(), stats=stats, agent_factory=_Agent)
+    pipe._table_spec = SimpleNamespace(get=lambda: SPEC._replace(metrics=()))
+    meta = {}
+    pipe.generate_sql("농협생명 킥스가 가장 높은 분기는?", meta)
+    snap = stats.snapshot()
+    assert meta["engine"] == "agent"
+    assert snap["fallbacks"] == 1
+    assert snap["engines"]["single_shot"]["count"] == 1
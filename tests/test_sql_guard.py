@@ -0,0 +1,54 @@
+# tests/test_sql_guard.py — SQL 검증기와 에이전트 프롬프트 규칙이 어긋나지 않는지
+import re
+
+import pytest
+
+from pipeline import PipelineConfig
+from sql_agent import AGENT_PREFIX, agent_prefix
+from sql_guard import FUNCTIONS, SQLGuardError, allowlist_for, validate_select
+
+COLUMNS = ("company_code", "closing_ym", "metric", "value")
+ALLOW = allowlist_for("kics_solvency_data_flexible", COLUMNS)
+
+
+def test_prompt_names_only_real_columns_and_allowed_functions():
+    listed = re.search(r"컬럼: (.*)", AGENT_PREFIX).group(1)
+    assert re.findall(r"(\w+)\(", listed) == list(COLUMNS)
+    assert "ORDER BY closing_ym" in AGENT_PREFIX and "ORDER BY date" not in AGENT_PREFIX
+    functions = re.search(r"기본 함수\((.*?) 등\)", AGENT_PREFIX).group(1).split(", ")
+    assert set(functions) <= FUNCTIONS
+
+
+def test_prompt_uses_configured_columns():
+    config = PipelineConfig(table="kics_v2", company_col="insurer", ym_col="base_ym", metric_col="item", value_col="amt")
+    prefix = agent_prefix(config)
+    listed = re.search(r"컬럼: (.*)", prefix).group(1)
+    assert re.findall(r"(\w+)\(", listed) == ["insurer", "base_ym", "item", "amt"]
+    assert "kics_v2" in prefix and "ORDER BY base_ym" in prefix
+    assert "closing_ym" not in prefix and "company_code" not in prefix and "kics_solvency_data_flexible" not in prefix
+
+
+@pytest.mark.parametrize("sql", [
+    # 프롬프트가 허용하는 모양: CTE, 윈도우 함수, 끝 세미콜론 1개
+    "WITH k AS (SELECT company_code, closing_ym, value FROM kics_solvency_data_flexible WHERE metric = 'k_ics') "
+    "SELECT company_code, closing_ym, value - lag(value) OVER (PARTITION BY company_code ORDER BY closing_ym) AS diff "
+    "FROM k ORDER BY closing_ym;",
+    "SELECT company_code, round(avg(value), 1) FROM kics_solvency_data_flexible "
+    "WHERE metric = 'k_ics' GROUP BY company_code ORDER BY 2 DESC LIMIT 5",
+    "SELECT company_code, closing_ym, value FROM kics_solvency_data_flexible "
+    "WHERE metric = ANY(ARRAY['k_ics', 'assets']) ORDER BY closing_ym",
+])
+def test_prompt_allowed_shapes_validate(sql):
+    validate_select(sql, ALLOW)
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH RECURSIVE r AS (SELECT 1) SELECT * FROM r",
+    "SELECT closing_ym FROM kics_solvency_data_flexible ORDER BY report_date",
+    "EXPLAIN SELECT value FROM kics_solvency_data_flexible",
+    "SELECT value FROM kics_solvency_data_flexible; SELECT 1",
+    "SELECT value FROM kics_solvency_data_flexible FOR UPDATE",
+])
+def test_prompt_forbidden_shapes_rejected(sql):
+    with pytest.raises(SQLGuardError):
+        validate_select(sql, ALLOW)
@@ -0,0 +1,52 @@
+# tests/test_summary_cache.py — 요약 캐시 적중/무효화 (질문 정규화, 결과 지문, 요약 설정 네임스페이스)
+import pandas as pd
+
+from pipeline import Pipeline, PipelineConfig
+from summary_cache import SummaryCache
+
+DF = pd.DataFrame({"company_code": ["농협생명", "농협생명"], "closing_ym": [202306, 202312], "value": [210.5, 220.0]})
+
+
+def _cache(tmp_path, namespace=""):
+    return SummaryCache(str(tmp_path / "summary.sqlite3"), namespace=namespace)
+
+
+def test_hit_for_same_question_and_result(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("농협생명 킥스 추이", DF) is None
+    cache.put("농협생명 킥스 추이", DF, "요약")
+    assert cache.get("  농협생명  킥스 추이 ", DF) == "요약"        # 공백만 다른 질문도 같은 키
+    assert cache.get("농협생명 킥스 추이", DF.astype({"closing_ym": "int32"})) == "요약"
+    assert cache.stats()["hits"] == 2
+
+
+def test_changed_result_misses(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("농협생명 킥스 추이", DF, "요약")
+    assert cache.get("농협생명 킥스 추이", DF.assign(value=[210.5, 230.0])) is None
+
+
+def test_ttl_expiry(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summary.sqlite3"), ttl_seconds=-1)
+    cache.put("농협생명 킥스 추이", DF, "요약")
+    assert cache.get("농협생명 킥스 추이", DF) is None
+
+
+def test_summary_config_change_invalidates(tmp_path):
+    base = PipelineConfig(summary_model="model-a", summary_token_budget=1500, summary_sample_rows=20)
+    key = Pipeline(None, None, base).summary_config_key()
+    assert Pipeline(None, None, base).summary_config_key() == key
+    _cache(tmp_path, key).put("농협생명 킥스 추이", DF, "요약")
+    assert _cache(tmp_path, key).get("농협생명 킥스 추이", DF) == "요약"   # 재시작 후에도 같은 설정이면 적중
+    for changed in (base._replace(summary_model="model-b"), base._replace(summary_token_budget=800),
+                    base._replace(summary_sample_rows=5)):
+        other = Pipeline(None, None, changed).summary_config_key()
+        assert other != key
+        assert _cache(tmp_path, other).get("농협생명 킥스 추이", DF) is None
+
+
+def test_prompt_change_invalidates(monkeypatch):
+    pipe = Pipeline(None, None, PipelineConfig())
+    key = pipe.summary_config_key()
+    monkeypatch.setattr("pipeline.SUMMARY_PROMPT", "질문: {question}\n{data_block}\n")
+    assert pipe.summary_config_key() != key
@@ -0,0 +1,71 @@
+# tests/test_summary_input.py — 요약 입력 집계 (컬럼 역할 추정, 전년 동월 대비)
+import pandas as pd
+import pytest
+
+from summary_input import build_summary_input, infer_roles, series_aggregates
+
+
+def test_yoy_with_duplicate_period():
+    # 같은 회사/결산년월이 두 번 들어간 결과 — 예전에는 "truth value of a Series is ambiguous"
+    df = pd.DataFrame({
+        "insurer": ["농협생명"] * 4,
+        "closing_ym": [202212, 202312, 202312, 202212],
+        "k_ics_ratio": [200.0, 210.0, 220.0, 200.0],
+    })
+    roles = infer_roles(df)
+    agg = series_aggregates(df, roles)
+    assert len(agg) == 1
+    # 마지막 시점(202312)의 마지막 값 220 과 전년 동월 200 비교
+    assert agg.loc[0, "yoy_pct"] == pytest.approx(10.0)
+    text, _ = build_summary_input(df)
+    assert "전년동월대비=+10.0%" in text
+
+
+def test_yoy_without_previous_year():
+    df = pd.DataFrame({"company_code": ["A", "A"], "closing_ym": [202306, 202312], "value": [1.0, 2.0]})
+    assert series_aggregates(df, infer_roles(df)).loc[0, "yoy_pct"] is None
+
+
+@pytest.mark.parametrize("columns, category", [
+    (["company_code", "closing_ym", "metric", "value"], "company_code"),
+    (["insurer", "closing_ym", "k_ics_ratio"], "insurer"),          # 이름 규칙 밖 → 첫 비수치 컬럼
+    (["segment", "회사명", "closing_ym", "value"], "회사명"),         # 이름 규칙이 우선
+])
+def test_infer_category_column(columns, category):
+    data = {c: (["x"] if c not in ("closing_ym", "value", "k_ics_ratio") else [202312 if c == "closing_ym" else 1.0])
+            for c in columns}
+    assert infer_roles(pd.DataFrame(data))["category"] == category
+
+
+def test_infer_roles_numeric_only():
+    df = pd.DataFrame({"closing_ym": [202312], "value": [1.0]})
+    assert infer_roles(df) == {"ym": "closing_ym", "metric": None, "category": None, "values": ["value"]}
+
+
+def test_ym_column_matches_whole_name():
+    # 'ym' 이 들어간 다른 컬럼(지급액 등)을 결산년월로 보면 안 된다
+    df = pd.DataFrame({"company_code": ["A"], "payment_ym_amt": [3.0], "closing_ym": [202312], "value": [1.0]})
+    assert infer_roles(df)["ym"] == "closing_ym"
+    df = pd.DataFrame({"company_code": ["A"], "payment_ym_amt": [3.0], "value": [1.0]})
+    assert infer_roles(df)["ym"] is None
+
+
+def test_configured_ym_column():
+    df = pd.DataFrame({"company_code": ["A"], "base_month": [202312], "value": [1.0]})
+    assert infer_roles(df)["ym"] is None
+    assert infer_roles(df, ym_col="BASE_MONTH")["ym"] == "base_month"
+
+
+def test_rank_per_period():
+    # B 는 202212 에 2위 → 202312 에 1위, A 는 그 반대
+    df = pd.DataFrame({
+        "company_code": ["A", "B", "A", "B"],
+        "closing_ym": [202212, 202212, 202312, 202312],
+        "metric": ["k_ics"] * 4,
+        "value": [250.0, 200.0, 210.0, 230.0],
+    })
+    agg = series_aggregates(df, infer_roles(df)).set_index("_cat")
+    assert agg.loc["A", ["rank_first", "rank_latest", "rank_best"]].tolist() == [1, 2, 1]
+    assert agg.loc["B", ["rank_first", "rank_latest", "rank_best"]].tolist() == [2, 1, 1]
+    text, _ = build_summary_input(df)
+    assert "순위=2위→1위(최고 1위)" in text
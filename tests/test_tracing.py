@@ -0,0 +1,57 @@
+# tests/test_tracing.py — 트레이스 파일 크기 제한/읽기, 오류 기록, 질문 해시
+import os
+
+import pytest
+
+from tracing import Tracer, load_traces, question_hash
+
+
+def test_trace_log_rotates(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    tracer = Tracer(path, max_bytes=2000)
+    for i in range(100):
+        tracer.event("run_sql", 1.0, rows=i)
+    assert os.path.getsize(path) <= 2000
+    assert os.path.getsize(path + ".1") <= 2000
+    assert not os.path.exists(path + ".2")
+    # 돌린 파일까지 순서대로 읽는다
+    rows = [r["rows"] for r in load_traces(path)]
+    assert rows == sorted(rows) and rows[-1] == 99
+
+
+def test_trace_log_size_survives_restart(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    Tracer(path, max_bytes=1000).event("run_sql", 1.0)
+    tracer = Tracer(path, max_bytes=1000)
+    for _ in range(30):
+        tracer.event("run_sql", 1.0)
+    assert os.path.getsize(path) <= 1000
+
+
+class StopException(Exception):
+    # streamlit.runtime.scriptrunner 의 st.stop() 예외와 같은 이름
+    pass
+
+
+def test_streamlit_stop_is_not_an_error():
+    tracer = Tracer()
+    with pytest.raises(StopException):
+        with tracer.span("pipeline"):
+            raise StopException()
+    with pytest.raises(ValueError):
+        with tracer.span("pipeline"):
+            raise ValueError("bad")
+    assert [r["error"] for r in tracer.records()] == [None, "ValueError: bad"]
+
+
+def test_question_is_hashed_unless_enabled(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    with Tracer(path).span("pipeline", question="농협생명 킥스 추이"):
+        pass
+    rec = load_traces(path)[0]
+    assert "question" not in rec and rec["question_hash"] == question_hash("농협생명 킥스 추이")
+    assert "농협생명" not in open(path, encoding="utf-8").read()
+
+    with Tracer(path, log_questions=True).span("pipeline", question="농협생명 킥스 추이"):
+        pass
+    assert load_traces(path)[-1]["question"] == "농협생명 킥스 추이"
@@ -0,0 +1,240 @@
+# tracing.py — 단계별 지연시간/LLM 호출·토큰/행·바이트/캐시 적중 트레이싱 (JSON lines)
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+STAGES = ("pipeline", "generate_sql", "run_sql", "summarize_answer", "render_chart")
+
+# Streamlit 이 스크립트를 끊을 때 쓰는 제어 흐름 예외 (st.stop / st.rerun) — 오류가 아니라 정상 종료로 기록
+_CONTROL_FLOW_EXCEPTIONS = ("StopException", "RerunException")
+
+
+def question_hash(question: str) -> str:
+    # 트레이스에는 원문 대신 해시만 남긴다 (같은 질문끼리 묶어 보기용)
+    return hashlib.sha256(question.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = dict(attrs)
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_counts(self, **counts):
+        # 숫자 속성 누적 (LLM 게이트웨이 재시도/헤징/대기 등)
+        with self._lock:
+            for k, v in counts.items():
+                self.attrs[k] = self.attrs.get(k, 0) + v
+
+    def add_llm(self, prompt_tokens: int = 0, completion_tokens: int = 0, calls: int = 1):
+        with self._lock:
+            self.llm_calls += calls
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+
+
+def current_span():
+    return _current_span.get()
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Tracer:
+    """
+    path: JSON lines 파일 (None 이면 메모리에만) · keep: 메모리에 두는 최근 기록 수
+    max_bytes: 파일이 이 크기를 넘으면 path.1 로 돌리고 새로 쓴다 (이전 path.1 은 삭제, 0 이면 돌리지 않음)
+    log_questions: True 면 question 속성을 원문 그대로 남긴다 (기본은 question_hash 로 바꿔 기록)
+    """
+
+    def __init__(self, path: str = None, keep: int = 5000, max_bytes: int = 20 * 1024 * 1024,
+                 log_questions: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.log_questions = log_questions
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._size = 0
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    @contextmanager
+    def span(self, name: str, trace_id: str = None, **attrs):
+        parent = _current_span.get()
+        trace_id = trace_id or (parent.trace_id if parent else new_trace_id())
+        sp = Span(name, trace_id, attrs)
+        token = _current_span.set(sp)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield sp
+        except BaseException as e:
+            if type(e).__name__ not in _CONTROL_FLOW_EXCEPTIONS:
+                error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self._emit({
+                "ts": time.time(),
+                "trace_id": trace_id,
+                "stage": name,
+                "wall_ms": round((time.perf_counter() - t0) * 1000, 2),
+                "llm_calls": sp.llm_calls,
+                "prompt_tokens": sp.prompt_tokens,
+                "completion_tokens": sp.completion_tokens,
+                "error": error,
+                **sp.attrs,
+            })
+            # 하위 단계의 LLM 사용량은 상위 span(예: pipeline)에도 합산
+            if parent is not None:
+                parent.add_llm(sp.prompt_tokens, sp.completion_tokens, calls=sp.llm_calls)
+
+    def event(self, name: str, wall_ms: float, **attrs):
+        # span 없이 이미 측정한 단계를 기록 (예: 캐시 적중으로 LLM 을 건너뛴 요약)
+        parent = _current_span.get()
+        self._emit({
+            "ts": time.time(),
+            "trace_id": parent.trace_id if parent else new_trace_id(),
+            "stage": name,
+            "wall_ms": round(wall_ms, 2),
+            "llm_calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "error": None,
+            **attrs,
+        })
+
+    def _emit(self, record: dict):
+        if not self.log_questions and record.get("question") is not None:
+            record["question_hash"] = question_hash(str(record.pop("question")))
+        with self._lock:
+            self._recent.append(record)
+            if self.path:
+                line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                if self.max_bytes and self._size and self._size + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                    self._size = 0
+                with open(self.path, "ab") as f:
+                    f.write(line)
+                self._size += len(line)
+
+    def records(self) -> list:
+        with self._lock:
+            return list(self._recent)
+
+
+# ----------------- LLM 클라이언트 래퍼 -----------------
+class TracedChatClient:
+    """OpenAI 클라이언트(또는 같은 인터페이스의 스텁)를 감싸 호출 수/토큰을 현재 span 에 기록."""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        span = current_span()
+        r = self._client.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._traced_stream(r, span)
+        if span is not None:
+            usage = getattr(r, "usage", None)
+            span.add_llm(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+        return r
+
+    @staticmethod
+    def _traced_stream(stream, span):
+        if span is not None:
+            span.add_llm(calls=1)
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if span is not None and usage:
+                span.add_llm(usage.prompt_tokens, usage.completion_tokens, calls=0)
+            yield chunk
+
+
+def langchain_callback(span: Span):
+    # LangChain 에이전트의 LLM 호출/토큰을 span 에 기록하는 콜백 핸들러
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _LLMTraceCallback(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            span.add_llm(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+    return _LLMTraceCallback()
+
+
+# ----------------- 집계 (운영 페이지) -----------------
+def load_traces(path: str, limit: int = 20000) -> list:
+    # 돌려 둔 이전 파일(path.1)부터 읽어 최근 limit 줄
+    lines = deque(maxlen=limit)
+    for p in (f"{path}.1", path) if path else ():
+        if os.path.exists(p):
+            with open(p, encoding="utf-8") as f:
+                lines.extend(f)
+    out = []
+    for line in lines:
+        try:
+            out.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return out
+
+
+def _percentile(sorted_vals, p: float):
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_vals) - 1)
+    return round(sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo), 2)
+
+
+def aggregate(records: list) -> list:
+    by_stage = {}
+    for r in records:
+        by_stage.setdefault(r.get("stage"), []).append(r)
+
+    rows = []
+    for stage in sorted(by_stage, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), str(s))):
+        rs = by_stage[stage]
+        walls = sorted(r["wall_ms"] for r in rs if r.get("wall_ms") is not None)
+        hits = [r["cache_hit"] for r in rs if r.get("cache_hit") is not None]
+        joined = [r["coalesced"] for r in rs if r.get("coalesced") is not None]
+        n = len(rs)
+        rows.append({
+            "stage": stage,
+            "count": n,
+            "errors": sum(1 for r in rs if r.get("error")),
+            "p50_ms": _percentile(walls, 50),
+            "p95_ms": _percentile(walls, 95),
+            "p99_ms": _percentile(walls, 99),
+            "llm_calls_avg": round(sum(r.get("llm_calls", 0) for r in rs) / n, 2),
+            "prompt_tokens_avg": round(sum(r.get("prompt_tokens", 0) for r in rs) / n, 1),
+            "completion_tokens_avg": round(sum(r.get("completion_tokens", 0) for r in rs) / n, 1),
+            "llm_retries": sum(r.get("llm_retries", 0) for r in rs),
+            "llm_hedged": sum(r.get("llm_hedged", 0) for r in rs),
+            "cache_hit_rate": round(sum(hits) / len(hits), 3) if hits else None,
+            "coalesced_rate": round(sum(joined) / len(joined), 3) if joined else None,
+            "rows_avg": round(sum(r.get("rows", 0) for r in rs) / n, 1) if any("rows" in r for r in rs) else None,
+            "bytes_avg": round(sum(r.get("bytes", 0) for r in rs) / n) if any("bytes" in r for r in rs) else None,
+        })
+    return rows